@@ -0,0 +1,79 @@
+import json
+import logging
+import random
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from actions.NLG.completion_cache import normalize_prompt
+
+# Default location of the comment bank (see generate_comment_bank.py)
+DEFAULT_BANK_PATH = Path(__file__).resolve().parent.joinpath("comment_bank.jsonl")
+
+# Kinds of comments in the bank
+TECHNOLOGY_SKILL_COMMENTS = "technology_skill"
+JOB_TITLE_COMMENTS = "job_title"
+
+
+def bank_key(text: str) -> str:
+    """ Titles are looked up like the completion cache normalizes prompts (whitespace and case do not matter). """
+    return normalize_prompt(text)
+
+
+class CommentBank():
+    """ GPT-3 completions generated ahead of time for known skills and job titles.
+
+    The bank file has one JSON object per line with the 'kind' of comment, the 'title' and its 'completions'
+    (raw completions, the connector post-processes them like completions of the API). Lines of the same title
+    are merged, so a generation run can simply append.
+    """
+
+    def __init__(self, completions: Dict[Tuple[str, str], List[str]] = None):
+        self.completions = completions or {}
+
+    @classmethod
+    def load(cls, path: Path = DEFAULT_BANK_PATH) -> "CommentBank":
+        """ Loads a bank file, a missing file gives an empty bank. """
+        completions: Dict[Tuple[str, str], List[str]] = {}
+        path = Path(path)
+        if path.exists():
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        completions.setdefault((record["kind"], bank_key(record["title"])), []).extend(record["completions"])
+        return cls(completions)
+
+    def __len__(self) -> int:
+        return len(self.completions)
+
+    def __contains__(self, item: Tuple[str, str]) -> bool:
+        kind, text = item
+        return (kind, bank_key(text)) in self.completions
+
+    def get(self, kind: str, text: str) -> Optional[str]:
+        """ Returns one of the completions for the title (chosen at random), or None if the title is not in the bank. """
+        completions = self.completions.get((kind, bank_key(text)))
+        if not completions:
+            return None
+        return random.choice(completions)
+
+
+_comment_bank: Optional[CommentBank] = None
+_comment_bank_lock = threading.Lock()
+
+
+def get_comment_bank() -> CommentBank:
+    """ Returns the comment bank of the process, loaded on first use. """
+    global _comment_bank
+    if _comment_bank is None:
+        with _comment_bank_lock:
+            if _comment_bank is None:
+                _comment_bank = CommentBank.load()
+    return _comment_bank
+
+
+def preload_comment_bank() -> None:
+    """ Loads the comment bank, e.g. when the action server starts. """
+    bank = get_comment_bank()
+    logging.info(f"Loaded comment bank with {len(bank)} titles")
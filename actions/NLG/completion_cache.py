@@ -0,0 +1,169 @@
+import asyncio
+import functools
+import hashlib
+import json
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# Default location of the cache database, in the temporary directory as the package directory may be read-only
+# (the action server image sets GPT3_CACHE_PATH, see actions/Dockerfile)
+DEFAULT_CACHE_PATH = Path(tempfile.gettempdir()).joinpath("survey-chatbot", "completion_cache.sqlite3")
+
+# 'read-through': serve cached completions, otherwise call the API and store the completion
+# 'read': only serve cached completions, new completions are not stored; 'off': no cache
+CACHE_MODES = ("read-through", "read", "off")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """ Prompts that only differ in whitespace or case ask for the same completion. """
+    return re.sub(r"\s+", " ", prompt).strip().casefold()
+
+
+def cache_key(engine: str, prompt: str, temperature: float, max_tokens: int) -> str:
+    return hashlib.sha256(json.dumps([engine, normalize_prompt(prompt), temperature, max_tokens]).encode("utf-8")).hexdigest()
+
+
+class CompletionCache():
+    """ Persistent cache of GPT-3 completions in a SQLite database (WAL mode, shared by all processes of the action server).
+
+    Completions are keyed by (engine, normalized prompt, temperature, max_tokens). Up to <variants> sampled completions
+    are stored per key: the first requests of a key still call the API (read-through) until all variants exist,
+    after that the variants are served in rotation (least recently used first), so replies don't look canned.
+    Entries expire after <ttl> seconds, beyond <max_entries> the least recently used entries are evicted.
+    """
+
+    def __init__(
+        self,
+        path: Path = DEFAULT_CACHE_PATH,
+        variants: int = 3,
+        ttl: float = 30 * 24 * 3600,
+        max_entries: int = 10000,
+        mode: str = "read-through"
+        ):
+        if mode not in CACHE_MODES:
+            raise ValueError("invalid cache mode specified as argument")
+        self.path = Path(path)
+        self.variants = variants
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS completions (
+                key TEXT NOT NULL,
+                variant INTEGER NOT NULL,
+                engine TEXT NOT NULL,
+                prompt TEXT NOT NULL,
+                temperature REAL NOT NULL,
+                max_tokens INTEGER NOT NULL,
+                completion TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (key, variant)
+            )""")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS completions_last_used ON completions (last_used)")
+
+    def get(self, engine: str, prompt: str, temperature: float, max_tokens: int, complete_only: bool = False) -> Optional[str]:
+        """ Returns the next cached variant of a completion, or None.
+
+        Args:
+            complete_only: None unless all variants of the key are cached (see <get_or_create>)
+        """
+        key = cache_key(engine, prompt, temperature, max_tokens)
+        now = time.time()
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT variant, completion FROM completions WHERE key = ? AND created >= ? ORDER BY last_used, variant",
+                (key, now - self.ttl)).fetchall()
+            if not rows or (complete_only and len(rows) < self.variants):
+                self.misses += 1
+                return None
+            variant, completion = rows[0]
+            self._connection.execute(
+                "UPDATE completions SET last_used = ?, hits = hits + 1 WHERE key = ? AND variant = ?", (now, key, variant))
+            self.hits += 1
+            return completion
+
+    def put(self, engine: str, prompt: str, temperature: float, max_tokens: int, completion: str) -> None:
+        """ Stores a completion as a new variant of its key (replacing the oldest variant if all exist). """
+        key = cache_key(engine, prompt, temperature, max_tokens)
+        now = time.time()
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT variant, created FROM completions WHERE key = ? ORDER BY created", (key,)).fetchall()
+            used = {variant for variant, created in rows if created >= now - self.ttl}
+            free = [variant for variant in range(self.variants) if variant not in used]
+            variant = free[0] if free else rows[0][0]
+            self._connection.execute(
+                "INSERT OR REPLACE INTO completions "
+                "(key, variant, engine, prompt, temperature, max_tokens, completion, created, last_used, hits) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 0)",
+                (key, variant, engine, prompt, temperature, max_tokens, completion, now, now))
+            self._evict(now)
+
+    async def get_or_create(
+        self,
+        engine: str,
+        prompt: str,
+        temperature: float,
+        max_tokens: int,
+        create: Callable[[], Awaitable[str]]
+        ) -> str:
+        """ Read-through lookup: returns a cached variant once all variants of the key exist, otherwise awaits
+        <create> (the API call) and stores its completion. In 'read' mode any cached variant is served.
+        The database is accessed in a worker thread, so the event loop is not blocked by SQLite. """
+        if self.mode == "off":
+            return await create()
+        completion = await self._in_thread(self.get, engine, prompt, temperature, max_tokens, complete_only=self.mode == "read-through")
+        if completion is not None:
+            return completion
+        completion = await create()
+        if self.mode == "read-through":
+            await self._in_thread(self.put, engine, prompt, temperature, max_tokens, completion)
+        return completion
+
+    @staticmethod
+    async def _in_thread(function: Callable, *args, **kwargs) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(None, functools.partial(function, *args, **kwargs))
+
+    def _evict(self, now: float) -> None:
+        self._connection.execute("DELETE FROM completions WHERE created < ?", (now - self.ttl,))
+        self._connection.execute(
+            "DELETE FROM completions WHERE rowid IN "
+            "(SELECT rowid FROM completions ORDER BY last_used DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+
+    def evict(self) -> None:
+        """ Removes expired entries and the least recently used entries beyond the size limit. """
+        with self._lock:
+            self._evict(time.time())
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        """ Returns the hit/miss counters of this process and the size of the cache. """
+        total = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
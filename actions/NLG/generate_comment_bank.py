@@ -0,0 +1,141 @@
+import argparse
+import asyncio
+import json
+import logging
+import math
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List
+
+from wordfreq import zipf_frequency
+
+from actions.NLG.comment_bank import DEFAULT_BANK_PATH, JOB_TITLE_COMMENTS, TECHNOLOGY_SKILL_COMMENTS, CommentBank, bank_key
+from actions.NLG.gpt3_connector import GPT3Connector, get_gpt3_connector
+from actions.extraction.skill_index import get_skill_index
+
+# Catalogues whose titles the actions comment on as technology skills (see SKILL_INTEREST_POLICY) and as job titles
+TECHNOLOGY_SKILL_CATALOGUES = [("emsi", "emsi_skills.csv"), ("edyoucated", "edyoucated_skills.csv")]
+JOB_TITLE_CATALOGUE = ("onet", "onet_alternate_titles_normalized.csv")
+
+
+def _display_titles(skill_domain: str, filename: str) -> List[str]:
+    """ Returns the display titles of a catalogue (as the actions show and comment them), without duplicates. """
+    try:
+        skill_index = get_skill_index(skill_domain, filename)
+    except FileNotFoundError:
+        logging.warning(f"Skipping {filename}, it does not exist.")
+        return []
+    return list(dict.fromkeys(record.title for record in skill_index.registry.records.values()))
+
+
+def technology_skill_titles() -> List[str]:
+    titles = []
+    for skill_domain, filename in TECHNOLOGY_SKILL_CATALOGUES:
+        titles += _display_titles(skill_domain, filename)
+    return list(dict.fromkeys(titles))
+
+
+def job_titles(top: int) -> List[str]:
+    """ Returns the <top> most frequent O*NET titles.
+
+    There are no usage counts of the titles, so titles are ranked by their rarest word instead: how many titles
+    of the catalogue contain it (log) plus its frequency in English text (wordfreq). Titles made of common
+    job title words like 'Sales Manager' come first, rare and idiomatic titles like 'Make Up Man' last.
+    """
+    titles = _display_titles(*JOB_TITLE_CATALOGUE)
+    title_counts = Counter(word for title in titles for word in set(title.lower().split()))
+
+    def frequency(title: str) -> float:
+        words = title.lower().split()
+        if not words:
+            return float("-inf")
+        return min(math.log(title_counts[word]) for word in words) + min(zipf_frequency(word, "en") for word in words)
+
+    return sorted(titles, key=frequency, reverse=True)[:top]
+
+
+async def _generate(connector: GPT3Connector, kind: str, title: str, variants: int) -> List[str]:
+    """ Requests completions for a title from the API (bypassing the completion cache) and keeps those the
+    post-processing of the connector accepts. """
+    completions = []
+    for _ in range(variants):
+        try:
+            completions.append(await connector.generate_comment(kind, title, use_cache=False))
+        except ValueError as e:
+            logging.warning(f"Discarding {e}")
+    return completions
+
+
+async def generate_comment_bank(
+    titles: Dict[str, List[str]],
+    path: Path = DEFAULT_BANK_PATH,
+    variants: int = 2,
+    concurrency: int = 4,
+    connector: GPT3Connector = None
+    ) -> int:
+    """ Generates the comments of all titles (per kind of comment) that are not in the bank file yet
+    and appends them to it. Returns the number of titles added.
+
+    The bank is resumable: titles with enough completions in the file are skipped, every title is written
+    as soon as its completions are complete, so an interrupted run continues where it stopped.
+    At most <concurrency> titles are generated at once (the connector additionally limits the requests in flight).
+    """
+    connector = connector or get_gpt3_connector()
+    bank = CommentBank.load(path)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    todo = []
+    for kind, kind_titles in titles.items():
+        for title in kind_titles:
+            missing = variants - len(bank.completions.get((kind, bank_key(title)), []))
+            if missing > 0:
+                todo.append((kind, title, missing))
+    logging.info(f"Generating comments for {len(todo)} titles")
+
+    async def generate(kind: str, title: str, missing: int):
+        async with semaphore:
+            try:
+                return kind, title, await _generate(connector, kind, title, missing)
+            except Exception as e:
+                logging.warning(f"Couldn't generate comments for {title}: {e}")
+                return kind, title, []
+
+    added = 0
+    with open(path, "a", encoding="utf-8") as f:
+        for result in asyncio.as_completed([generate(*item) for item in todo]):
+            kind, title, completions = await result
+            if completions:
+                f.write(json.dumps({"kind": kind, "title": title, "completions": completions}, ensure_ascii=False) + "\n")
+                f.flush()
+                added += 1
+    await connector.aclose()
+    return added
+
+
+def main(args: List[str] = None) -> None:
+    """ Command line wrapper around <generate_comment_bank>. """
+    parser = argparse.ArgumentParser(description="Generates GPT-3 comments for known skills and job titles ahead of time.")
+    parser.add_argument("--output", default=str(DEFAULT_BANK_PATH), help="bank file (JSONL), extended if it exists")
+    parser.add_argument("--variants", type=int, default=2, help="completions per title")
+    parser.add_argument("--concurrency", type=int, default=4, help="titles generated at once")
+    parser.add_argument("--job-titles", type=int, default=1000, help="number of most frequent O*NET titles")
+    parser.add_argument("--limit", type=int, default=None, help="at most this many titles per kind (e.g. for a trial run)")
+    parser.add_argument("--dry-run", action="store_true", help="only print the number of titles per kind")
+    args = parser.parse_args(args)
+    logging.basicConfig(level=logging.INFO)
+
+    titles = {
+        TECHNOLOGY_SKILL_COMMENTS: technology_skill_titles()[:args.limit],
+        JOB_TITLE_COMMENTS: job_titles(args.job_titles)[:args.limit],
+    }
+    if args.dry_run:
+        for kind, kind_titles in titles.items():
+            print(f"{kind}: {len(kind_titles)} titles, e.g. {', '.join(kind_titles[:5])}")
+        return
+
+    added = asyncio.run(generate_comment_bank(titles, Path(args.output), args.variants, args.concurrency))
+    print(f"Added {added} titles to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,126 @@
 
+import asyncio
 import os
-import openai
+import sqlite3
+import threading
+from typing import Optional
+
+import httpx
 from dotenv import dotenv_values
 import logging
 from pathlib import Path
 
+from actions.NLG.comment_bank import JOB_TITLE_COMMENTS, TECHNOLOGY_SKILL_COMMENTS, get_comment_bank
+from actions.NLG.completion_cache import DEFAULT_CACHE_PATH, CompletionCache
+
+# Settings, read from the environment or the .env file next to this module
+DEFAULT_API_BASE = "https://api.openai.com/v1"
+DEFAULT_TIMEOUT = 15.0
+DEFAULT_MAX_CONCURRENCY = 8
+
+# Errors of a completion that callers should recover from: the deadline passed or the API call failed
+COMPLETION_ERRORS = (asyncio.TimeoutError, httpx.HTTPError)
+
 class GPT3Connector():
-    """ Text completion using the OpenAI GPT-3 API (see https://beta.openai.com/docs/api-reference/introduction) """
+    """ Text completion using the OpenAI GPT-3 API (see https://beta.openai.com/docs/api-reference/introduction)
+
+    Use the process-wide connector of <get_gpt3_connector>: it keeps a pool of keep-alive HTTP connections,
+    limits the number of completions in flight and cancels a completion after a deadline.
+    The gpt3_* methods are coroutines, so async actions do not block the action server while waiting for the API.
+    """
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        api_base: Optional[str] = None,
+        timeout: Optional[float] = None,
+        max_concurrency: Optional[int] = None,
+        cache: Optional[CompletionCache] = None
+        ) -> None:
+        """
+        Args:
+            api_key: by default OPENAI_API_KEY (environment or .env file)
+            api_base: base URL of the API, e.g. a local stub server for tests (default: OPENAI_API_BASE or the OpenAI API)
+            timeout: deadline in seconds per completion, including the wait for a free slot (default: GPT3_TIMEOUT)
+            max_concurrency: completions in flight at most (default: GPT3_MAX_CONCURRENCY)
+            cache: completion cache of the comments, by default configured with the GPT3_CACHE_* settings
+                (GPT3_CACHE_MODE=off disables it), completions of prompts with answers of the user are never cached
+        """
         curr_path = Path(__file__).resolve().parent
         filepath = curr_path.joinpath(".env")
-        config = dotenv_values(filepath)
-        if "OPENAI_API_KEY" in config:
-            openai.api_key = config["OPENAI_API_KEY"]
-        else:
+        config = {**dotenv_values(filepath), **os.environ}
+
+        self.api_key = api_key or config.get("OPENAI_API_KEY")
+        if not self.api_key:
             logging.warning("Couldn't find OPENAI API Key.")
             raise RuntimeError() 
+        self.api_base = (api_base or config.get("OPENAI_API_BASE") or DEFAULT_API_BASE).rstrip("/")
+        self.timeout = float(timeout or config.get("GPT3_TIMEOUT") or DEFAULT_TIMEOUT)
+        self.max_concurrency = int(max_concurrency or config.get("GPT3_MAX_CONCURRENCY") or DEFAULT_MAX_CONCURRENCY)
+
+        self.cache = cache
+        if cache is None and config.get("GPT3_CACHE_MODE", "read-through") != "off":
+            try:
+                self.cache = CompletionCache(
+                    path=config.get("GPT3_CACHE_PATH") or DEFAULT_CACHE_PATH,
+                    variants=int(config.get("GPT3_CACHE_VARIANTS", 3)),
+                    ttl=float(config.get("GPT3_CACHE_TTL", 30 * 24 * 3600)),
+                    max_entries=int(config.get("GPT3_CACHE_MAX_ENTRIES", 10000)),
+                    mode=config.get("GPT3_CACHE_MODE", "read-through"))
+            except (sqlite3.Error, OSError) as e:
+                logging.warning(f"Couldn't open the completion cache, completions are not cached: {e}")
+
+        # created on first use, inside the event loop of the action server
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.api_base,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                limits=httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency),
+                # the deadline of <_complete> covers the whole call
+                timeout=httpx.Timeout(None))
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    async def _complete(
+        self,
+        engine: str,
+        prompt: str,
+        temperature: float,
+        max_tokens: int,
+        top_p: float = 1,
+        n: int = 1,
+        use_cache: bool = True
+        ) -> str:
+        """ Returns the text of a completion, from the completion cache if possible (and use_cache is set).
+        Raises asyncio.TimeoutError if the API call takes longer than the deadline. """
+        client = self._get_client()
+
+        async def request() -> str:
+            async with self._semaphore:
+                response = await client.post(f"/engines/{engine}/completions", json={
+                    "prompt": prompt,
+                    "temperature": temperature,
+                    "max_tokens": max_tokens,
+                    "top_p": top_p,
+                    "n": n,
+                })
+                response.raise_for_status()
+                return response.json()["choices"][0]["text"]
+
+        create = lambda: asyncio.wait_for(request(), timeout=self.timeout)
+        if use_cache and self.cache is not None:
+            return await self.cache.get_or_create(engine, prompt, temperature, max_tokens, create)
+        return await create()
+
+    async def aclose(self) -> None:
+        """ Closes the pooled connections. """
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
 
     def _limit_input_length(self, text) -> str:
@@ -79,18 +183,46 @@ class GPT3Connector():
                 text, text
         )
     
-    def gpt3_comment_technology_skill(self, text:str, more_than_one_skill:bool) -> str:
+    async def generate_comment(self, kind:str, text:str, use_cache:bool = False) -> str:
+        """ Requests a new comment of the given kind (TECHNOLOGY_SKILL_COMMENTS or JOB_TITLE_COMMENTS) on a title
+        from GPT-3, without looking it up in the comment bank. Returns the completion before the post-processing,
+        as it is stored in the comment bank. Raises a ValueError if the completion can't be post-processed. """
+        text = self._limit_input_length(text)
+        if kind == TECHNOLOGY_SKILL_COMMENTS:
+            completion = await self._complete_comment_technology_skill(text, use_cache=use_cache)
+            postprocess = lambda: self._postprocess_comment_technology_skill(text, completion, False)
+        elif kind == JOB_TITLE_COMMENTS:
+            completion = await self._complete_comment_job_title(text, use_cache=use_cache)
+            postprocess = lambda: self._postprocess_comment_job_title(completion)
+        else:
+            raise ValueError(f"invalid kind of comment: {kind}")
+        try:
+            postprocess()
+        except Exception as e:
+            raise ValueError(f"unusable completion for {text}: {completion!r}") from e
+        return completion
+
+    async def gpt3_comment_technology_skill(self, text:str, more_than_one_skill:bool) -> str:
         """ Let GPT-3 comment on one of the extracted technology skills the user is interested in. """
         text = self._limit_input_length(text)
-        response = openai.Completion.create(
+        completion = get_comment_bank().get(TECHNOLOGY_SKILL_COMMENTS, text)
+        if completion is None:
+            completion = await self._complete_comment_technology_skill(text)
+        return self._postprocess_comment_technology_skill(text, completion, more_than_one_skill)
+
+    async def _complete_comment_technology_skill(self, text:str, use_cache:bool = True) -> str:
+        return await self._complete(
             engine= "text-davinci-002",   #"text-davinci-002",
             prompt=self._generate_prompt_comment_technology_skill(text),
             temperature=0.6,
             max_tokens=256,
             top_p=1,
-            n=1
+            n=1,
+            use_cache=use_cache
         )
-        comment:str = response.choices[0].text
+
+    def _postprocess_comment_technology_skill(self, text:str, completion:str, more_than_one_skill:bool) -> str:
+        comment:str = completion
         comment = comment.replace('\n', '').strip()
 
         # Tune output
@@ -105,53 +237,67 @@ class GPT3Connector():
             comment = "I think " + comment + " 🤓"
         return comment
 
-    def gpt3_summarize_tasks(self, text:str) -> str:
+    async def gpt3_summarize_tasks(self, text:str) -> str:
         """ Let GPT-3 extract work tasks from the input text and list it in bullet points. """
         text = self._limit_input_length(text)
-        response = openai.Completion.create(
+        completion = await self._complete(
             engine= "text-curie-001",   #"text-davinci-002",
             prompt=self._generate_prompt_summarize_tasks(text),
             temperature=0.6,
             max_tokens=256,
             top_p=1,
-            n=1
+            n=1,
+            use_cache=False     # the prompt holds the answer of the user, which must not be stored
         )
+        return self._postprocess_summarize_tasks(completion)
 
-        tasks = str(response.choices[0].text)
+    def _postprocess_summarize_tasks(self, completion:str) -> str:
+        tasks = str(completion)
         tasks = "-" + tasks
         tasks = tasks.strip()
         return tasks
 
-    def gpt3_guess_job_title(self, text:str) -> str:
+    async def gpt3_guess_job_title(self, text:str) -> str:
         """ Let GPT-3 guess the job title corresponding to tasks given as input. """
         text = self._limit_input_length(text)
-        response = openai.Completion.create(
+        completion = await self._complete(
             engine= "text-davinci-002",
             prompt=self._generate_prompt_guess_job_title(text),
             temperature=0.6,
             max_tokens=256,
             top_p=1,
-            n=1
+            n=1,
+            use_cache=False     # the prompt holds the answer of the user, which must not be stored
         )
+        return self._postprocess_guess_job_title(completion)
 
-        job_title_guess:str = response.choices[0].text
+    def _postprocess_guess_job_title(self, completion:str) -> str:
+        job_title_guess:str = completion
         job_title_guess = (job_title_guess.replace('.', '').replace('\n', '').title()).strip()
         return job_title_guess
 
-    def gpt3_comment_job_title(self, text:str) -> str:
+    async def gpt3_comment_job_title(self, text:str) -> str:
         """ Let GPT-3 guess the job title corresponding to tasks given as input. """
         text = self._limit_input_length(text)
-        response = openai.Completion.create(
+        completion = get_comment_bank().get(JOB_TITLE_COMMENTS, text)
+        if completion is None:
+            completion = await self._complete_comment_job_title(text)
+        return self._postprocess_comment_job_title(completion)
+
+    async def _complete_comment_job_title(self, text:str, use_cache:bool = True) -> str:
+        return await self._complete(
             engine= "text-davinci-002",   #"text-davinci-002",
             prompt=self._generate_prompt_comment_job_title(text),
             temperature=0.75,
             max_tokens=200,
             top_p=1,
-            n=1
+            n=1,
+            use_cache=use_cache
         )
-        
+
+    def _postprocess_comment_job_title(self, completion:str) -> str:
         # postprocess GPT-3 output
-        comment:str = response.choices[0].text
+        comment:str = completion
         comment = comment.replace('\n', '').strip()
         if comment.startswith("Ai:"):
             comment = comment[3:]
@@ -166,27 +312,40 @@ class GPT3Connector():
 
         return comment
 
+
+_connector: Optional[GPT3Connector] = None
+_connector_lock = threading.Lock()
+
+def get_gpt3_connector() -> GPT3Connector:
+    """ Returns the process-wide GPT3Connector, created (and configured) on first use. """
+    global _connector
+    if _connector is None:
+        with _connector_lock:
+            if _connector is None:
+                _connector = GPT3Connector()
+    return _connector
+
     
 
 # Test individual methods
 
 
 # #%%
-# connector = GPT3Connector()
+# connector = get_gpt3_connector()
 
 # #%%
-# response = connector.gpt3_summarize_tasks("Communicate and coordinate with management, shareholders, customers, and employees to address sustainability issues. Enact or oversee a corporate sustainability strategy.")
+# response = asyncio.run(connector.gpt3_summarize_tasks("Communicate and coordinate with management, shareholders, customers, and employees to address sustainability issues. Enact or oversee a corporate sustainability strategy."))
 # #%%
-# job_title_guess = connector.gpt3_guess_job_title(response)
+# job_title_guess = asyncio.run(connector.gpt3_guess_job_title(response))
 # #%%
-# comment = connector.gpt3_comment_job_title("Software Engineer")
+# comment = asyncio.run(connector.gpt3_comment_job_title("Software Engineer"))
 # # %%
-# comment = connector.gpt3_comment_job_title("Corporate Sustainability Officer")
+# comment = asyncio.run(connector.gpt3_comment_job_title("Corporate Sustainability Officer"))
 # print(comment)
 # #%%
-# comment = connector.gpt3_comment_job_title(job_title_guess)
+# comment = asyncio.run(connector.gpt3_comment_job_title(job_title_guess))
 # print(comment)
 
 # #%%
-# comment = connector.gpt3_comment_technology_skill("Excel", more_than_one_skill=False)
+# comment = asyncio.run(connector.gpt3_comment_technology_skill("Excel", more_than_one_skill=False))
 # print(comment)
@@ -6,96 +6,91 @@
 
 
 import logging
-from typing import Any, Text, Dict, List, Tuple
+from abc import ABCMeta, abstractmethod
+from typing import Any, Text, Dict, List, Sequence, Tuple
 import os
-from time import sleep
 import spacy
 import re
 from datetime import datetime
 import random
 from copy import copy
 
-import pandas as pd
-
 from rasa_sdk import Action, Tracker
 from rasa_sdk.executor import CollectingDispatcher
 from rasa_sdk.events import SlotSet, UserUtteranceReverted
 
-from actions.helper import init_survey, find_last_chatbot_question_in_survey, init_skills_df, delay_dispatcher_utterance, _find_latest_bot_question
-from actions.NLG.gpt3_connector import GPT3Connector
+from actions.helper import get_survey, find_last_chatbot_question_in_survey, DelayScheduler, run_in_thread, utterance_delay, _find_latest_bot_question
+from actions.NLG.gpt3_connector import COMPLETION_ERRORS, get_gpt3_connector
+from actions.NLG.comment_bank import preload_comment_bank
 from actions.evaluation.metrics import PerformanceEvaluator
-from actions.extraction.extractor import extract_strings_from_text
+from actions.extraction.skill_index import SkillIndex, get_skill_index, preload_skill_indexes
+from actions.extraction.cascade import CascadePolicy, CascadeStep
+from actions.extraction.shadow import ShadowMode
+from actions.recommendation.recommender import get_recommender, preload_recommender
+from actions.catalogue_manager import start_catalogue_watcher
     
 CHATBOT_NAMES = ["Eddy", "eddy", "Edy", "edy", "ed", "Ed"]
 
-def init_skills_from_dataframe(skill_domain: str, skills_df: pd.DataFrame) -> List[str]:
-
-    if skill_domain=="emsi":
-        skills: List[str] = skills_df["emsi_skill_title_normalized"].tolist()
-
-    elif skill_domain=="onet":
-        skills: List[str] = skills_df["title_normalized"].tolist()
+# Skill extraction for interests: EMSI skills, if no skills can be identified -> try lower cutoff (experimental),
+# if still no skills identified -> edyoucated skills
+SKILL_INTEREST_POLICY = CascadePolicy([
+    CascadeStep("emsi", "emsi_skills.csv", 90),
+    CascadeStep("emsi", "emsi_skills.csv", 87),
+    CascadeStep("edyoucated", "edyoucated_skills.csv", 90),
+])
+
+# Build the skill catalogue indexes once when the action server starts (instead of on every user turn)
+preload_skill_indexes()
+preload_recommender()
+preload_comment_bank()
+# Pick up changes of the skill CSV files and survey.yaml without restarting the action server
+# (only if CATALOGUE_RELOAD_INTERVAL is set, e.g. in the Docker image, not in scripts and tests importing the actions)
+start_catalogue_watcher()
+
+# Compare the served extraction with the legacy extraction on sampled messages (EXTRACTION_SHADOW_* variables)
+SHADOW_MODE = ShadowMode.from_env()
 
-    elif skill_domain=="edyoucated":
-        skills: List[str] = skills_df["skill_titles_normalized"].tolist()
-        abbreviations = skills_df["skill_title_abbreviation"].tolist()
-        abbreviations = [x for x in abbreviations if x is not None]
-
-        skills.extend(abbreviations)
-        skills = [x for x in skills if x == x]  # eliminate np.nan values
-    else:
-        raise ValueError("invalid skill_domain specified as argument")
-
-    return skills
-    
 def init_skills_and_extract(
     user_input:str, 
     filename:str = "emsi_technology_skills.csv", 
     skill_domain:str = "emsi",
-    cutoff:int = 90
-    ) -> Tuple[List[str], pd.DataFrame, List[str], List[str]]:
-    """ Initializes a dataframe with relevant skills to extract skills from the latest user message.
+    cutoff:int = 90,
+    engine:str = "legacy",
+    segmentation:str = "greedy"
+    ) -> Tuple[List[str], Sequence[str], List[str]]:
+    """ Extracts skills from the latest user message, using the (cached) index of the given skill catalogue.
+    Returns the display titles of the identified skills, the titles of the catalogue and the matched (normalized) titles.
     
     Args:
         filename: CSV file with skills: e.g., 'edyoucated_skills.csv' or 'onet_alternate_titles_normalized.csv'
         skill_domain: Either 'emsi' or 'edyoucated' or 'onet', dependent on skill CSV file
         cutoff: cutoff value for fuzzy string matching
+        engine: extraction engine, see <SkillIndex.extract>
+        segmentation: 'greedy' or 'optimal' selection of the matches, see <SkillIndex.extract>
     """
     
-    skills_df = init_skills_df(filename=filename)
-    skills = init_skills_from_dataframe(skill_domain, skills_df)
+    skill_index = get_skill_index(skill_domain, filename)
 
     # Preprocess latest user input and extract skills
-    results = extract_strings_from_text(user_input, skills, cutoff=cutoff)
+    settings = {"engine": engine, "segmentation": segmentation}
+    results = skill_index.extract(user_input, cutoff=cutoff, **settings)
+    if SHADOW_MODE:
+        SHADOW_MODE.submit(skill_index, user_input, cutoff, settings)
 
     identified_skills = get_identified_skills_from_result(results)
+    identified_skills_normalized = []
 
     # Bring identified skills into nice format
     if identified_skills:
         identified_skills_normalized = copy(identified_skills)
-        identified_skills = reformat_identified_skills(skill_domain, skills_df, identified_skills)
-
-    return identified_skills, skills_df, skills, identified_skills_normalized
-
-def reformat_identified_skills(skill_domain, skills_df, identified_skills):
-    """ Reformat result based on origin of skills. """
-    if skill_domain=="emsi":
-        # get the unnormalized version of each skill
-        identified_skills = skills_df[skills_df['emsi_skill_title_normalized'].isin(identified_skills)]["emsi_skill_title"].tolist()
-        # Remove information in parentheses and trailing whitespace
-        identified_skills = [re.sub("[\(\[].*?[\)\]]", "", skill).strip() for skill in identified_skills]
+        identified_skills = reformat_identified_skills(skill_index, identified_skills)
 
-    elif skill_domain=="onet":
-        identified_skills = skills_df[skills_df['title_normalized'].isin(identified_skills)]["title"].tolist()
-        identified_skills = [re.sub("[\(\[].*?[\)\]]", "", skill).strip() for skill in identified_skills]
+    return identified_skills, skill_index.skills, identified_skills_normalized
 
-    elif skill_domain=="edyoucated":
-        # get the unnormalized version of each skill (prevent duplicates just in case)
-        identified_skills_v1 = skills_df[skills_df['skill_titles_normalized'].isin(identified_skills)]["skill_titles"].tolist()
-        identified_skills_v2 = skills_df[skills_df['skill_title_abbreviation'].isin(identified_skills)]["skill_titles"].tolist()
-        identified_skills = list(set(identified_skills_v1.extend(identified_skills_v2)))
-
-    return identified_skills
+def reformat_identified_skills(skill_index: SkillIndex, identified_skills: List[str]) -> List[str]:
+    """ Reformat result based on origin of skills: returns the display titles (without information in parentheses)
+    of the matched normalized titles or abbreviations, in the order the skills were mentioned. """
+    return skill_index.registry.canonical_titles(identified_skills)
 
 def get_identified_skills_from_result(results: List[List[dict]]) -> List[str]:
     identified_skills = []
@@ -109,34 +104,24 @@ def get_identified_skills_from_result(results: List[List[dict]]) -> List[str]:
 
 
 
-def extract_skills_from_user_input(tracker: Tracker) -> Tuple(List[str], List[str]):
+def extract_skills_from_user_input(tracker: Tracker) -> Tuple[List[str], List[str]]:
+    """ Extracts skills from the latest user message with the cascade of SKILL_INTEREST_POLICY. """
 
-    identified_skills, _, _, identified_skills_normalized = init_skills_and_extract(
-            tracker_latest_user_message(tracker), filename="emsi_skills.csv")
-        
-    # Sad path - no skills could be identified -> try lower cutoff (experimental)
-    if not identified_skills:
-        identified_skills, _, _, identified_skills_normalized = init_skills_and_extract(
-                tracker_latest_user_message(tracker), filename="emsi_skills.csv", skill_domain="emsi", cutoff=87)
-
-    # if still no skills identified
-    if not identified_skills:
-        identified_skills, _, _, identified_skills_normalized = init_skills_and_extract(
-                tracker_latest_user_message(tracker), filename="edyoucated_skills.csv", skill_domain="edyoucated", cutoff=90)
+    user_input = tracker_latest_user_message(tracker)
+    results, step = SKILL_INTEREST_POLICY.extract(user_input)
+    if SHADOW_MODE:
+        SHADOW_MODE.submit_cascade(SKILL_INTEREST_POLICY, user_input)
+
+    identified_skills = get_identified_skills_from_result(results)
+    identified_skills_normalized = []
+
+    # Bring identified skills into nice format
+    if identified_skills:
+        identified_skills_normalized = copy(identified_skills)
+        identified_skills = reformat_identified_skills(get_skill_index(step.skill_domain, step.filename), identified_skills)
             
     return identified_skills, identified_skills_normalized
 
-def _is_any_skill_in_tags(tags: str, skills: List[str]) -> bool:
-    """ Helper function for ActionProcessLearningGoals. 
-    
-    Args:
-        tags: string with skill tags seperated by comma
-    """
-    for skill in skills:
-        if skill in str(tags):
-            return True
-    return False
-
 def tracker_latest_user_message(tracker: Tracker) -> str:
     """ Substitute for 'tracker.latest_message["text"]'. Ignores messages that start with / """
     events = tracker.events
@@ -175,6 +160,30 @@ def _contains_no_information_intent_keyword(tracker: Tracker) -> bool:
     else:
         return False
 
+class DelayedAction(Action, metaclass=ABCMeta):
+    """ Action whose utterances are delayed like a typing human (see <DelayScheduler>).
+    Subclasses implement <process> instead of run and declare the <delay> in seconds (or override <target_delay>).
+    The delay is counted from the start of the action, the work of <process> overlaps with it.
+    (Abstract, so that the action server does not register it as an action itself.) """
+    delay: float = 0
+
+    def target_delay(self, tracker: Tracker) -> float:
+        return self.delay
+
+    async def run(self, dispatcher: CollectingDispatcher,
+            tracker: Tracker,
+            domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+        scheduler = DelayScheduler(dispatcher)
+        events = await self.process(dispatcher, tracker, domain)
+        await scheduler.wait(self.target_delay(tracker))
+        return events
+
+    @abstractmethod
+    async def process(self, dispatcher: CollectingDispatcher,
+            tracker: Tracker,
+            domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+        """ The work of the action, returns its events. """
+
 class ActionHelloWorld(Action):
     """ Custom Action template. """
     # make link to domain file
@@ -253,17 +262,17 @@ class ActionIdentifyUserName(Action):
             return [SlotSet(key = "user_name_identified", value = False)]
 
 
-class ActionIdentifyTechnologyInterest(Action):
+class ActionIdentifyTechnologyInterest(DelayedAction):
     """ Extract (technology-related) EMSI Skills from user input. """
     
     def name(self) -> Text:
         return "action_identify_technology_interests"
 
-    def run(self, dispatcher: CollectingDispatcher,
+    delay = 3
+
+    async def process(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
-
-        sleep(3)
         latest_user_intent = tracker.get_intent_of_latest_message()
 
         if latest_user_intent == "deny":
@@ -273,16 +282,20 @@ class ActionIdentifyTechnologyInterest(Action):
                 dispatcher.utter_message(text = "No particular technology interests? No problem 👌")
             return [SlotSet(key = "technology_skill_interests", value = [])]
 
-        identified_skills, identified_skills_normalized = extract_skills_from_user_input(tracker)
+        identified_skills, identified_skills_normalized = await run_in_thread(extract_skills_from_user_input, tracker)
 
         # Happy path - skills could be identified
         if identified_skills:
             skills_copy = identified_skills.copy()
             # Comment on one of the identified skills using GPT-3
             more_than_one = True if len(identified_skills) >= 2 else False
-            conn = GPT3Connector()
-            comment = conn.gpt3_comment_technology_skill(skills_copy[0], more_than_one_skill=more_than_one)
-            comment_on_skill = "If you ask me, " + comment
+            conn = get_gpt3_connector()
+            try:
+                comment = await conn.gpt3_comment_technology_skill(skills_copy[0], more_than_one_skill=more_than_one)
+                comment_on_skill = "If you ask me, " + comment
+            except COMPLETION_ERRORS as e:
+                logging.warning(f"Couldn't comment on the technology skill with GPT-3: {e!r}")
+                comment_on_skill = ""
 
             tech_savvy = "You seem to be quite tech-savvy 😎\n"
             if len(identified_skills) == 1:
@@ -296,7 +309,7 @@ class ActionIdentifyTechnologyInterest(Action):
                 text_message = (f"I see that you're interested in {skills} and {last_skill}. "
                                 "You might be more tech-savvy than me... a robot 🤯\n" + comment_on_skill)
 
-            dispatcher.utter_message(text=text_message)
+            dispatcher.utter_message(text=text_message.strip())
             # TODO: Integrate business integration capability by also mapping to edyoucated ontology
             return [SlotSet(key = "technology_skill_interests", value = identified_skills_normalized)]
 
@@ -308,17 +321,17 @@ class ActionIdentifyTechnologyInterest(Action):
             return [SlotSet(key = "technology_skill_interests", value = [])]
         
 
-class ActionIdentifyGeneralInterests(Action):
+class ActionIdentifyGeneralInterests(DelayedAction):
     """ Extract interests and reply by generating a response with GPT-3. """
 
     def name(self) -> Text:
         return "action_identify_general_interests"
 
-    def run(self, dispatcher: CollectingDispatcher,
+    delay = 3
+
+    async def process(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
-        
-        sleep(3)
         latest_user_intent = tracker.get_intent_of_latest_message()
         tech_interests = tracker.get_slot(key="technology_skill_interests")
 
@@ -339,7 +352,7 @@ class ActionIdentifyGeneralInterests(Action):
             return [SlotSet(key = "other_skill_interests", value = [])]
 
         else:
-            identified_skills, identified_skills_normalized = extract_skills_from_user_input(tracker)
+            identified_skills, identified_skills_normalized = await run_in_thread(extract_skills_from_user_input, tracker)
 
             # Happy path - skills could be identified
             if identified_skills:
@@ -375,7 +388,7 @@ class ActionIdentifyTasks(Action):
     def name(self) -> Text:
         return "action_identify_tasks"
 
-    def run(self, dispatcher: CollectingDispatcher,
+    async def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         
@@ -390,24 +403,28 @@ class ActionIdentifyTasks(Action):
             return [SlotSet(key="tasks_user_input", value=""),
             SlotSet(key="tasks_gpt3", value="")]
 
-        conn = GPT3Connector()
-        tasks = conn.gpt3_summarize_tasks(latest_user_message)
+        conn = get_gpt3_connector()
+        try:
+            tasks = await conn.gpt3_summarize_tasks(latest_user_message)
+        except COMPLETION_ERRORS as e:
+            logging.warning(f"Couldn't summarize the tasks with GPT-3: {e!r}")
+            tasks = ""
         
         return [SlotSet(key="tasks_user_input", value=tracker_latest_user_message(tracker)),
                 SlotSet(key="tasks_gpt3", value=tasks)]
 
-class ActionGuessJobTitle(Action):
+class ActionGuessJobTitle(DelayedAction):
     """ Guess job title based on tasks at work (with GPT-3). """
 
     def name(self) -> Text:
         return "action_guess_job_title"
 
-    def run(self, dispatcher: CollectingDispatcher,
+    delay = 3
+
+    async def process(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         tasks = tracker.get_slot(key="tasks_user_input")
-        
-        sleep(3)
 
         # in case user didn't give any tasks (deny, skip)
         if not tasks:
@@ -415,8 +432,12 @@ class ActionGuessJobTitle(Action):
 
         text = "Thanks for telling me a bit about your job 🙂\nI have an idea. Let me try to guess your job title based on that! 😁"
 
-        conn = GPT3Connector()
-        job_title_guess:str = conn.gpt3_guess_job_title(tasks)
+        conn = get_gpt3_connector()
+        try:
+            job_title_guess:str = await conn.gpt3_guess_job_title(tasks)
+        except COMPLETION_ERRORS as e:
+            logging.warning(f"Couldn't guess the job title with GPT-3: {e!r}")
+            job_title_guess = ""
 
         # TODO: Validate Job Title with O*NET list?
 
@@ -465,17 +486,17 @@ class ActionProcessFeedbackJobTitle(Action):
 
         return [SlotSet(key="guessed_correctly", value=False)]
 
-class ActionProcessJobTitle(Action):
+class ActionProcessJobTitle(DelayedAction):
     """ Extract user's job title from input and comment it with GPT-3. """
 
     def name(self) -> Text:
         return "action_process_job_title"
 
-    def run(self, dispatcher: CollectingDispatcher,
+    delay = 2
+
+    async def process(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
-
-        sleep(2)
         logging.info("Processing job title...")
         latest_user_intent = tracker.get_intent_of_latest_message()
 
@@ -491,11 +512,13 @@ class ActionProcessJobTitle(Action):
 
             # If NER failed, try fuzzy lookup in O*NET titles
             if not job_title:
-                identified_jobs, _, _, _ = init_skills_and_extract(
+                identified_jobs, _, _ = await run_in_thread(
+                    init_skills_and_extract,
                     tracker_latest_user_message(tracker), 
                     filename="onet_alternate_titles_normalized.csv", 
                     skill_domain="onet", 
-                    cutoff=92)
+                    cutoff=92,
+                    engine="batched")   # uses the trigram index of the O*NET titles
                 if identified_jobs:
                     job_title = identified_jobs[0]
                 else:
@@ -507,10 +530,14 @@ class ActionProcessJobTitle(Action):
                 vowels = ["a","e","i","o","u"]
                 article = "an" if job_title[0].lower() in vowels else "a"
 
-                conn = GPT3Connector()
-                positive_comment:str = conn.gpt3_comment_job_title(job_title)
+                conn = get_gpt3_connector()
+                try:
+                    positive_comment:str = await conn.gpt3_comment_job_title(job_title)
+                except COMPLETION_ERRORS as e:
+                    logging.warning(f"Couldn't comment on the job title with GPT-3: {e!r}")
+                    positive_comment = ""
 
-                text = f"You're {article} {job_title}? Awesome! {positive_comment}"
+                text = f"You're {article} {job_title}? Awesome! {positive_comment}".strip()
                 dispatcher.utter_message(text)
                 return [SlotSet(key="job_title", value=job_title)]
             else:
@@ -518,16 +545,18 @@ class ActionProcessJobTitle(Action):
                 dispatcher.utter_message(text="Alright, got it 😀")
                 return [SlotSet(key="job_title", value="")]
 
-class ActionCommentExperience(Action):
+class ActionCommentExperience(DelayedAction):
     """ NOT IMPLEMENTED YET """
 
     def name(self) -> Text:
         return "action_comment_experience"
 
-    def run(self, dispatcher: CollectingDispatcher,
+    def target_delay(self, tracker: Tracker) -> float:
+        return utterance_delay(latest_user_message=tracker_latest_user_message(tracker))
+
+    async def process(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
-        delay_dispatcher_utterance(latest_user_message=tracker_latest_user_message(tracker))
 
         latest_user_intent = tracker.get_intent_of_latest_message()
 
@@ -542,18 +571,18 @@ class ActionCommentExperience(Action):
             logging.info("===Logic for ActionCommentExperience is yet to be implemented===s")
             return [SlotSet(key = "work_experience", value = tracker_latest_user_message(tracker))]
 
-class ActionProcessLearningGoals(Action):
+class ActionProcessLearningGoals(DelayedAction):
     """ Extract Skills from user input and 
     try to recommend suitable Learning Paths. """
 
     def name(self) -> Text:
         return "action_process_learning_goals"
 
-    def run(self, dispatcher: CollectingDispatcher,
+    delay = 2
+
+    async def process(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
-
-        sleep(2)
         logging.info("Processing learning goals...")
 
         latest_user_intent = tracker.get_intent_of_latest_message()
@@ -563,29 +592,20 @@ class ActionProcessLearningGoals(Action):
                 dispatcher.utter_message(response="utter_skipping_question")
             else:
                 dispatcher.utter_message(text = "No learning goals yet? No problem! I'll try my best to find some learing content you might be interested in based on our conversation 😇")
-            return [SlotSet(key = "learning_goals", value = [])]
+            return [SlotSet(key = "learning_goals", value = []), SlotSet(key = "learning_goals_normalized", value = [])]
 
         else:
-            identified_skills, _, _, identified_skills_normalized = init_skills_and_extract(
-                tracker_latest_user_message(tracker), filename="emsi_skills.csv", skill_domain="emsi")
+            identified_skills, _, identified_skills_normalized = await run_in_thread(
+                init_skills_and_extract, tracker_latest_user_message(tracker), filename="emsi_skills.csv", skill_domain="emsi")
             logging.info(f"Identified skills: {identified_skills_normalized}")
 
-            # Try to map edyoucated skill titles to the identified skills
-            skills_df = init_skills_df(filename="edyoucated_skills.csv")
-            df_filtered = skills_df[skills_df.apply(
-                lambda x: _is_any_skill_in_tags(tags=x["skill_tags"], 
-                skills=identified_skills_normalized), axis=1)]
-
-            skill_recommendations = df_filtered["skill_titles"].unique().tolist()
+            # Recommend the (up to 5) edyoucated learning paths whose tags fit the identified skills best
+            skill_recommendations = get_recommender().recommend(identified_skills_normalized, k=5)
             logging.info(f"Found skill recommendations: {skill_recommendations}")
 
             # Tell user about recommendations
             if skill_recommendations:
                 bullet_list = ""
-                skill_recommendations_copy = skill_recommendations.copy()
-                # Limit to 5 recommendations
-                if len(skill_recommendations) > 5:
-                    skill_recommendations = random.sample(skill_recommendations, 5)
                 # Build bullet point list and bot utterances
                 for skill in skill_recommendations:
                     bullet_list += f"- {skill}\n"
@@ -598,22 +618,25 @@ class ActionProcessLearningGoals(Action):
             else:
                 dispatcher.utter_message(text="Great that you already have something in mind 😇\n I couldn't find any recommendations for that right away, but I'm pretty sure we can support you with that!")
                 identified_skills=[]
+                identified_skills_normalized=[]
 
+            # the display titles are shown to the user, the normalized titles are the tags the recommender matches
             return [SlotSet(key = "learning_goals", value = identified_skills), 
-                SlotSet(key="learning_goal_skill_recommendations", value=skill_recommendations_copy)]
+                SlotSet(key = "learning_goals_normalized", value = identified_skills_normalized),
+                SlotSet(key="learning_goal_skill_recommendations", value=skill_recommendations)]
 
-class ActionProcessCareerGoals(Action):
+class ActionProcessCareerGoals(DelayedAction):
     """ Tries to respond adequately to the user's response and 
     stores the user's answer. """
 
     def name(self) -> Text:
         return "action_process_career_goals"
 
-    def run(self, dispatcher: CollectingDispatcher,
+    delay = 2
+
+    async def process(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
-
-        sleep(2)
         latest_user_intent = tracker.get_intent_of_latest_message()
 
         if latest_user_intent == "deny":
@@ -629,18 +652,18 @@ class ActionProcessCareerGoals(Action):
 
         return [SlotSet(key="career_goals", value=tracker_latest_user_message(tracker))]
 
-class ActionCheckChatbotUsedBefore(Action):
+class ActionCheckChatbotUsedBefore(DelayedAction):
     """ Checks whether a user has used a chatbot before and 
     gives tips on what the chatbot can do. """
     
     def name(self) -> Text:
         return "action_check_chatbot_used_before"
 
-    def run(self, dispatcher: CollectingDispatcher,
+    delay = 3
+
+    async def process(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
-
-        sleep(3)
         logging.info("Checking whether the learner used a chatbot before.")
         latest_user_intent = tracker.get_intent_of_latest_message()
 
@@ -661,17 +684,18 @@ class ActionCheckChatbotUsedBefore(Action):
         else:
             return []
 
-class ActionStartSurvey(Action):
+class ActionStartSurvey(DelayedAction):
     """ React to the check whether the user is ready to start 
     (does not influence story) """
     
     def name(self) -> Text:
         return "action_start_survey"
 
-    def run(self, dispatcher: CollectingDispatcher,
+    delay = 3
+
+    async def process(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
-        sleep(3)
 
         latest_intent = tracker.get_intent_of_latest_message()
         
@@ -684,16 +708,17 @@ class ActionStartSurvey(Action):
         
         return []
 
-class ActionRespondMood(Action):
+class ActionRespondMood(DelayedAction):
     """ (Dynamically) respond to the user's mood. """
 
     def name(self) -> Text:
         return "action_respond_mood"
 
-    def run(self, dispatcher: CollectingDispatcher,
+    delay = 3
+
+    async def process(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
-        sleep(3)
         latest_intent = tracker.get_intent_of_latest_message()
         user_input = tracker_latest_user_message(tracker)
 
@@ -756,7 +781,7 @@ class ActionExplainWhy(Action):
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         
         # Init survey structure
-        survey = init_survey()
+        survey = get_survey()
 
         _, latest_question = find_last_chatbot_question_in_survey(tracker, survey)
 
@@ -783,7 +808,7 @@ class ActionRephraseLastQuestion(Action):
     def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
-        survey = init_survey()
+        survey = get_survey()
 
         _, latest_question = find_last_chatbot_question_in_survey(tracker, survey)
         logging.info(f"Latest survey question was: {latest_question}")
@@ -862,46 +887,30 @@ class ActionEndConversation(Action):
         
         tech_interests:List = tracker.get_slot(key="technology_skill_interests")
         other_interests:List = tracker.get_slot(key="other_skill_interests")
+        learning_goals:List = tracker.get_slot(key="learning_goals_normalized")
         learning_goal_skill_recommendations = tracker.get_slot(key="learning_goal_skill_recommendations")
         logging.info(f"Found tech interests {tech_interests}")
         logging.info(f"Found other interests {other_interests}")
-        if tech_interests:
-            if other_interests:
-                interests = tech_interests + other_interests
-            else:
-                interests = tech_interests
-        elif other_interests:
-            interests = other_interests
-        else:
+        logging.info(f"Found learning goals {learning_goals}")
+        interests = (tech_interests or []) + (other_interests or []) + (learning_goals or [])
+        if not interests:
             # no skills/interests were identified
             dispatcher.utter_message(response="utter_goodbye")  # "Have a nice day :) "
             return [SlotSet(key="engagement_duration", value=engagement_duration)]
 
-        # Try to map edyoucated skill titles to the identified skills
+        # Rank the edyoucated learning paths by how well their tags fit the accumulated interests
         # 'interests' variable is List of normalized skill titles (which are also used to tag edyoucated skills)
-        skills_df = init_skills_df(filename="edyoucated_skills.csv")
-        df_filtered = skills_df[skills_df.apply(
-            lambda x: _is_any_skill_in_tags(tags=x["skill_tags"], 
-            skills=interests), axis=1)]
-
-        skill_recommendations:List[str] = df_filtered["skill_titles"].unique().tolist()
+        # Learning paths that were already recommended for the learning goals are left out (up to 5 recommendations)
+        skill_recommendations:List[str] = get_recommender().recommend(interests, k=5, exclude=learning_goal_skill_recommendations or [])
         logging.info(f"Found skill recommendations: {skill_recommendations}")
 
-        # Tell user about recommendations
-        if skill_recommendations:
-            # remove duplicates (don't recommend learning paths that were already recommended)
-            if learning_goal_skill_recommendations:
-                skill_recommendations = list(set(skill_recommendations) - set(learning_goal_skill_recommendations))
-
-            # no recommendations left
-            if not skill_recommendations:
-                text = "By the way, next up the information you provided will be used by our platform to make personalized learning content recommendations for you! 🙌\nStay tuned for them appearing on your home screen 🤠"
-                dispatcher.utter_message(text=text)
-                return [SlotSet(key="engagement_duration", value=engagement_duration)]
+        # no recommendations left after the ones for the learning goals
+        if not skill_recommendations and learning_goal_skill_recommendations:
+            text = "By the way, next up the information you provided will be used by our platform to make personalized learning content recommendations for you! 🙌\nStay tuned for them appearing on your home screen 🤠"
+            dispatcher.utter_message(text=text)
 
-            # Limit to 5 recommendations
-            if len(skill_recommendations) > 5:
-                    skill_recommendations = random.sample(skill_recommendations, 5)
+        # Tell user about recommendations
+        elif skill_recommendations:
             bullet_list = ""
             for skill in skill_recommendations:
                 bullet_list += f"- {skill}\n"
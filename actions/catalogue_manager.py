@@ -0,0 +1,187 @@
+import logging
+import os
+import pathlib
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from actions.helper import SURVEY_PATH, init_survey, install_survey
+from actions.extraction.catalogue import DEFAULT_CATALOGUE_PATH, SKILL_CSV_DIRECTORY, file_sha256
+from actions.extraction.skill_index import SKILL_CATALOGUES, get_skill_index, install_skill_index, load_skill_index
+
+
+# Seconds between two checks of the watched files, 0 (default) disables the watcher (set in the Dockerfile)
+DEFAULT_RELOAD_INTERVAL = float(os.environ.get("CATALOGUE_RELOAD_INTERVAL", 0))
+
+
+class WatchedResource():
+    """ An in-memory resource (e.g. an index) built from source files, with the version of the current build. """
+
+    def __init__(self, name: str, paths: List[pathlib.Path], build: Callable[[], Any], install: Callable[[Any], None] = None):
+        self.name = name
+        self.paths = [pathlib.Path(path) for path in paths]
+        self.build = build
+        self.install = install
+        self.value: Any = None
+        self.version = 0
+        self.stats: Tuple = ()
+        self.hashes: Tuple = ()
+
+    def file_stats(self) -> Tuple:
+        """ Cheap fingerprint of the source files: modification time and size (None for missing files). """
+        stats = []
+        for path in self.paths:
+            try:
+                stat = path.stat()
+                stats.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                stats.append(None)
+        return tuple(stats)
+
+    def file_hashes(self) -> Tuple:
+        return tuple(file_sha256(path) if path.exists() else None for path in self.paths)
+
+
+class CatalogueManager():
+    """ Keeps in-memory catalogues (skill indexes, survey) up to date with their source files without a restart.
+
+    The source files of every registered resource are checked for changes (modification time and size first,
+    then the content hash, so touching a file does not trigger a rebuild). Changed resources are rebuilt,
+    in a background thread if the manager is started, and swapped in with a single assignment:
+    callers that already hold the previous version keep a consistent snapshot. Each swap increments the
+    version of the resource and calls its install function (e.g. to invalidate caches keyed on the old version).
+    If a rebuild fails, the previous version stays in place and the rebuild is retried on the next check.
+    """
+
+    def __init__(self):
+        self.resources: Dict[str, WatchedResource] = {}
+        self._lock = threading.Lock()
+        self._check_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def register(
+        self,
+        name: str,
+        paths: List[pathlib.Path],
+        build: Callable[[], Any],
+        install: Callable[[Any], None] = None,
+        value: Any = None
+        ) -> WatchedResource:
+        """ Registers a resource with its source files, build and install function.
+
+        Args:
+            value: the already loaded resource, otherwise it is built (and installed) now
+        """
+        resource = WatchedResource(name, paths, build, install)
+        stats, hashes = resource.file_stats(), resource.file_hashes()
+        if value is not None:
+            resource.value = value
+            resource.version = 1
+            resource.stats, resource.hashes = stats, hashes
+        elif self._rebuild(resource):
+            resource.stats, resource.hashes = stats, hashes
+        with self._lock:
+            self.resources[name] = resource
+        return resource
+
+    def get(self, name: str) -> Any:
+        """ Returns the current version of a resource. """
+        return self.resources[name].value
+
+    def version(self, name: str) -> int:
+        return self.resources[name].version
+
+    def versions(self) -> Dict[str, int]:
+        return {name: resource.version for name, resource in self.resources.items()}
+
+    def check(self) -> List[str]:
+        """ Rebuilds all resources whose source files changed and returns their names. """
+        with self._check_lock:
+            return [resource.name for resource in list(self.resources.values()) if self._check(resource)]
+
+    def _check(self, resource: WatchedResource) -> bool:
+        stats = resource.file_stats()
+        if stats == resource.stats:
+            return False
+        hashes = resource.file_hashes()
+        if hashes == resource.hashes:
+            # only touched, the current version is still up to date
+            resource.stats = stats
+            return False
+        # the fingerprint is taken before the build (a change during the build triggers another rebuild)
+        # and only stored once the new version is swapped in, so a failed rebuild is retried
+        if not self._rebuild(resource):
+            return False
+        resource.stats, resource.hashes = stats, hashes
+        return True
+
+    def _rebuild(self, resource: WatchedResource) -> bool:
+        try:
+            value = resource.build()
+        except FileNotFoundError as e:
+            logging.warning(f"Couldn't build {resource.name}: {e}")
+            return False
+        except Exception:
+            logging.exception(f"Couldn't rebuild {resource.name}, keeping version {resource.version}")
+            return False
+
+        with self._lock:
+            resource.value = value
+            resource.version += 1
+        if resource.install:
+            resource.install(value)
+        logging.info(f"Loaded {resource.name} (version {resource.version})")
+        return True
+
+    def start(self, interval: float = DEFAULT_RELOAD_INTERVAL) -> None:
+        """ Starts checking the source files every <interval> seconds in a background (daemon) thread. """
+        if interval <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="catalogue-manager", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            try:
+                self.check()
+            except Exception:
+                logging.exception("Checking the catalogues failed")
+
+
+catalogue_manager = CatalogueManager()
+
+
+def watch_catalogues(manager: CatalogueManager = catalogue_manager) -> CatalogueManager:
+    """ Registers the skill catalogues (CSV files and the compiled catalogue file) and survey.yaml with the manager.
+    Skill indexes that are already loaded are taken over, catalogues without CSV file are loaded once it appears. """
+    for skill_domain, filename in SKILL_CATALOGUES:
+        try:
+            skill_index = get_skill_index(skill_domain, filename)
+        except FileNotFoundError:
+            skill_index = None
+        manager.register(
+            f"skills:{filename}",
+            [SKILL_CSV_DIRECTORY.joinpath(filename), DEFAULT_CATALOGUE_PATH],
+            build=lambda skill_domain=skill_domain, filename=filename: load_skill_index(skill_domain, filename),
+            install=install_skill_index,
+            value=skill_index)
+
+    manager.register("survey", [SURVEY_PATH], build=init_survey, install=install_survey)
+    return manager
+
+
+def start_catalogue_watcher(interval: float = DEFAULT_RELOAD_INTERVAL) -> Optional[CatalogueManager]:
+    """ Registers the catalogues and starts checking them every <interval> seconds, if the interval is positive
+    (CATALOGUE_RELOAD_INTERVAL). Returns the started manager, None if the watcher is disabled. """
+    if interval <= 0:
+        return None
+    manager = watch_catalogues()
+    manager.start(interval)
+    return manager
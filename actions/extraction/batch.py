@@ -0,0 +1,136 @@
+import argparse
+import json
+import sys
+import itertools
+from collections import deque
+from multiprocessing import Pool
+from typing import Iterable, Iterator, List, Optional
+
+from .skill_index import SKILL_CATALOGUES, SkillIndex, get_skill_index
+
+
+# Index and extraction settings of a worker process, set once by <_init_worker>
+_worker_index: Optional[SkillIndex] = None
+_worker_settings: dict = {}
+
+
+def default_filename(skill_domain: str) -> str:
+    """ Returns the skill CSV file that is loaded for a skill domain by default (see <SKILL_CATALOGUES>). """
+    for domain, filename in SKILL_CATALOGUES:
+        if domain == skill_domain:
+            return filename
+    raise ValueError("invalid skill_domain specified as argument")
+
+
+def _init_worker(skill_domain: str, filename: str, settings: dict) -> None:
+    """ Builds (or, after a fork, inherits) the catalogue index once per worker process. """
+    global _worker_index, _worker_settings
+    _worker_index = get_skill_index(skill_domain, filename)
+    _worker_settings = settings
+
+
+def _extract_chunk_in_worker(texts: List[str]) -> List[List[dict]]:
+    return [_worker_index.extract(text, **_worker_settings) for text in texts]
+
+
+def extract_strings_from_texts(
+    texts: Iterable[str],
+    skill_domain: str,
+    cutoff: int = 90,
+    workers: int = 1,
+    chunksize: int = 16,
+    filename: str = None,
+    engine: str = "batched",
+    segmentation: str = "greedy",
+    prefetch: int = 2
+    ) -> Iterator[List[dict]]:
+    """ Extracts the skills of many texts (see <SkillIndex.extract>) and yields the matches per text in input order.
+
+    With workers > 1 the texts are distributed in chunks over a pool of processes. Each process gets the index
+    of the catalogue once when it starts (inherited from the parent process when forked, otherwise built),
+    only the texts and matches are sent between the processes.
+    Results are streamed and the texts are read only as far as needed to keep the processes busy
+    (at most workers * prefetch chunks are in flight), so the texts can be an arbitrarily long iterator.
+
+    Args:
+        skill_domain: Either 'emsi' or 'edyoucated' or 'onet'
+        workers: number of processes
+        chunksize: number of texts sent to a process at once
+        prefetch: number of chunks per process that are sent before their results are consumed
+        filename: skill CSV file, by default the catalogue of the skill domain in <SKILL_CATALOGUES>
+    """
+    filename = filename or default_filename(skill_domain)
+    settings = {"cutoff": cutoff, "engine": engine, "segmentation": segmentation}
+
+    # built before the pool is started, so forked worker processes inherit it instead of building it again
+    skill_index = get_skill_index(skill_domain, filename)
+
+    if workers <= 1:
+        for text in texts:
+            yield skill_index.extract(text, **settings)
+        return
+
+    texts = iter(texts)
+    # chunks sent to the pool, in input order (Pool.imap would read the whole input ahead of the results)
+    in_flight = deque()
+
+    with Pool(workers, initializer=_init_worker, initargs=(skill_domain, filename, settings)) as pool:
+
+        def submit() -> bool:
+            chunk = list(itertools.islice(texts, chunksize))
+            if chunk:
+                in_flight.append(pool.apply_async(_extract_chunk_in_worker, (chunk,)))
+            return bool(chunk)
+
+        while len(in_flight) < workers * max(prefetch, 1) and submit():
+            pass
+        while in_flight:
+            results = in_flight.popleft().get()
+            submit()
+            yield from results
+
+
+def main(args: List[str] = None) -> None:
+    """ Command line wrapper around <extract_strings_from_texts> for JSONL files.
+    Every input line is a JSON object with the text, it is written out with the matches added. """
+    parser = argparse.ArgumentParser(description="Extracts skills from the texts of a JSONL file.")
+    parser.add_argument("input", help="JSONL file with one object per line ('-' for stdin)")
+    parser.add_argument("output", help="JSONL file for the objects with the matches ('-' for stdout)")
+    parser.add_argument("--domain", default="emsi", choices=[domain for domain, _ in SKILL_CATALOGUES])
+    parser.add_argument("--filename", default=None, help="skill CSV file, by default the catalogue of the domain")
+    parser.add_argument("--cutoff", type=int, default=90)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--chunksize", type=int, default=16)
+    parser.add_argument("--text-field", default="text", help="field of the input objects holding the text")
+    parser.add_argument("--matches-field", default="matches", help="field of the output objects holding the matches")
+    args = parser.parse_args(args)
+
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    sink = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+
+    # the objects wait here until the matches of their text come back (in the same order)
+    pending = deque()
+
+    def texts() -> Iterator[str]:
+        for line in source:
+            if line.strip():
+                record = json.loads(line)
+                pending.append(record)
+                yield record[args.text_field]
+
+    try:
+        results = extract_strings_from_texts(
+            texts(), args.domain, cutoff=args.cutoff, workers=args.workers, chunksize=args.chunksize, filename=args.filename)
+        for matches in results:
+            record = pending.popleft()
+            record[args.matches_field] = matches
+            sink.write(json.dumps(record, ensure_ascii=False) + "\n")
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List
+
+from .preprocessing import Chunk, get_default_preprocessor
+
+
+class LRUCache():
+    """ Thread-safe, size-bounded cache that evicts the least recently used entry and counts hits and misses. """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        """ Removes all entries (the hit/miss counters are kept). """
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+# Preprocessed text per raw user message
+preprocessing_cache = LRUCache(maxsize=4096)
+
+# Extraction results per (preprocessed tokens, catalogue, catalogue version, cutoff policy)
+extraction_cache = LRUCache(maxsize=4096)
+
+
+def preprocess_text_cached(text: str) -> List[str]:
+    """ <preprocess_text> (via the compiled Preprocessor) with the result cached per text,
+    so that a cascade over several catalogues preprocesses once. """
+    return [chunk.text for chunk in preprocess_text_spans_cached(text)]
+
+
+def preprocess_text_spans_cached(text: str) -> List[Chunk]:
+    """ <Preprocessor.preprocess_text_spans> with the result cached per text. """
+    chunks = preprocessing_cache.get(text)
+    if chunks is None:
+        chunks = tuple(get_default_preprocessor().preprocess_text_spans(text))
+        preprocessing_cache.put(text, chunks)
+    return list(chunks)
+
+
+def invalidate_extraction_caches(*args) -> None:
+    """ Drops all cached extraction results, e.g. after a skill catalogue was reloaded. """
+    extraction_cache.clear()
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    """ Returns size and hit/miss counters of the extraction caches. """
+    return {"preprocessing": preprocessing_cache.stats(), "extraction": extraction_cache.stats()}
@@ -0,0 +1,80 @@
+from typing import Dict, Hashable, List, NamedTuple, Optional, Tuple
+
+from .cache import extraction_cache, preprocess_text_spans_cached
+from .extractor import Segment, locate_matches
+from .skill_index import ScoredExtraction, SkillIndex, get_skill_index
+
+
+class CascadeStep(NamedTuple):
+    """ One step of a cutoff cascade: a skill catalogue and the cutoff its matches need to reach. """
+    skill_domain: str
+    filename: str
+    cutoff: int
+
+
+class CascadePolicy():
+    """ Extraction policy that tries a cascade of (catalogue, cutoff) steps in order and returns the
+    matches of the first step that is accepted (by default: the first step with any matches).
+
+    Each catalogue is scored at most once per text, at the lowest cutoff of its steps, so the later steps
+    of the cascade are a filter over the candidates already scored instead of another full extraction.
+    Catalogues of later steps are only scored if the cascade actually reaches them, and the text is preprocessed once.
+    Subclasses can override <accept> to plug in other stopping rules.
+    """
+
+    def __init__(self, steps: List[CascadeStep], workers: int = 1, exact_first: bool = False, segmentation: str = "greedy"):
+        self.steps = [CascadeStep(*step) for step in steps]
+        self.workers = workers
+        self.exact_first = exact_first
+        self.segmentation = segmentation
+
+        self.floor_cutoffs: Dict[Tuple[str, str], int] = {}
+        for step in self.steps:
+            key = (step.skill_domain, step.filename)
+            self.floor_cutoffs[key] = min(step.cutoff, self.floor_cutoffs.get(key, step.cutoff))
+
+    def accept(self, matches: List[dict], step: CascadeStep) -> bool:
+        """ Decides whether the matches of a step are the result of the cascade. """
+        return bool(matches)
+
+    def cache_key(self) -> Hashable:
+        """ Identifies the policy in the extraction cache. """
+        return (type(self).__name__, tuple(self.steps), self.exact_first, self.segmentation)
+
+    def extract(self, text: str, use_cache: bool = True) -> Tuple[List[dict], Optional[CascadeStep]]:
+        """ Returns the matches of the first accepted step and the step itself (or no matches and None).
+        Each match also holds the (start, end) character offsets of the matched expression in the text.
+        Results are cached per preprocessed text, policy and version of the catalogues (unless <use_cache> is False). """
+        chunks = preprocess_text_spans_cached(text)
+        preprocessed_text = [chunk.text for chunk in chunks]
+        indexes = {key: get_skill_index(*key) for key in self.floor_cutoffs}
+        cache_key = (tuple(preprocessed_text), self.cache_key(), tuple(index.version for index in indexes.values()))
+
+        result = extraction_cache.get(cache_key) if use_cache else None
+        if result is None:
+            result = self._extract(preprocessed_text, indexes)
+            if use_cache:
+                extraction_cache.put(cache_key, result)
+
+        matches, step = result
+        return locate_matches(matches, chunks), step
+
+    def _extract(
+        self,
+        preprocessed_text: List[str],
+        indexes: Dict[Tuple[str, str], SkillIndex]
+        ) -> Tuple[Tuple[Tuple[dict, Segment], ...], Optional[CascadeStep]]:
+        scored: Dict[Tuple[str, str], ScoredExtraction] = {}
+
+        for step in self.steps:
+            key = (step.skill_domain, step.filename)
+            if key not in scored:
+                scored[key] = ScoredExtraction(
+                    indexes[key], preprocessed_text, self.floor_cutoffs[key],
+                    workers=self.workers, exact_first=self.exact_first, segmentation=self.segmentation)
+
+            matches = scored[key].segment_matches(step.cutoff)
+            if self.accept([m for m, _ in matches], step):
+                return tuple(matches), step
+
+        return (), None
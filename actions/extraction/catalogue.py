@@ -0,0 +1,213 @@
+import hashlib
+import json
+import mmap
+import pathlib
+import struct
+from collections.abc import Sequence as SequenceABC
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+
+# File layout: magic, format version, header length, JSON header, then 8-byte aligned sections (see <write_catalogue_file>)
+MAGIC = b"SKILLCAT"
+FORMAT_VERSION = 2
+_PREFIX = struct.Struct("<8sII")
+
+# Directory of the skill CSV files (see <init_skills_df>) and the compiled catalogues of all of them
+SKILL_CSV_DIRECTORY = pathlib.Path(__file__).parent.parent.joinpath("edyoucated")
+DEFAULT_CATALOGUE_PATH = SKILL_CSV_DIRECTORY.joinpath("skill_catalogues.bin")
+
+
+class StaleCatalogueError(Exception):
+    """ Raised if a compiled catalogue does not belong to the current version of its source CSV file. """
+
+
+def file_sha256(path: pathlib.Path) -> str:
+    """ Returns the SHA-256 hex digest of a file. """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class StringTable(SequenceABC):
+    """ Read-only list of UTF-8 strings (or None) in a buffer, addressed through an array of byte offsets.
+    Strings are decoded on access, the buffer itself can be a memory-mapped file shared between processes,
+    so a table is a view into the file and not a copy of its strings. """
+
+    def __init__(self, buffer, offsets: np.ndarray, data_start: int, nulls: np.ndarray):
+        self._buffer = buffer
+        self._offsets = offsets
+        self._data_start = data_start
+        self._nulls = nulls
+
+    def __len__(self) -> int:
+        return len(self._nulls)
+
+    def __getitem__(self, i: int) -> Optional[str]:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("string table index out of range")
+        if self._nulls[i]:
+            return None
+        start = self._data_start + int(self._offsets[i])
+        end = self._data_start + int(self._offsets[i + 1])
+        return str(self._buffer[start:end], "utf-8")
+
+    def __iter__(self) -> Iterator[Optional[str]]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def tolist(self) -> List[Optional[str]]:
+        offsets = self._offsets.tolist()
+        data = bytes(self._buffer[self._data_start:self._data_start + offsets[-1]])
+        text = data.decode("utf-8")
+        if len(text) != len(data):
+            # byte offsets only equal character offsets for ASCII text
+            return [None if null else str(data[offsets[i]:offsets[i + 1]], "utf-8") for i, null in enumerate(self._nulls.tolist())]
+        return [None if null else text[offsets[i]:offsets[i + 1]] for i, null in enumerate(self._nulls.tolist())]
+
+
+class CompiledCatalogue():
+    """ One skill catalogue of a compiled catalogue file: the extraction targets, the string columns of the
+    source CSV that are needed at runtime and the target indices per n-gram size (word count) bucket.
+    Strings and indices are views into the memory-mapped file (see <StringTable>). """
+
+    def __init__(self, filename: str, skill_domain: str, source_sha256: str, tables: Dict[str, StringTable], buckets: Dict[int, np.ndarray]):
+        self.filename = filename
+        self.skill_domain = skill_domain
+        self.source_sha256 = source_sha256
+        self.tables = tables
+        self.buckets = buckets
+
+    @property
+    def skills(self) -> StringTable:
+        """ The extraction targets, as returned by <init_skills_from_dataframe>. """
+        return self.tables["skills"]
+
+    @property
+    def targets(self) -> StringTable:
+        """ The lowercased extraction targets, as they are matched. """
+        return self.tables["targets"]
+
+    def column(self, name: str) -> StringTable:
+        """ Returns a string column of the source CSV (missing values are None). """
+        return self.tables["column:" + name]
+
+
+class _SectionWriter():
+    """ Collects 8-byte aligned binary sections and remembers their position. """
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.size = 0
+
+    def add(self, data: bytes) -> int:
+        offset = self.size
+        self.chunks.append(data)
+        self.size += len(data)
+        padding = -self.size % 8
+        if padding:
+            self.chunks.append(b"\0" * padding)
+            self.size += padding
+        return offset
+
+    def add_strings(self, strings: Sequence[Optional[str]]) -> dict:
+        encoded = [b"" if s is None else s.encode("utf-8") for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype="<u8")
+        offsets[1:] = np.cumsum([len(e) for e in encoded], dtype=np.uint64)
+        return {
+            "count": len(encoded),
+            "offsets": self.add(offsets.tobytes()),
+            "data": self.add(b"".join(encoded)),
+            "nulls": self.add(np.array([s is None for s in strings], dtype=np.uint8).tobytes()),
+        }
+
+    def add_indices(self, indices: Sequence[int]) -> dict:
+        return {"count": len(indices), "offset": self.add(np.asarray(indices, dtype="<u4").tobytes())}
+
+
+def write_catalogue_file(path: pathlib.Path, catalogues: List[dict]) -> None:
+    """ Writes catalogues into one binary file.
+
+    Every catalogue is a dict with 'filename', 'skill_domain', 'source_sha256', 'skills' (the extraction targets),
+    'targets' (the lowercased extraction targets), 'columns' (name -> list of strings or None)
+    and 'buckets' (n-gram size -> indices into the skills).
+    The JSON header holds the metadata and the positions of the sections, relative to the first section.
+    """
+    sections = _SectionWriter()
+    header = {"catalogues": {}}
+    for catalogue in catalogues:
+        tables = {"skills": sections.add_strings(catalogue["skills"]), "targets": sections.add_strings(catalogue["targets"])}
+        for name, values in catalogue["columns"].items():
+            tables["column:" + name] = sections.add_strings(values)
+        header["catalogues"][catalogue["filename"]] = {
+            "skill_domain": catalogue["skill_domain"],
+            "source_sha256": catalogue["source_sha256"],
+            "tables": tables,
+            "buckets": {str(n): sections.add_indices(indices) for n, indices in catalogue["buckets"].items()},
+        }
+
+    header_bytes = json.dumps(header).encode("utf-8")
+    header_bytes += b" " * (-(_PREFIX.size + len(header_bytes)) % 8)
+
+    # write to a temporary file first, so that running processes never map a half-written file
+    tmp_path = pathlib.Path(str(path) + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(_PREFIX.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for chunk in sections.chunks:
+            f.write(chunk)
+    tmp_path.replace(path)
+
+
+class CatalogueFile():
+    """ Memory-mapped compiled catalogue file (see <write_catalogue_file>). Nothing is parsed except the header,
+    all processes that map the same file share its pages. """
+
+    def __init__(self, path: pathlib.Path = DEFAULT_CATALOGUE_PATH):
+        self.path = pathlib.Path(path)
+        with open(self.path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, header_length = _PREFIX.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{self.path} is not a compiled catalogue file of version {FORMAT_VERSION}")
+        header = json.loads(bytes(self._mmap[_PREFIX.size:_PREFIX.size + header_length]))
+        self._start = _PREFIX.size + header_length
+        self._header = header["catalogues"]
+
+    def __contains__(self, filename: str) -> bool:
+        return filename in self._header
+
+    def _array(self, dtype: str, offset: int, count: int) -> np.ndarray:
+        return np.frombuffer(self._mmap, dtype=dtype, count=count, offset=self._start + offset)
+
+    def _string_table(self, section: dict) -> StringTable:
+        return StringTable(
+            self._mmap,
+            self._array("<u8", section["offsets"], section["count"] + 1),
+            self._start + section["data"],
+            self._array(np.uint8, section["nulls"], section["count"]))
+
+    def catalogue(self, filename: str, verify: bool = True) -> CompiledCatalogue:
+        """ Returns the compiled catalogue of a skill CSV file.
+
+        Args:
+            verify: raise a StaleCatalogueError if the source CSV file (if present) changed since it was compiled
+        """
+        entry = self._header[filename]
+        if verify:
+            source = SKILL_CSV_DIRECTORY.joinpath(filename)
+            if source.exists() and file_sha256(source) != entry["source_sha256"]:
+                raise StaleCatalogueError(f"{filename} changed since {self.path.name} was compiled")
+
+        return CompiledCatalogue(
+            filename,
+            entry["skill_domain"],
+            entry["source_sha256"],
+            {name: self._string_table(section) for name, section in entry["tables"].items()},
+            {int(n): self._array("<u4", section["offset"], section["count"]) for n, section in entry["buckets"].items()})
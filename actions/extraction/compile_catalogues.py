@@ -0,0 +1,56 @@
+import argparse
+import logging
+import pathlib
+from typing import List, Tuple
+
+from actions.helper import init_skills_df
+from .catalogue import DEFAULT_CATALOGUE_PATH, SKILL_CSV_DIRECTORY, file_sha256, write_catalogue_file
+from .skill_index import CATALOGUE_COLUMNS, SKILL_CATALOGUES, init_skills_from_dataframe
+
+
+def compile_catalogues(catalogues: List[Tuple[str, str]] = SKILL_CATALOGUES, path: pathlib.Path = DEFAULT_CATALOGUE_PATH) -> List[str]:
+    """ Compiles the skill CSV files into one memory-mappable catalogue file (see <write_catalogue_file>),
+    from which the SkillIndex can be built without parsing the CSV files. Missing CSV files are skipped.
+    Returns the filenames of the compiled catalogues. """
+    compiled = []
+    for skill_domain, filename in catalogues:
+        source = SKILL_CSV_DIRECTORY.joinpath(filename)
+        if not source.exists():
+            logging.warning(f"Skipping {filename}, the file does not exist.")
+            continue
+
+        skills_df = init_skills_df(filename=filename)
+        skills = init_skills_from_dataframe(skill_domain, skills_df)
+        buckets = {}
+        for idx, skill in enumerate(skills):
+            buckets.setdefault(len(skill.lower().split(" ")), []).append(idx)
+
+        compiled.append({
+            "filename": filename,
+            "skill_domain": skill_domain,
+            "source_sha256": file_sha256(source),
+            "skills": skills,
+            "targets": [skill.lower() for skill in skills],
+            "columns": {
+                column: [value if value == value else None for value in skills_df[column].tolist()]
+                for column in CATALOGUE_COLUMNS[skill_domain]
+            },
+            "buckets": buckets,
+        })
+
+    write_catalogue_file(path, compiled)
+    return [catalogue["filename"] for catalogue in compiled]
+
+
+def main(args: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Compiles the skill CSV files into one memory-mappable catalogue file.")
+    parser.add_argument("--output", type=pathlib.Path, default=DEFAULT_CATALOGUE_PATH,
+                        help="catalogue file to write")
+    args = parser.parse_args(args)
+
+    filenames = compile_catalogues(path=args.output)
+    print(f"Compiled {', '.join(filenames)} into {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+from math import floor
+from typing import Dict, List, Set, Tuple
+
+from rapidfuzz import fuzz
+
+from .scoring import cdist_candidates, length_window
+
+
+def deletes(word: str, max_distance: int) -> Set[str]:
+    """Returns the word and all strings that can be derived from it by deleting up to max_distance characters."""
+    variants = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {variant[:i] + variant[i + 1:] for variant in frontier for i in range(len(variant))}
+        variants |= frontier
+    return variants
+
+
+class DeletionIndex():
+    """SymSpell-style deletion dictionary for single-word targets (the unigram bucket).
+
+    Every target is stored under all of its variants with up to max_distance deleted characters. Two words with
+    an indel distance d share a variant that is reached with at most d deletions on each side (their longest
+    common subsequence), so all targets a query can match are found with hash lookups of the query's variants.
+    The number of deletions a match at a cutoff may need grows with the word length (see <required_distance>),
+    queries that would need more than max_distance are scored against all targets instead (or a fallback index).
+    """
+
+    def __init__(self, target_string_list: List[str], max_distance: int = 2, fallback=None):
+        self.targets = target_string_list
+        self.max_distance = max_distance
+        self.fallback = fallback
+
+        self.variants: Dict[str, List[int]] = {}
+        for idx, target in enumerate(target_string_list):
+            for variant in deletes(target, max_distance):
+                self.variants.setdefault(variant, []).append(idx)
+
+    @staticmethod
+    def required_distance(length: int, cutoff: float) -> float:
+        """Returns the largest indel distance a word of the given length may have to a target that reaches the cutoff."""
+        _, max_length = length_window(length, cutoff)
+        if max_length == float("inf"):
+            return max_length
+        return floor((100 - cutoff) / 100 * (length + max_length) + 1e-9)
+
+    def candidates(self, queries: List[str], cutoff: float, workers: int = 1) -> List[List[Tuple[int, float]]]:
+        """Same result as <cdist_candidates> for the targets of the index."""
+        candidates: List[List[Tuple[int, float]]] = [[] for _ in queries]
+        unindexed = []
+
+        for i, query in enumerate(queries):
+            distance = self.required_distance(len(query), cutoff)
+            if distance > self.max_distance:
+                unindexed.append(i)
+                continue
+
+            ids = set()
+            for variant in deletes(query, distance):
+                ids.update(self.variants.get(variant, ()))
+            for idx in sorted(ids):
+                score = fuzz.ratio(query, self.targets[idx], score_cutoff=cutoff)
+                if score >= cutoff:
+                    candidates[i].append((idx, score))
+
+        if unindexed:
+            unindexed_queries = [queries[i] for i in unindexed]
+            if self.fallback is not None:
+                scored = self.fallback.candidates(unindexed_queries, cutoff, workers=workers)
+            else:
+                scored = cdist_candidates(unindexed_queries, self.targets, 1, cutoff, workers=workers)
+            for i, query_candidates in zip(unindexed, scored):
+                candidates[i] = query_candidates
+
+        return candidates
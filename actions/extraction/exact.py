@@ -0,0 +1,117 @@
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from .extractor import Segment, segments_to_strings, tokenize_string_list
+
+
+# Key marking the end of a target string in the trie (cannot collide with a token, as tokens contain no spaces)
+_END = " "
+
+
+class ExactMatcher():
+    """Multi-pattern matcher for exact, word-aligned occurrences of target strings in preprocessed text.
+
+    The target strings are compiled into a trie over their words, so all occurrences in a string are found
+    in one left-to-right scan (leftmost-longest), independent of the number of target strings.
+    """
+
+    def __init__(self, target_string_list: Iterable[str], max_n_gram_size: int = 4, min_n_gram_size: int = 1):
+        """
+        Args:
+            min_n_gram_size: shorter target strings are not matched (e.g. if cutting them out saves no work)
+        """
+        self.max_n_gram_size = max_n_gram_size
+        self.trie: Dict = {}
+
+        for target in target_string_list:
+            target = target.lower()
+            tokens = target.split(" ")
+            # only targets that the n-gram matching could find as well
+            if not min_n_gram_size <= len(tokens) <= max_n_gram_size or "" in tokens:
+                continue
+            node = self.trie
+            for token in tokens:
+                node = node.setdefault(token, {})
+            node.setdefault(_END, target)
+
+    def find(self, tokens: List[str]) -> List[Tuple[int, int, str]]:
+        """Returns (start, end, target) token spans of all non-overlapping exact occurrences in a list of tokens."""
+        occurrences = []
+        i = 0
+        while i < len(tokens):
+            node = self.trie
+            longest = None
+            for j in range(i, min(i + self.max_n_gram_size, len(tokens))):
+                node = node.get(tokens[j])
+                if node is None:
+                    break
+                if _END in node:
+                    longest = (i, j + 1, node[_END])
+            if longest:
+                occurrences.append(longest)
+                i = longest[1]
+            else:
+                i += 1
+        return occurrences
+
+    def match_and_cut(self, string: str, is_valid: Callable[[List[str], Tuple[int, int, str]], bool] = None) -> Tuple[List[dict], List[str]]:
+        """Finds all exact occurrences in a string and cuts them out (cf. <match_and_cut>).
+        Returns the matches and the remaining substrings between them.
+
+        Args:
+            is_valid: optional function that decides, given the tokens of the string, whether an occurrence is cut out
+        """
+        return self.process_string_list([string], is_valid)
+
+    def match_and_cut_segment(
+        self,
+        tokens: List[str],
+        segment: Segment,
+        is_valid: Callable[[List[str], Tuple[int, int, str]], bool] = None
+        ) -> Tuple[List[Tuple[dict, Segment]], List[Segment]]:
+        """<match_and_cut> on a segment of the (lowercased) tokens of a string, cf. <match_and_cut_segment>."""
+        segment_tokens = tokens[segment.start:segment.end]
+        matches = []
+        remainder = []
+        last_end = 0
+
+        for start, end, target in self.find(segment_tokens):
+            if is_valid and not is_valid(segment_tokens, (start, end, target)):
+                continue
+            matches.append((
+                {"title": " ".join(segment_tokens[start:end]), "match": target, "score": 100.0},
+                Segment(segment.index, segment.start + start, segment.start + end)))
+            self._append_remainder(remainder, segment_tokens, segment, last_end, start)
+            last_end = end
+        self._append_remainder(remainder, segment_tokens, segment, last_end, len(segment_tokens))
+
+        return matches, remainder
+
+    @staticmethod
+    def _append_remainder(remainder: List[Segment], segment_tokens: List[str], segment: Segment, start: int, end: int) -> None:
+        while start < end and segment_tokens[start].strip() == "":
+            start += 1
+        while end > start and segment_tokens[end - 1].strip() == "":
+            end -= 1
+        if start < end:
+            remainder.append(Segment(segment.index, segment.start + start, segment.start + end))
+
+    def process_string_list(self, string_list: List[str], is_valid: Callable[[List[str], Tuple[int, int, str]], bool] = None) -> Tuple[List[dict], List[str]]:
+        """Applies <match_and_cut> to a list of strings, e.g. the output of <preprocess_text>."""
+        tokens, segments = tokenize_string_list(string_list)
+        matches, remainders = self.process_segments(tokens, segments, is_valid)
+        return [m for m, _ in matches], segments_to_strings(string_list, remainders)
+
+    def process_segments(
+        self,
+        tokens: List[List[str]],
+        segments: List[Segment],
+        is_valid: Callable[[List[str], Tuple[int, int, str]], bool] = None
+        ) -> Tuple[List[Tuple[dict, Segment]], List[Segment]]:
+        """Applies <match_and_cut_segment> to segments of tokenized strings (see <tokenize_string_list>)."""
+        matches = []
+        remainders = []
+        for segment in segments:
+            match, remainder = self.match_and_cut_segment(tokens[segment.index], segment, is_valid)
+            matches.extend(match)
+            remainders.extend(remainder)
+        return matches, remainders
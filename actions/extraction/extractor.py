@@ -2,20 +2,22 @@
 # Co-auhtor: Maximilian Kania
 from copy import copy
 from rapidfuzz import fuzz
-from typing import List, Tuple, Union
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple, Union
 from nltk import ngrams
 from nltk.tokenize import word_tokenize
 from collections import deque, Counter
 
-from .preprocessing import preprocess_text
+from .preprocessing import Chunk, get_default_preprocessor
+from .scoring import LengthSortedTargets, ScoreTable
 
 
 def _compute_match_score(string: str, target_string: str, cutoff: int) -> dict:
     """Computes a matching score between two strings and returns the match, if the score is above a cutoff."""
+    # scores below the cutoff are returned as 0 (rapidfuzz can stop early)
     if " " in string and " " in target_string:
-        f_score = fuzz.token_sort_ratio(string, target_string)
+        f_score = fuzz.token_sort_ratio(string, target_string, score_cutoff=cutoff)
     else:
-        f_score = fuzz.ratio(string, target_string)
+        f_score = fuzz.ratio(string, target_string, score_cutoff=cutoff)
 
     if f_score >= cutoff:
         res = {
@@ -35,6 +37,10 @@ def match(string: str, target_string_list: Union[List[str], str], cutoff: int=90
     
     matches: List[str] = []
 
+    # only visit the targets with a length that can reach the cutoff, if they are sorted by length
+    if isinstance(target_string_list, LengthSortedTargets):
+        target_string_list = [target_string_list[i] for i in target_string_list.window(string, cutoff)]
+
     for target_string in target_string_list:
         match = _compute_match_score(string=string, target_string=target_string, cutoff=cutoff)
         if match: 
@@ -54,72 +60,160 @@ def best_match(string: str, target_string_list: Union[List[str], str], cutoff: i
         res = None
     return res
 
+class Segment(NamedTuple):
+    """Token range [start, end) of the index-th string of a list of strings.
+    Remainders of the matching are passed on as segments instead of copied substrings."""
+    index: int
+    start: int
+    end: int
+
+
+def tokenize_string_list(string_list: List[str]) -> Tuple[List[List[str]], List[Segment]]:
+    """Returns the lowercased tokens of every string and one segment covering each string."""
+    tokens = [string.lower().split(" ") for string in string_list]
+    return tokens, [Segment(i, 0, len(string_tokens)) for i, string_tokens in enumerate(tokens)]
+
+def segments_to_strings(string_list: List[str], segments: List[Segment]) -> List[str]:
+    """Returns the substrings of the strings that the segments cover."""
+    return [" ".join(string_list[segment.index].split(" ")[segment.start:segment.end]) for segment in segments]
+
+def locate_matches(matches: List[Tuple[dict, Segment]], chunks: List[Chunk]) -> List[dict]:
+    """Adds the (start, end) character offsets of the matched tokens in the original text to the matches,
+    given the preprocessed strings with their token spans (see <Preprocessor.preprocess_text_spans>)."""
+    located = []
+    for m, segment in matches:
+        spans = chunks[segment.index].spans
+        located.append({**m, "start": spans[segment.start][0], "end": spans[segment.end - 1][1]})
+    return located
+
 def match_and_cut(string: str, target_string_list: List[str], n_gram_size: int, cutoff: int=90) -> Tuple[List[dict], List[str]]:
     """Greedily tries to find matches of certain gram-size between a string and a target string list.
     If a match is found, the remainder of the string is separated into substrings that can be futher processed."""
-    matches:List = []
-    remainder = []
-    processed_string = string
-    string = string.lower()
-
-    # create n-grams 
-    n_grams = deque(list(ngrams(string.split(" "), n_gram_size)))
-
-    # check for matches greedily
-    while len(n_grams) > 0:
-        n_gram = n_grams.popleft()
-        n_gram_joined = " ".join(n_gram)
-        m = best_match(n_gram_joined, target_string_list, cutoff=cutoff)
-        if m: 
-            matches.append(m)
-            # skip next overlapping n-grams
-            for _ in range(n_gram_size-1):
-                if n_grams:
-                    n_grams.popleft()
-
-            # split string at match to find remainder
-            spl = [x.strip() for x in processed_string.split(n_gram_joined, maxsplit=1)]
-            processed_string = spl[1]
-            if spl[0] != "":
-                remainder.append(spl[0])
-    
+    return _match_and_cut(string, n_gram_size, lambda n_gram: best_match(n_gram, target_string_list, cutoff=cutoff))
+
+def _match_and_cut(string: str, n_gram_size: int, find_best_match: Callable[[str], Optional[dict]]) -> Tuple[List[dict], List[str]]:
+    """Greedy matching and cutting of <match_and_cut>, with the best match of an n-gram given by a function."""
+    tokens, segments = tokenize_string_list([string])
+    matches, remainder = match_and_cut_segment(tokens[0], segments[0], n_gram_size, find_best_match)
+    return [m for m, _ in matches], segments_to_strings([string], remainder)
+
+def match_and_cut_segment(
+    tokens: List[str],
+    segment: Segment,
+    n_gram_size: int,
+    find_best_match: Callable[[str], Optional[dict]]
+    ) -> Tuple[List[Tuple[dict, Segment]], List[Segment]]:
+    """<match_and_cut> on a segment of the (lowercased) tokens of a string.
+    Returns the matches with the segment they cover and the remaining segments.
+
+    The string is cut at the token positions of the match, not at the first occurrence of the matched text,
+    which might be an earlier, unmatched occurrence (e.g. inside another word).
+    """
+    matches: List[Tuple[dict, Segment]] = []
+    remainder: List[Segment] = []
+    last_end = segment.start
+
+    # check for matches greedily, continue after a match with the next non-overlapping n-gram
+    i = segment.start
+    while i + n_gram_size <= segment.end:
+        m = find_best_match(" ".join(tokens[i:i + n_gram_size]))
+        if m:
+            matches.append((dict(m), Segment(segment.index, i, i + n_gram_size)))
+            _append_remainder(remainder, tokens, Segment(segment.index, last_end, i))
+            i = last_end = i + n_gram_size
+        else:
+            i += 1
+
     # add back the last bit to the remainder
-    if processed_string != "":
-        remainder.append(processed_string)
+    _append_remainder(remainder, tokens, Segment(segment.index, last_end, segment.end))
 
     return matches, remainder
 
+def _append_remainder(remainder: List[Segment], tokens: List[str], segment: Segment) -> None:
+    """Appends a segment to the remainder, without surrounding whitespace tokens and only if it is not empty."""
+    index, start, end = segment
+    while start < end and tokens[start].strip() == "":
+        start += 1
+    while end > start and tokens[end - 1].strip() == "":
+        end -= 1
+    if start < end:
+        remainder.append(Segment(index, start, end))
+
+def bucket_target_strings(target_string_list: List[str]) -> Dict[int, List[str]]:
+    """Lowercases the target strings and groups them by their number of words (n-gram size).
+    The buckets are sorted by length as well (see <LengthSortedTargets>)."""
+    target_buckets: Dict[int, List[str]] = {}
+    for s in target_string_list:
+        s = s.lower()
+        target_buckets.setdefault(len(s.split(" ")), []).append(s)
+    return {n_gram_size: LengthSortedTargets(targets) for n_gram_size, targets in target_buckets.items()}
+
 def process_string_list(string_list: List[str], target_string_list: List[str], cutoff: int=90):
     """Matches a list of strings to a list of target strings, using the <match_and_cut> function.
     It starts trying to match longer n-grams and tries smaller ones if no matches could be found and for the remainder.
     """
-    strings_to_process = copy(string_list)
-    matches:List[dict] = []
-    target_string_list = [s.lower() for s in target_string_list]
+    return process_string_buckets(string_list, bucket_target_strings(target_string_list), cutoff)
+
+def process_string_buckets(string_list: List[str], target_buckets: Dict[int, List[str]], cutoff: int=90):
+    """Same as <process_string_list>, but with target strings that are already lowercased and grouped by n-gram size
+    (see <bucket_target_strings>), so that they can be prepared once and reused for many strings.
+    """
+    tokens, segments = tokenize_string_list(string_list)
+    matches, remainders = process_segments(tokens, segments, target_buckets, cutoff)
+    return [m for m, _ in matches], segments_to_strings(string_list, remainders)
+
+def process_segments(tokens: List[List[str]], segments: List[Segment], target_buckets: Dict[int, List[str]], cutoff: int=90):
+    """<process_string_buckets> on segments of tokenized strings (see <tokenize_string_list>).
+    Returns the matches with the segments they cover and the remaining segments."""
+    segments_to_process = copy(segments)
+    matches: List[Tuple[dict, Segment]] = []
+    remainders: List[Segment] = []
 
     for n_gram_size in [4, 3, 2, 1]:
         
         remainders = []
-        filtered_ts_list = [s for s in target_string_list if len(s.split(" ")) == n_gram_size] 
+        filtered_ts_list = target_buckets.get(n_gram_size, [])
+        find_best_match = lambda n_gram: best_match(n_gram, filtered_ts_list, cutoff=cutoff)
 
-        for string in strings_to_process:
+        for segment in segments_to_process:
             
-            match, remainder = match_and_cut(string, filtered_ts_list, n_gram_size, cutoff)
+            match, remainder = match_and_cut_segment(tokens[segment.index], segment, n_gram_size, find_best_match)
             if match:
                 matches.extend(match)
             remainders.extend(remainder)
 
-        strings_to_process = remainders
+        segments_to_process = remainders
 
     return matches, remainders
 
+class PairwiseScoreTable():
+    """Drop-in for a <ScoreTable> that scores like <process_segments>: the best match of an n-gram is computed
+    with <best_match> on first use and kept, so n-grams that are looked up repeatedly are scored once."""
+
+    def __init__(self, target_buckets: Dict[int, List[str]], cutoff: int):
+        self.target_buckets = target_buckets
+        self.cutoff = cutoff
+        self.best_matches: Dict[Tuple[int, str], Optional[dict]] = {}
+
+    def score(self, n_grams: List[str], n_gram_size: int) -> None:
+        """Nothing to prepare, n-grams are scored one by one on lookup."""
+
+    def best_match(self, n_gram: str, n_gram_size: int, cutoff: int) -> Optional[dict]:
+        if cutoff != self.cutoff:
+            raise ValueError("cutoff must be the cutoff of the pairwise score table")
+        key = (n_gram_size, n_gram)
+        if key not in self.best_matches:
+            self.best_matches[key] = best_match(n_gram, self.target_buckets.get(n_gram_size, []), cutoff=cutoff)
+        m = self.best_matches[key]
+        return dict(m) if m else None
+
 def process_string_list_test(string_list: List[str], target_string_list: List[str], high_ngram_cutoff: int=85, low_ngram_cutoff=95):
     """Matches a list of strings to a list of target strings, using the <match_and_cut> function.
     It starts trying to match longer n-grams and tries smaller ones if no matches could be found and for the remainder.
     """
     strings_to_process = copy(string_list)
     matches:List[dict] = []
-    target_string_list = [s.lower() for s in target_string_list]
+    target_buckets = bucket_target_strings(target_string_list)
 
     for n_gram_size in [4, 3, 2, 1]:
         if n_gram_size > 2:
@@ -128,7 +222,7 @@ def process_string_list_test(string_list: List[str], target_string_list: List[st
             cutoff = low_ngram_cutoff
             
         remainders = []
-        filtered_ts_list = [s for s in target_string_list if len(s.split(" ")) == n_gram_size] 
+        filtered_ts_list = target_buckets.get(n_gram_size, [])
 
         for string in strings_to_process:
             
@@ -141,12 +235,158 @@ def process_string_list_test(string_list: List[str], target_string_list: List[st
 
     return matches, remainders
 
+def process_string_list_batched(string_list: List[str], target_string_list: List[str], cutoff: int=90, workers: int=1):
+    """Same output as <process_string_list>, but all n-grams of one size are scored against the targets at once
+    with a rapidfuzz cdist score matrix (see <cdist_candidates>) instead of one Python call per pair.
+    """
+    return process_string_buckets_batched(string_list, bucket_target_strings(target_string_list), cutoff, workers)
+
+def process_string_buckets_batched(string_list: List[str], target_buckets: Dict[int, List[str]], cutoff: int=90, workers: int=1):
+    """Batched version of <process_string_buckets>, see <process_string_list_batched>."""
+    return process_string_list_scored(string_list, ScoreTable(target_buckets, cutoff, workers=workers), cutoff)
+
+def process_string_list_scored(string_list: List[str], score_table: ScoreTable, cutoff: int=90):
+    """Greedy n-gram matching of <process_string_list> with the scores taken from a ScoreTable.
+    The n-grams of each size are scored in one batch (if not in the table yet), matches are filtered by the cutoff.
+    """
+    tokens, segments = tokenize_string_list(string_list)
+    matches, remainders = process_segments_scored(tokens, segments, score_table, cutoff)
+    return [m for m, _ in matches], segments_to_strings(string_list, remainders)
+
+def process_segments_scored(
+    tokens: List[List[str]],
+    segments: List[Segment],
+    score_table: ScoreTable,
+    cutoff: int=90,
+    n_gram_cutoffs: Dict[int, int]=None
+    ):
+    """<process_string_list_scored> on segments of tokenized strings, see <process_segments>.
+
+    Args:
+        n_gram_cutoffs: optional cutoff per n-gram size that replaces the cutoff for that size
+            (like the high/low n-gram cutoffs of <process_string_list_test>)
+    """
+    segments_to_process = copy(segments)
+    matches: List[Tuple[dict, Segment]] = []
+    remainders: List[Segment] = []
+
+    for n_gram_size in [4, 3, 2, 1]:
+
+        remainders = []
+        n_gram_cutoff = (n_gram_cutoffs or {}).get(n_gram_size, cutoff)
+
+        # score the n-grams of all segments at once
+        score_table.score(
+            [" ".join(tokens[index][i:i + n_gram_size]) for index, start, end in segments_to_process for i in range(start, end - n_gram_size + 1)],
+            n_gram_size)
+        find_best_match = lambda n_gram: score_table.best_match(n_gram, n_gram_size, n_gram_cutoff)
+
+        for segment in segments_to_process:
+
+            match, remainder = match_and_cut_segment(tokens[segment.index], segment, n_gram_size, find_best_match)
+            if match:
+                matches.extend(match)
+            remainders.extend(remainder)
+
+        segments_to_process = remainders
+
+    return matches, remainders
+
+def span_weight(score: float, n_gram_size: int) -> float:
+    """Weight of a matched span in <process_segments_optimal>: its score counted for every token it covers,
+    so a multi-word match is not outweighed by matches of its single words with the same score."""
+    return score * n_gram_size
+
+def process_string_list_optimal(string_list: List[str], target_string_list: List[str], cutoff: int=90, workers: int=1):
+    """Matches a list of strings to a list of target strings like <process_string_list>, but instead of the greedy
+    descent over n-gram sizes, the best set of non-overlapping matches is selected (see <process_segments_optimal>).
+    """
+    tokens, segments = tokenize_string_list(string_list)
+    score_table = ScoreTable(bucket_target_strings(target_string_list), cutoff, workers=workers)
+    matches, remainders = process_segments_optimal(tokens, segments, score_table, cutoff)
+    return [m for m, _ in matches], segments_to_strings(string_list, remainders)
+
+def process_segments_optimal(
+    tokens: List[List[str]],
+    segments: List[Segment],
+    score_table: ScoreTable,
+    cutoff: int=90,
+    max_n_gram_size: int=4
+    ):
+    """Scores all spans of 1 to 4 tokens of the segments in one batch per n-gram size and selects the non-overlapping
+    set of matching spans with the highest total weight (see <span_weight>) per segment, with a weighted interval
+    scheduling DP over the token positions. Ties are resolved in favour of fewer (longer) matches.
+    Returns the matches (in text order) with the segments they cover and the remaining, unmatched segments.
+    """
+    for n_gram_size in range(max_n_gram_size, 0, -1):
+        score_table.score(
+            [" ".join(tokens[index][i:i + n_gram_size]) for index, start, end in segments for i in range(start, end - n_gram_size + 1)],
+            n_gram_size)
+
+    matches: List[Tuple[dict, Segment]] = []
+    remainders: List[Segment] = []
+
+    for segment in segments:
+        segment_tokens = tokens[segment.index]
+        length = segment.end - segment.start
+
+        # best[j]: (total weight, -number of matches) of the best selection within the first j tokens
+        best = [(0.0, 0)] * (length + 1)
+        choice: List[Optional[Tuple[int, dict]]] = [None] * (length + 1)
+        for j in range(1, length + 1):
+            best[j] = best[j - 1]
+            for n_gram_size in range(min(max_n_gram_size, j), 0, -1):
+                start = segment.start + j - n_gram_size
+                m = score_table.best_match(" ".join(segment_tokens[start:start + n_gram_size]), n_gram_size, cutoff)
+                if m:
+                    weight, count = best[j - n_gram_size]
+                    candidate = (weight + span_weight(m["score"], n_gram_size), count - 1)
+                    if candidate > best[j]:
+                        best[j] = candidate
+                        choice[j] = (n_gram_size, m)
+
+        # trace back the selected spans (no choice: the j-th token is not part of a match)
+        selected = []
+        j = length
+        while j > 0:
+            if choice[j] is None:
+                j -= 1
+                continue
+            n_gram_size, m = choice[j]
+            selected.append((dict(m), Segment(segment.index, segment.start + j - n_gram_size, segment.start + j)))
+            j -= n_gram_size
+        selected.reverse()
+
+        last_end = segment.start
+        for m, span in selected:
+            _append_remainder(remainders, segment_tokens, Segment(segment.index, last_end, span.start))
+            last_end = span.end
+        _append_remainder(remainders, segment_tokens, Segment(segment.index, last_end, segment.end))
+        matches.extend(selected)
+
+    return matches, remainders
+
 def extract_strings_from_text(text: str, target_string_list: List[str], cutoff: int) -> List[List[dict]]:
-    """ Extracts all expressions (phrase or word) from the text that match an expression in target list. """
-    preprocessed_text = preprocess_text(text)
-    extraction, _ = process_string_list(preprocessed_text, target_string_list, cutoff)
-    return extraction
+    """ Extracts all expressions (phrase or word) from the text that match an expression in target list.
+    Each match also holds the (start, end) character offsets of the matched expression in the text. """
+    chunks = get_default_preprocessor().preprocess_text_spans(text)
+    tokens, segments = tokenize_string_list([chunk.text for chunk in chunks])
+    extraction, _ = process_segments(tokens, segments, bucket_target_strings(target_string_list), cutoff)
+    return locate_matches(extraction, chunks)
     
+def highlight_matches(text: str, matches: List[dict]) -> str:
+    """Highlights the matches in the text with console colors, using their character offsets (see <locate_matches>)."""
+    res = []
+    last_end = 0
+    for m in sorted(matches, key=lambda m: m["start"]):
+        if m["start"] < last_end:
+            continue
+        res.append(text[last_end:m["start"]])
+        res.append('\033[44;33m{}\033[0;0;0m'.format(text[m["start"]:m["end"]]))
+        last_end = m["end"]
+    res.append(text[last_end:])
+    return "".join(res)
+
 def cprint(text: str, words_to_highlight: Union[str, List[str]]) -> None:
     """Prints a text into the console while highlighting some words of the text in colors."""
     if isinstance(words_to_highlight, str):
@@ -1,6 +1,6 @@
 # Author: Julian Rasch
 # Co-auhtor: Maximilian Kania
-from typing import List
+from typing import Iterable, Iterator, List, NamedTuple, Tuple
 import itertools
 import re
 from nltk.corpus import stopwords
@@ -52,8 +52,15 @@ def preprocess_text(text: str)-> List[str]:
     2. The sentences are split at punctuation (,;:), as skills typically do not cross punctuation.
     3. The resulting tokens are further split at stop words, as skills typically do not contain crosswords.
     4. White spaces are removed and everything is transformed to lower case.
+
+    Runs the shared <Preprocessor> (stopwords loaded once), see <preprocess_text_reference> for the step-by-step version.
     """
-    stop_words = stopwords.words('english')
+    return get_default_preprocessor().preprocess_text(text)
+
+def preprocess_text_reference(text: str, stop_words: List[str] = None)-> List[str]:
+    """Step-by-step implementation of <preprocess_text>, the reference for the output of the <Preprocessor>."""
+    if stop_words is None:
+        stop_words = stopwords.words('english')
     sentences_list = split_text_into_sentences(text=text)
     punctuation_tokens = [
         split_sentence_at_punctuation(sentence) for sentence in sentences_list
@@ -67,6 +74,127 @@ def preprocess_text(text: str)-> List[str]:
 
     return res
 
+class Chunk(NamedTuple):
+    """A preprocessed string (as returned by <preprocess_text>) with the (start, end) character span
+    in the original text of each of its tokens (the words of text.split(" "))."""
+    text: str
+    spans: Tuple[Tuple[int, int], ...]
+
+
+class Preprocessor():
+    """Compiled version of <preprocess_text_reference> for repeated use, with identical output.
+
+    The stopwords are loaded once into a frozenset and all regular expressions are compiled once.
+    Sentence and punctuation delimiters are found in a single scan over the text, the chunks
+    in between are cleaned and split at stopwords right away.
+    """
+
+    def __init__(self, stop_words: Iterable[str] = None):
+        if stop_words is None:
+            stop_words = stopwords.words('english')
+        self.stop_words = frozenset(stop_words)
+        # sentence delimiters of <split_text_into_sentences> (named group), punctuation of <split_sentence_at_punctuation>
+        self._delimiters = re.compile('(?P<sentence>\. |! |\? |\• |\n)|\, | \; | \:')
+        self._special_chars = re.compile(r'['+re.escape(punctuation)+'•'+']')
+        self._special_char_set = frozenset(punctuation + '•')
+        self._spaces = re.compile(' +')
+
+    def _chunk_bounds(self, text: str) -> Iterator[Tuple[int, int]]:
+        """Yields the (start, end) bounds of the punctuation chunks of all non-empty sentences of the text."""
+        sentence = []
+        start = 0
+        for delimiter in self._delimiters.finditer(text):
+            sentence.append((start, delimiter.start()))
+            start = delimiter.end()
+            if delimiter.group("sentence") is not None:
+                if not self._is_empty_sentence(sentence):
+                    yield from sentence
+                sentence = []
+        sentence.append((start, len(text)))
+        if not self._is_empty_sentence(sentence):
+            yield from sentence
+
+    @staticmethod
+    def _is_empty_sentence(sentence: List[Tuple[int, int]]) -> bool:
+        return len(sentence) == 1 and sentence[0][0] == sentence[0][1]
+
+    def preprocess_text(self, text: str) -> List[str]:
+        """See <preprocess_text>."""
+        res = []
+        stop_words = self.stop_words
+        for start, end in self._chunk_bounds(text):
+            chunk = self._spaces.sub(' ', self._special_chars.sub('', text[start:end]))
+            for is_stopword, tokens in itertools.groupby(chunk.split(" "), lambda z: z.lower() in stop_words):
+                if not is_stopword:
+                    res.append(" ".join(tokens).strip().lower())
+        return res
+
+    def preprocess_text_spans(self, text: str) -> List[Chunk]:
+        """Same as <preprocess_text>, but every preprocessed string comes with the character spans of its tokens
+        in the original text, so matches can be located in the text without searching for them again."""
+        res = []
+        stop_words = self.stop_words
+        special_chars = self._special_char_set
+        for start, end in self._chunk_bounds(text):
+            # words of the cleaned chunk as lists of (character, position in the text)
+            words = [[]]
+            for i in range(start, end):
+                c = text[i]
+                if c in special_chars:
+                    continue
+                if c == " ":
+                    # consecutive spaces (also around removed characters) are collapsed to one
+                    if not (words[-1] == [] and len(words) > 1):
+                        words.append([])
+                else:
+                    words[-1].append((c, i))
+
+            for is_stopword, group in itertools.groupby(words, lambda w: "".join(c for c, _ in w).lower() in stop_words):
+                if not is_stopword:
+                    res.append(self._chunk(list(group)))
+        return res
+
+    @staticmethod
+    def _chunk(words: List[List[Tuple[str, int]]]) -> Chunk:
+        """Joins words of (character, position) pairs like <preprocess_text> and keeps the position of every character."""
+        chars: List[Tuple[str, int]] = []
+        for k, word in enumerate(words):
+            if k > 0:
+                chars.append((" ", -1))
+            chars.extend(word)
+
+        # strip and lowercase (a character may turn into several characters when lowercased)
+        first = 0
+        while first < len(chars) and chars[first][0].isspace():
+            first += 1
+        last = len(chars)
+        while last > first and chars[last - 1][0].isspace():
+            last -= 1
+        stripped = "".join(c for c, _ in chars[first:last])
+        positions = [i for c, i in chars[first:last] for _ in c.lower()]
+        text = stripped.lower()
+
+        spans = []
+        offset = 0
+        for token in text.split(" "):
+            token_positions = [i for i in positions[offset:offset + len(token)] if i >= 0]
+            if token_positions:
+                spans.append((token_positions[0], token_positions[-1] + 1))
+            else:
+                spans.append((spans[-1][1], spans[-1][1]) if spans else (0, 0))
+            offset += len(token) + 1
+        return Chunk(text, tuple(spans))
+
+
+_default_preprocessor = None
+
+def get_default_preprocessor() -> Preprocessor:
+    """Returns a process-wide Preprocessor with the English NLTK stopwords (created on first use)."""
+    global _default_preprocessor
+    if _default_preprocessor is None:
+        _default_preprocessor = Preprocessor()
+    return _default_preprocessor
+
 def _replace_symbols(sym_list: list, input: str, repl_sym: str=" "):
     res = input
     for sym in sym_list:
@@ -0,0 +1,44 @@
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+
+class CanonicalTitle(NamedTuple):
+    """ Canonical record of a normalized title (or abbreviation) of a skill catalogue. """
+    title: str  # display title, without information in parentheses
+    skill_domain: str
+    row: int  # row of the title in the skill CSV file
+
+
+def strip_parentheses(title: str) -> str:
+    """ Removes information in parentheses or brackets and surrounding whitespace from a title. """
+    return re.sub("[\(\[].*?[\)\]]", "", title).strip()
+
+
+class TitleRegistry():
+    """ Maps the normalized titles and abbreviations of a skill catalogue (lowercased, as they are matched)
+    to their canonical records, so matches are turned into display titles with dict lookups. """
+
+    def __init__(self, skill_domain: str):
+        self.skill_domain = skill_domain
+        self.records: Dict[str, CanonicalTitle] = {}
+
+    def add(self, key: Optional[str], display_title: str, row: int) -> None:
+        """ Registers a key for the display title of a row, unless the key is missing or already registered. """
+        if key is None or key != key:  # skip missing (np.nan) values
+            return
+        self.records.setdefault(str(key).lower(), CanonicalTitle(strip_parentheses(str(display_title)), self.skill_domain, row))
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def get(self, key: str) -> Optional[CanonicalTitle]:
+        return self.records.get(key.lower())
+
+    def canonical_titles(self, keys: Iterable[str]) -> List[str]:
+        """ Returns the display titles of the keys in the order of the keys, without duplicates and unknown keys. """
+        titles = []
+        for key in keys:
+            record = self.get(key)
+            if record is not None and record.title not in titles:
+                titles.append(record.title)
+        return titles
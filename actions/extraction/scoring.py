@@ -0,0 +1,166 @@
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from rapidfuzz import fuzz, process, utils
+
+
+# Number of query rows scored per cdist call, bounds the size of the score matrix
+CDIST_CHUNK_SIZE = 64
+
+
+def scorer_for_n_gram_size(n_gram_size: int) -> Tuple:
+    """Returns the (scorer, processor) pair <_compute_match_score> uses for n-grams of the given size.
+
+    Multi-word n-grams are compared to multi-word targets with token_sort_ratio, single words with ratio.
+    token_sort_ratio preprocesses both strings with utils.default_process by default (rapidfuzz 2.x),
+    which has to be passed to cdist explicitly.
+    """
+    if n_gram_size > 1:
+        return fuzz.token_sort_ratio, utils.default_process
+    return fuzz.ratio, None
+
+
+def comparison_form(string: str, n_gram_size: int) -> str:
+    """Returns the string the scorer for the n-gram size actually compares: token_sort_ratio is the ratio of the
+    processed, sorted tokens (see <scorer_for_n_gram_size>), ratio compares the string as it is."""
+    if n_gram_size > 1:
+        return " ".join(sorted(utils.default_process(string).split()))
+    return string
+
+
+def length_window(length: int, cutoff: float) -> Tuple[float, float]:
+    """Returns the range of string lengths that can reach the cutoff with fuzz.ratio against a string of the given length.
+
+    ratio >= cutoff requires an indel distance of at most (100 - cutoff) / 100 * (len(a) + len(b)),
+    which is at least the length difference |len(a) - len(b)|.
+    """
+    r = (100 - cutoff) / 100
+    if r >= 1:
+        return 0, float("inf")
+    return length * (1 - r) / (1 + r) - 1e-9, length * (1 + r) / (1 - r) + 1e-9
+
+
+class LengthSortedTargets(list):
+    """List of target strings that additionally keeps the targets sorted by length,
+    so that a query only has to visit the targets whose length can reach the cutoff (see <window>).
+
+    The list itself keeps the original order, the sorted views are computed once and the list must not be changed.
+    """
+
+    def __init__(self, target_string_list: List[str]):
+        super().__init__(target_string_list)
+        # targets compared with ratio are compared as they are, targets with a space are compared with
+        # token_sort_ratio to queries with a space (see <_compute_match_score>)
+        self._by_length = self._sorted_view(range(len(self)), len)
+        self._without_space_by_length = self._sorted_view([i for i, s in enumerate(self) if " " not in s], len)
+        self._with_space_by_length = self._sorted_view(
+            [i for i, s in enumerate(self) if " " in s], lambda s: len(comparison_form(s, 2)))
+
+    def _sorted_view(self, indices, key) -> Tuple[List[int], List[int]]:
+        pairs = sorted((key(self[i]), i) for i in indices)
+        return [length for length, _ in pairs], [i for _, i in pairs]
+
+    @staticmethod
+    def _visit(view: Tuple[List[int], List[int]], length: int, cutoff: float) -> List[int]:
+        lengths, indices = view
+        low, high = length_window(length, cutoff)
+        return indices[bisect_left(lengths, low):bisect_right(lengths, high)]
+
+    def window(self, string: str, cutoff: float) -> List[int]:
+        """Returns the indices (in list order) of all targets whose length can reach the cutoff with the string."""
+        if " " in string:
+            indices = (self._visit(self._without_space_by_length, len(string), cutoff)
+                       + self._visit(self._with_space_by_length, len(comparison_form(string, 2)), cutoff))
+        else:
+            indices = self._visit(self._by_length, len(string), cutoff)
+        return sorted(indices)
+
+
+def pick_best(candidates: Sequence[int], scores: Sequence[float]) -> Optional[Tuple[int, float]]:
+    """Returns the (target index, score) pair that <best_match> would select out of the scored candidates:
+    the highest score rounded to two decimals, ties are resolved by the position in the target list.
+    """
+    best = None
+    best_rounded = None
+    for idx, score in sorted(zip(candidates, scores)):
+        rounded = round(score, 2)
+        if best is None or rounded > best_rounded:
+            best = (idx, score)
+            best_rounded = rounded
+    return best
+
+
+def cdist_candidates(
+    queries: List[str],
+    targets: List[str],
+    n_gram_size: int,
+    cutoff: float,
+    workers: int = 1
+    ) -> List[List[Tuple[int, float]]]:
+    """Scores all n-gram queries against all targets of the same n-gram size with one rapidfuzz cdist call
+    (per chunk of queries) and returns all (target index, score) pairs per query that reach the cutoff.
+    """
+    candidates: List[List[Tuple[int, float]]] = [[] for _ in queries]
+    if not queries or not targets:
+        return candidates
+
+    scorer, processor = scorer_for_n_gram_size(n_gram_size)
+
+    for start in range(0, len(queries), CDIST_CHUNK_SIZE):
+        chunk = queries[start:start + CDIST_CHUNK_SIZE]
+        score_matrix = process.cdist(
+            chunk, targets, scorer=scorer, processor=processor,
+            score_cutoff=cutoff, dtype=np.float64, workers=workers)
+
+        for row_idx, row in enumerate(score_matrix):
+            indices = np.flatnonzero(row)
+            if len(indices) > 0:
+                candidates[start + row_idx] = list(zip(indices.tolist(), row[indices].tolist()))
+
+    return candidates
+
+
+class ScoreTable():
+    """Candidate matches per n-gram, scored once at a floor cutoff against buckets of target strings.
+
+    The best match of an n-gram for any cutoff above the floor is then a filter over the stored candidates,
+    so the same text can be matched with several cutoffs without scoring it again.
+    """
+
+    def __init__(self, target_buckets: Dict[int, List[str]], floor_cutoff: float, workers: int = 1, bucket_indexes: Dict[int, Any] = None):
+        """
+        Args:
+            bucket_indexes: optional candidate indexes per n-gram size (e.g. a TrigramIndex), which have to return
+                the same candidates as <cdist_candidates> for the bucket, buckets without index are scored with cdist
+        """
+        self.target_buckets = target_buckets
+        self.floor_cutoff = floor_cutoff
+        self.workers = workers
+        self.bucket_indexes = bucket_indexes or {}
+        self.candidates: Dict[Tuple[int, str], List[Tuple[int, float]]] = {}
+
+    def score(self, n_grams: List[str], n_gram_size: int) -> None:
+        """Scores all n-grams that are not in the table yet with one batched call."""
+        missing = [n_gram for n_gram in dict.fromkeys(n_grams) if (n_gram_size, n_gram) not in self.candidates]
+        if missing:
+            if n_gram_size in self.bucket_indexes:
+                scored = self.bucket_indexes[n_gram_size].candidates(missing, self.floor_cutoff, workers=self.workers)
+            else:
+                scored = cdist_candidates(
+                    missing, self.target_buckets.get(n_gram_size, []), n_gram_size, self.floor_cutoff, workers=self.workers)
+            for n_gram, candidates in zip(missing, scored):
+                self.candidates[(n_gram_size, n_gram)] = candidates
+
+    def best_match(self, n_gram: str, n_gram_size: int, cutoff: float) -> Optional[dict]:
+        """Returns the best match of an n-gram in the format of <best_match>, or None."""
+        if cutoff < self.floor_cutoff:
+            raise ValueError("cutoff must not be lower than the floor cutoff of the score table")
+        if (n_gram_size, n_gram) not in self.candidates:
+            self.score([n_gram], n_gram_size)
+
+        candidates = [(idx, score) for idx, score in self.candidates[(n_gram_size, n_gram)] if score >= cutoff]
+        if not candidates:
+            return None
+        idx, score = pick_best(*zip(*candidates))
+        return {"title": n_gram, "match": self.target_buckets[n_gram_size][idx], "score": round(score, 2)}
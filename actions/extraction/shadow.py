@@ -0,0 +1,298 @@
+import argparse
+import copy
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .cascade import CascadePolicy, CascadeStep
+from .extractor import extract_strings_from_text
+from .skill_index import SkillIndex, get_skill_index, reload_skill_index
+
+
+# Catalogue versions of the action server the skill indexes of a shadow worker process belong to, see <_worker_skill_index>
+_worker_versions: Dict[Tuple[str, str], int] = {}
+
+
+class ShadowMode():
+    """ Compares the extraction the actions serve with the legacy extraction on sampled messages and logs the differences.
+
+    The legacy extraction is <extract_strings_from_text>, the pairwise <process_string_list> over all titles of the
+    catalogue, which every engine has to reproduce. For a sampled fraction of the extractions, the legacy and the
+    candidate extraction (the served settings, optionally with another engine, segmentation or exact pre-pass) run
+    again in a separate worker process, off the hot path: the legacy extraction is a pure-Python loop over all titles,
+    which must not hold the GIL of the action server, and the user always gets the served matches. Both are timed
+    there without the extraction cache, so the latencies are comparable. The worker process gets the skill indexes
+    when it is forked (or builds them) and reloads a catalogue once the action server uses a newer version of it. Cutoff cascades (see <CascadePolicy>) are compared
+    with the legacy cascade: the legacy extraction per step until a step is accepted.
+    Every comparison is appended as one JSON line to the log file (matches that only one side found,
+    score differences, latencies), see <summarize_shadow_log> for the report.
+    """
+
+    def __init__(
+        self,
+        sample_rate: float = 0.1,
+        log_path: str = "shadow_extraction.jsonl",
+        engine: str = None,
+        segmentation: str = None,
+        exact_first: bool = None,
+        max_pending: int = 100,
+        seed: int = None
+        ):
+        """
+        Args:
+            sample_rate: fraction of the extractions that are compared
+            engine, segmentation, exact_first: settings of the candidate extraction that replace the served settings,
+                see <SkillIndex.extract> (cascades always score in batches, so only the latter two apply to them)
+            max_pending: comparisons waiting in the background at most, further samples are skipped
+        """
+        self.sample_rate = sample_rate
+        self.log_path = log_path
+        self.overrides = {
+            key: value for key, value in (("engine", engine), ("segmentation", segmentation), ("exact_first", exact_first))
+            if value is not None
+        }
+        self.max_pending = max_pending
+        self._random = random.Random(seed)
+        self._executor = ProcessPoolExecutor(max_workers=1)
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> Optional["ShadowMode"]:
+        """ Returns the shadow mode configured with the EXTRACTION_SHADOW_* environment variables,
+        or None if EXTRACTION_SHADOW_SAMPLE_RATE is not set (or 0). """
+        sample_rate = float(os.environ.get("EXTRACTION_SHADOW_SAMPLE_RATE", 0))
+        if sample_rate <= 0:
+            return None
+        exact_first = os.environ.get("EXTRACTION_SHADOW_EXACT_FIRST")
+        return cls(
+            sample_rate=sample_rate,
+            log_path=os.environ.get("EXTRACTION_SHADOW_LOG", "shadow_extraction.jsonl"),
+            engine=os.environ.get("EXTRACTION_SHADOW_ENGINE"),
+            segmentation=os.environ.get("EXTRACTION_SHADOW_SEGMENTATION"),
+            exact_first=None if exact_first is None else exact_first.lower() in ("1", "true", "yes"))
+
+    def _sample(self) -> bool:
+        with self._lock:
+            if self._random.random() >= self.sample_rate or self._pending >= self.max_pending:
+                return False
+            self._pending += 1
+            return True
+
+    def submit(self, skill_index: SkillIndex, text: str, cutoff: int, settings: dict) -> bool:
+        """ Compares the extraction of a text from one catalogue with the legacy extraction in the background, if sampled.
+
+        Args:
+            settings: keyword arguments of the served <SkillIndex.extract> call (engine, segmentation, ...)
+        """
+        if not self._sample():
+            return False
+        candidate_settings = dict(settings, **self.overrides)
+        self._submit(
+            _compare_extraction,
+            ((skill_index.skill_domain, skill_index.filename), skill_index.version, text, cutoff, candidate_settings),
+            text,
+            {
+                "catalogue": skill_index.filename,
+                "catalogue_version": skill_index.version,
+                "cutoff": cutoff,
+                "candidate": candidate_settings,
+            })
+        return True
+
+    def submit_cascade(self, policy: CascadePolicy, text: str) -> bool:
+        """ Compares the extraction of a text with a cutoff cascade with the legacy cascade in the background, if sampled. """
+        if not self._sample():
+            return False
+        versions = {key: get_skill_index(*key).version for key in policy.floor_cutoffs}
+        candidate = copy.copy(policy)
+        for key in ("segmentation", "exact_first"):
+            setattr(candidate, key, self.overrides.get(key, getattr(policy, key)))
+
+        self._submit(
+            _compare_cascade,
+            (policy, candidate, versions, text),
+            text,
+            {
+                "catalogue": "+".join(filename for _, filename in versions),
+                "catalogue_version": list(versions.values()),
+                "cutoff": [step.cutoff for step in policy.steps],
+                "candidate": {"policy": type(policy).__name__, "segmentation": candidate.segmentation, "exact_first": candidate.exact_first},
+            })
+        return True
+
+    def _submit(self, compare: Callable[..., dict], args: tuple, text: str, context: dict) -> None:
+        """ Runs a comparison in the worker process and logs its record once it is done. """
+        try:
+            future = self._executor.submit(compare, *args)
+        except Exception:
+            logging.exception("Shadow extraction failed")
+            with self._lock:
+                self._pending -= 1
+            return
+        future.add_done_callback(lambda future: self._log(future, text, context))
+
+    def _log(self, future: Future, text: str, context: dict) -> None:
+        try:
+            record = future.result()
+            record.update(context)
+            record.update({
+                "time": time.time(),
+                "text_sha256": hashlib.sha256(text.encode("utf-8")).hexdigest(),
+            })
+            # the text is only needed to reproduce a difference
+            if not record["agree"]:
+                record["text"] = text
+
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except Exception:
+            logging.exception("Shadow extraction failed")
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def shutdown(self) -> None:
+        """ Waits for the pending comparisons and stops the worker process. """
+        self._executor.shutdown(wait=True)
+
+
+def _worker_skill_index(skill_domain: str, filename: str, version: int) -> SkillIndex:
+    """ Returns the skill index of a catalogue in the worker process, reloaded from the files if the action server
+    installed another version since the last comparison (versions are only comparable within the action server). """
+    key = (skill_domain, filename)
+    if _worker_versions.get(key, version) != version:
+        reload_skill_index(skill_domain, filename)
+    _worker_versions[key] = version
+    return get_skill_index(skill_domain, filename)
+
+
+def _compare_extraction(catalogue: Tuple[str, str], version: int, text: str, cutoff: int, settings: dict) -> dict:
+    """ Compares the legacy extraction from one catalogue with the candidate extraction (runs in the worker process). """
+    skill_index = _worker_skill_index(*catalogue, version)
+    return _compare(
+        lambda: (extract_strings_from_text(text, list(skill_index.skills), cutoff), None),
+        lambda: (skill_index.extract(text, cutoff=cutoff, use_cache=False, **settings), None))
+
+
+def _compare_cascade(policy: CascadePolicy, candidate: CascadePolicy, versions: Dict[Tuple[str, str], int], text: str) -> dict:
+    """ Compares the legacy cascade (the legacy extraction per step until a step is accepted) with the candidate cascade
+    (runs in the worker process). """
+    indexes = {key: _worker_skill_index(*key, version) for key, version in versions.items()}
+
+    def legacy_cascade() -> Tuple[List[dict], Optional[CascadeStep]]:
+        for step in policy.steps:
+            matches = extract_strings_from_text(text, list(indexes[(step.skill_domain, step.filename)].skills), step.cutoff)
+            if policy.accept(matches, step):
+                return matches, step
+        return [], None
+
+    return _compare(legacy_cascade, lambda: candidate.extract(text, use_cache=False))
+
+
+def _compare(
+    legacy: Callable[[], Tuple[List[dict], Optional[CascadeStep]]],
+    candidate: Callable[[], Tuple[List[dict], Optional[CascadeStep]]]
+    ) -> dict:
+    """ Runs and times the legacy and the candidate extraction and returns the comparison (see <compare_matches>). """
+    start = time.perf_counter()
+    legacy_matches, legacy_step = legacy()
+    legacy_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    candidate_matches, candidate_step = candidate()
+    candidate_ms = (time.perf_counter() - start) * 1000
+
+    record = compare_matches(legacy_matches, candidate_matches)
+    if legacy_step != candidate_step:
+        record["agree"] = False
+        record["steps"] = {"legacy": legacy_step, "candidate": candidate_step}
+    record.update({"legacy_ms": round(legacy_ms, 3), "candidate_ms": round(candidate_ms, 3)})
+    return record
+
+
+def compare_matches(legacy_matches: List[dict], candidate_matches: List[dict]) -> dict:
+    """ Compares two extraction results by matched title per expression: returns whether they agree, the matches
+    only one of them found and the score differences of the matches both found. """
+    def by_key(ms: List[dict]) -> Dict[tuple, dict]:
+        return {(m["title"], m["match"], m.get("start"), m.get("end")): m for m in ms}
+
+    legacy, candidate = by_key(legacy_matches), by_key(candidate_matches)
+    only_legacy = [legacy[key] for key in legacy if key not in candidate]
+    only_candidate = [candidate[key] for key in candidate if key not in legacy]
+    score_diffs = [
+        {"title": key[0], "match": key[1], "legacy": legacy[key]["score"], "candidate": candidate[key]["score"]}
+        for key in legacy if key in candidate and legacy[key]["score"] != candidate[key]["score"]
+    ]
+    return {
+        "agree": not only_legacy and not only_candidate and not score_diffs,
+        "matches": len(legacy_matches),
+        "only_legacy": only_legacy,
+        "only_candidate": only_candidate,
+        "score_diffs": score_diffs,
+    }
+
+
+def summarize_shadow_log(path: str) -> dict:
+    """ Summarizes a shadow log: agreement rate, latency percentiles of the legacy and the candidate extraction
+    and the speedup per catalogue and candidate settings. """
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                records.append(json.loads(line))
+
+    summaries = {}
+    for record in records:
+        settings = " ".join(f"{key}={value}" for key, value in sorted(record["candidate"].items()))
+        summaries.setdefault(f"{record['catalogue']}: {settings}", []).append(record)
+
+    summary = {"records": len(records), "candidates": {}}
+    for candidate, candidate_records in summaries.items():
+        legacy_ms = np.array([r["legacy_ms"] for r in candidate_records])
+        candidate_ms = np.array([r["candidate_ms"] for r in candidate_records])
+        summary["candidates"][candidate] = {
+            "comparisons": len(candidate_records),
+            "agreement_rate": round(sum(r["agree"] for r in candidate_records) / len(candidate_records), 4),
+            "missing_matches": sum(len(r["only_legacy"]) for r in candidate_records),
+            "additional_matches": sum(len(r["only_candidate"]) for r in candidate_records),
+            "score_diffs": sum(len(r["score_diffs"]) for r in candidate_records),
+            "step_diffs": sum("steps" in r for r in candidate_records),
+            "legacy_ms": {"p50": round(float(np.percentile(legacy_ms, 50)), 3), "p95": round(float(np.percentile(legacy_ms, 95)), 3)},
+            "candidate_ms": {"p50": round(float(np.percentile(candidate_ms, 50)), 3), "p95": round(float(np.percentile(candidate_ms, 95)), 3)},
+            "speedup": round(float(legacy_ms.sum() / candidate_ms.sum()), 2) if candidate_ms.sum() else None,
+        }
+    return summary
+
+
+def main(args: List[str] = None) -> None:
+    """ Prints the summary of a shadow log (see <summarize_shadow_log>) and, optionally, the differing texts. """
+    parser = argparse.ArgumentParser(description="Summarizes the comparisons of a shadow extraction log.")
+    parser.add_argument("log", help="JSONL log written by the shadow mode")
+    parser.add_argument("--diffs", type=int, default=0, help="number of differing extractions to print")
+    args = parser.parse_args(args)
+
+    print(json.dumps(summarize_shadow_log(args.log), indent=2))
+
+    if args.diffs:
+        printed = 0
+        with open(args.log, encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line) if line.strip() else None
+                if record and not record["agree"]:
+                    print(json.dumps({key: record[key] for key in ("text", "only_legacy", "only_candidate", "score_diffs", "steps") if key in record}, ensure_ascii=False))
+                    printed += 1
+                    if printed >= args.diffs:
+                        break
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,413 @@
+import itertools
+import logging
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from actions.helper import init_skills_df
+from .cache import extraction_cache, invalidate_extraction_caches, preprocess_text_cached, preprocess_text_spans_cached
+from .catalogue import DEFAULT_CATALOGUE_PATH, CatalogueFile, CompiledCatalogue, StaleCatalogueError
+from .deletion import DeletionIndex
+from .exact import ExactMatcher
+from .extractor import (PairwiseScoreTable, Segment, bucket_target_strings, locate_matches, process_segments,
+                        process_segments_optimal, process_segments_scored, tokenize_string_list)
+from .registry import TitleRegistry
+from .scoring import LengthSortedTargets, ScoreTable
+from .trigram import TrigramIndex
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+# (skill_domain, filename) pairs that are loaded when the action server starts
+SKILL_CATALOGUES = [
+    ("emsi", "emsi_skills.csv"),
+    ("onet", "onet_alternate_titles_normalized.csv"),
+    ("edyoucated", "edyoucated_skills.csv"),
+]
+
+# Skill domains with catalogues large enough to build trigram indexes for the candidate generation
+TRIGRAM_INDEX_DOMAINS = ["onet"]
+
+# Minimum number of single-word titles (unigram bucket) for which a deletion dictionary pays off
+DELETION_INDEX_MIN_TARGETS = 1000
+
+# Skill domains that get a deletion dictionary for their single-word titles regardless of the number of titles.
+# Empty by default: edyoucated has 26 single-word titles, scoring them all with cdist is about 4-9x faster than
+# looking up the deletions of every word (onet, 4982 titles, is 1.2-2.7x faster with the dictionary)
+DELETION_INDEX_DOMAINS: List[str] = []
+
+# Columns holding the normalized and the display version of a title per skill domain
+DISPLAY_COLUMNS = {
+    "emsi": ("emsi_skill_title_normalized", "emsi_skill_title"),
+    "onet": ("title_normalized", "title"),
+    "edyoucated": ("skill_titles_normalized", "skill_titles"),
+}
+
+# Columns holding abbreviations of the titles per skill domain (matched like the normalized titles)
+ABBREVIATION_COLUMNS = {
+    "edyoucated": ["skill_title_abbreviation"],
+}
+
+# Columns of the skill CSV files that are stored in the compiled catalogues
+CATALOGUE_COLUMNS = {
+    "emsi": ["emsi_skill_title_normalized", "emsi_skill_title"],
+    "onet": ["title_normalized", "title"],
+    "edyoucated": ["skill_titles_normalized", "skill_titles", "skill_title_abbreviation", "skill_tags"],
+}
+
+
+def init_skills_from_dataframe(skill_domain: str, skills_df: "pd.DataFrame") -> List[str]:
+    """ Returns the (normalized) skill titles of a skill domain that are used as targets for the extraction. """
+
+    if skill_domain=="emsi":
+        skills: List[str] = skills_df["emsi_skill_title_normalized"].tolist()
+
+    elif skill_domain=="onet":
+        skills: List[str] = skills_df["title_normalized"].tolist()
+
+    elif skill_domain=="edyoucated":
+        skills: List[str] = skills_df["skill_titles_normalized"].tolist()
+        abbreviations = skills_df["skill_title_abbreviation"].tolist()
+        abbreviations = [x for x in abbreviations if x is not None]
+
+        skills.extend(abbreviations)
+        skills = [x for x in skills if x == x]  # eliminate np.nan values
+    else:
+        raise ValueError("invalid skill_domain specified as argument")
+
+    return skills
+
+
+_index_versions = itertools.count(1)
+
+
+class SkillIndex():
+    """ In-memory representation of a skill catalogue, prepared once for repeated extraction.
+
+    Holds the target titles already lowercased and bucketed by word count (as required by
+    <process_string_list>), an exact matcher over the titles (including abbreviations), candidate indexes
+    for the buckets (trigrams, deletion dictionary) and the registry of canonical (display) titles.
+    Built from a compiled catalogue, the titles and columns are views into the memory-mapped file,
+    only the buckets (and the indexes over them) hold the targets as Python strings, as the scoring needs them.
+    """
+
+    def __init__(self, skill_domain: str, skills_df: "pd.DataFrame" = None, filename: str = None, compiled: CompiledCatalogue = None):
+        """
+        Args:
+            skills_df: the skill catalogue, not needed if a compiled catalogue is given (it is then read lazily)
+            compiled: the compiled catalogue of the skill CSV file (see <compile_catalogues>)
+        """
+        self.skill_domain = skill_domain
+        self.filename = filename
+        # distinguishes indexes of reloaded catalogues, e.g. in cache keys
+        self.version = next(_index_versions)
+        self.compiled = compiled
+        self._skills_df = skills_df
+
+        if compiled is not None:
+            self.skills: Sequence[str] = compiled.skills
+            self.targets: Sequence[str] = compiled.targets
+            self.buckets = {
+                n_gram_size: LengthSortedTargets([self.targets[i] for i in indices.tolist()])
+                for n_gram_size, indices in compiled.buckets.items()
+            }
+        else:
+            self.skills = init_skills_from_dataframe(skill_domain, skills_df)
+            self.targets = [s.lower() for s in self.skills]
+            self.buckets = bucket_target_strings(self.targets)
+        # built from the buckets, so the matcher shares their strings; single words are left to the n-gram matching,
+        # checking an exact single word scores all n-grams the matching would score for it (see <cut_exact_matches>)
+        self.exact_matcher = ExactMatcher(itertools.chain.from_iterable(self.buckets.values()), min_n_gram_size=2)
+
+        self.bucket_indexes: Dict[int, Any] = {}
+        if skill_domain in TRIGRAM_INDEX_DOMAINS:
+            self.bucket_indexes = {
+                n_gram_size: TrigramIndex(targets, n_gram_size) for n_gram_size, targets in self.buckets.items() if n_gram_size <= 4
+            }
+        if 1 in self.buckets and (len(self.buckets[1]) >= DELETION_INDEX_MIN_TARGETS or skill_domain in DELETION_INDEX_DOMAINS):
+            self.bucket_indexes[1] = DeletionIndex(self.buckets[1], fallback=self.bucket_indexes.get(1))
+
+        # normalized titles first, so they take precedence over abbreviations
+        normalized_column, display_column = DISPLAY_COLUMNS[skill_domain]
+        display_titles = self.column(display_column)
+        self.registry = TitleRegistry(skill_domain)
+        for key_column in [normalized_column] + ABBREVIATION_COLUMNS.get(skill_domain, []):
+            for row, (key, display_title) in enumerate(zip(self.column(key_column), display_titles)):
+                self.registry.add(key, display_title, row)
+
+    @classmethod
+    def from_csv(cls, skill_domain: str, filename: str) -> "SkillIndex":
+        """ Builds the index from a skill CSV file in the 'edyoucated' directory. """
+        return cls(skill_domain, init_skills_df(filename=filename), filename=filename)
+
+    @classmethod
+    def from_compiled(cls, compiled: CompiledCatalogue) -> "SkillIndex":
+        """ Builds the index from a compiled catalogue, without reading the CSV file. """
+        return cls(compiled.skill_domain, filename=compiled.filename, compiled=compiled)
+
+    def column(self, name: str) -> Sequence[Any]:
+        """ Returns a column of the skill catalogue, from the compiled catalogue if possible (see <CATALOGUE_COLUMNS>). """
+        if self.compiled is not None and name in CATALOGUE_COLUMNS[self.skill_domain]:
+            return self.compiled.column(name)
+        return self.skills_df[name].tolist()
+
+    @property
+    def skills_df(self) -> "pd.DataFrame":
+        """ The skill catalogue as DataFrame, read from the CSV file on first use if the index was built from a compiled catalogue. """
+        if self._skills_df is None:
+            self._skills_df = init_skills_df(filename=self.filename)
+        return self._skills_df
+
+    def __len__(self) -> int:
+        return len(self.targets)
+
+    def extract(
+        self,
+        text: str,
+        cutoff: int = 90,
+        engine: str = "legacy",
+        workers: int = 1,
+        exact_first: bool = False,
+        segmentation: str = "greedy",
+        use_cache: bool = True
+        ) -> List[dict]:
+        """ Extracts all expressions from the text that match a title of the catalogue (see <extract_strings_from_text>).
+        Each match also holds the (start, end) character offsets of the matched expression in the text.
+
+        Args:
+            engine: 'legacy' (pairwise scoring) or 'batched' (cdist score matrices), both return the same matches
+            workers: number of threads rapidfuzz may use for the 'batched' engine (-1 for all cores)
+            exact_first: cut out exact occurrences of titles before fuzzy matching, so only the remaining text is scored
+                (off by default: checking the occurrences costs about as much as the n-grams it saves)
+            segmentation: 'greedy' (n-gram descent of <process_string_list>) or 'optimal' (best non-overlapping
+                matches, see <process_segments_optimal>), the optimal segmentation always scores in batches
+            use_cache: look up and store the result in the extraction cache (disable e.g. to time the engine itself)
+        """
+        if engine not in ("legacy", "batched"):
+            raise ValueError("invalid extraction engine specified as argument")
+        if segmentation not in ("greedy", "optimal"):
+            raise ValueError("invalid segmentation specified as argument")
+
+        chunks = preprocess_text_spans_cached(text)
+        preprocessed_text = [chunk.text for chunk in chunks]
+        # the cached matches refer to the preprocessed strings, the offsets are added per text
+        key = (tuple(preprocessed_text), self.skill_domain, self.filename, self.version, cutoff, engine, exact_first, segmentation)
+        extraction = extraction_cache.get(key) if use_cache else None
+        if extraction is None:
+            extraction = tuple(self._extract(preprocessed_text, cutoff, engine, workers, exact_first, segmentation))
+            if use_cache:
+                extraction_cache.put(key, extraction)
+
+        return locate_matches(extraction, chunks)
+
+    def _extract(
+        self,
+        preprocessed_text: List[str],
+        cutoff: int,
+        engine: str,
+        workers: int,
+        exact_first: bool,
+        segmentation: str
+        ) -> List[Tuple[dict, Segment]]:
+        if engine == "batched" or segmentation == "optimal":
+            scored = ScoredExtraction(
+                self, preprocessed_text, cutoff, workers=workers, exact_first=exact_first, segmentation=segmentation)
+            return scored.segment_matches(cutoff)
+
+        tokens, segments = tokenize_string_list(preprocessed_text)
+        if not exact_first:
+            extraction, _ = process_segments(tokens, segments, self.buckets, cutoff)
+            return extraction
+
+        # the exact occurrences are checked with the pairwise scores of the legacy matching, and the n-grams
+        # scored for the check are not scored again when the remainder is matched
+        score_table = PairwiseScoreTable(self.buckets, cutoff)
+        exact_matches, segments = self.cut_exact_matches(tokens, segments, score_table, cutoff)
+        extraction, _ = process_segments_scored(tokens, segments, score_table, cutoff)
+        return descent_order(exact_matches + extraction)
+
+    def score(self, text: str, floor_cutoff: int, workers: int = 1, exact_first: bool = False, segmentation: str = "greedy") -> "ScoredExtraction":
+        """ Scores all candidate matches of the text once at the floor cutoff, see <ScoredExtraction>. """
+        return ScoredExtraction(
+            self, preprocess_text_cached(text), floor_cutoff, workers=workers, exact_first=exact_first, segmentation=segmentation)
+
+    def cut_exact_matches(
+        self,
+        tokens: List[List[str]],
+        segments: List[Segment],
+        score_table: ScoreTable,
+        cutoff: int,
+        n_gram_cutoffs: Dict[int, int] = None
+        ) -> Tuple[List[Tuple[dict, Segment]], List[Segment]]:
+        """ Cuts exact occurrences of titles out of segments of preprocessed strings, unless the greedy n-gram matching
+        would match the occurrence differently (see <_is_greedy_match>), so the result equals the extraction without pre-pass.
+
+        Args:
+            score_table: scores of the n-grams (a <ScoreTable> or <PairwiseScoreTable>), the n-grams the check needs
+                are scored in one batch per n-gram size
+            n_gram_cutoffs: optional cutoff per n-gram size, see <process_segments_scored>
+        """
+        cutoffs = {n_gram_size: (n_gram_cutoffs or {}).get(n_gram_size, cutoff) for n_gram_size in range(1, 5)}
+
+        windows: Dict[int, List[str]] = {}
+        for index, start, end in segments:
+            segment_tokens = tokens[index][start:end]
+            for occurrence in self.exact_matcher.find(segment_tokens):
+                for n_gram_size, n_gram_windows in self._overlapping_windows(segment_tokens, occurrence).items():
+                    windows.setdefault(n_gram_size, []).extend(n_gram_windows)
+        for n_gram_size, n_gram_windows in windows.items():
+            score_table.score(n_gram_windows, n_gram_size)
+
+        return self.exact_matcher.process_segments(
+            tokens, segments, is_valid=lambda tokens, occurrence: self._is_greedy_match(tokens, occurrence, score_table, cutoffs))
+
+    @staticmethod
+    def _overlapping_windows(tokens: List[str], occurrence: Tuple[int, int, str]) -> Dict[int, List[str]]:
+        """ Returns the n-grams that overlap an occurrence and are at least as long, per n-gram size, in text order
+        (the occurrence itself is the last n-gram of its size). """
+        start, end, _ = occurrence
+        length = end - start
+        windows = {}
+        for n_gram_size in range(4, length - 1, -1):
+            last = start if n_gram_size == length else min(end - 1, len(tokens) - n_gram_size)
+            windows[n_gram_size] = [" ".join(tokens[i:i + n_gram_size]) for i in range(max(0, start - n_gram_size + 1), last + 1)]
+        return windows
+
+    def _is_greedy_match(self, tokens: List[str], occurrence: Tuple[int, int, str], score_table: ScoreTable, cutoffs: Dict[int, int]) -> bool:
+        """ Checks whether the greedy n-gram matching (longest n-grams first, left to right) would match an exact occurrence
+        as it is: no overlapping n-gram that comes before it in that order (longer, or as long and further left) matches
+        a title, and the best match of the occurrence itself is its title (not another title with the same score). """
+        length = occurrence[1] - occurrence[0]
+        for n_gram_size, windows in self._overlapping_windows(tokens, occurrence).items():
+            if n_gram_size == length:
+                windows, occurrence_window = windows[:-1], windows[-1]
+            if any(score_table.best_match(window, n_gram_size, cutoffs[n_gram_size]) for window in windows):
+                return False
+
+        best = score_table.best_match(occurrence_window, length, cutoffs[length])
+        return best is not None and best["match"] == occurrence[2]
+
+
+def descent_order(matches: List[Tuple[dict, Segment]]) -> List[Tuple[dict, Segment]]:
+    """ Orders matches like the greedy n-gram matching finds them: longest n-grams first, then in text order.
+    Merges the exact matches of the pre-pass into the matches of the remainder. """
+    return sorted(matches, key=lambda item: (item[1].start - item[1].end, item[1].index, item[1].start))
+
+
+class ScoredExtraction():
+    """ Candidate matches of one (preprocessed) text against a SkillIndex, scored once at a floor cutoff.
+
+    The matches for any cutoff at or above the floor are computed from the stored scores, so a cascade
+    of cutoffs (e.g. 90, then 87) costs one scoring pass instead of one full extraction per cutoff.
+    With the 'optimal' segmentation the matches are selected by <process_segments_optimal> (without exact pre-pass,
+    exact occurrences are part of the scored spans).
+    """
+
+    def __init__(
+        self,
+        skill_index: SkillIndex,
+        preprocessed_text: List[str],
+        floor_cutoff: int,
+        workers: int = 1,
+        exact_first: bool = False,
+        segmentation: str = "greedy"
+        ):
+        self.skill_index = skill_index
+        self.preprocessed_text = preprocessed_text
+        self.tokens, self.segments = tokenize_string_list(preprocessed_text)
+        self.floor_cutoff = floor_cutoff
+        self.exact_first = exact_first
+        self.segmentation = segmentation
+        self.score_table = ScoreTable(skill_index.buckets, floor_cutoff, workers=workers, bucket_indexes=skill_index.bucket_indexes)
+        self._matches: Dict[Tuple[int, tuple], List[Tuple[dict, Segment]]] = {}
+
+    def matches(self, cutoff: int, n_gram_cutoffs: Dict[int, int] = None) -> List[dict]:
+        """ Returns the matches the extraction would find with the given cutoff. """
+        return [m for m, _ in self.segment_matches(cutoff, n_gram_cutoffs)]
+
+    def segment_matches(self, cutoff: int, n_gram_cutoffs: Dict[int, int] = None) -> List[Tuple[dict, Segment]]:
+        """ Returns the matches with the given cutoff, each with the segment of the preprocessed text it covers.
+
+        Args:
+            n_gram_cutoffs: optional cutoff per n-gram size that replaces the cutoff for that size (greedy segmentation only),
+                see <process_segments_scored>
+        """
+        key = (cutoff, tuple(sorted((n_gram_cutoffs or {}).items())))
+        if key not in self._matches and self.segmentation == "optimal":
+            if n_gram_cutoffs:
+                raise ValueError("cutoffs per n-gram size require the greedy segmentation")
+            self._matches[key], _ = process_segments_optimal(self.tokens, self.segments, self.score_table, cutoff)
+        elif key not in self._matches:
+            segments = self.segments
+            exact_matches = []
+            if self.exact_first:
+                exact_matches, segments = self.skill_index.cut_exact_matches(self.tokens, segments, self.score_table, cutoff, n_gram_cutoffs)
+            extraction, _ = process_segments_scored(self.tokens, segments, self.score_table, cutoff, n_gram_cutoffs=n_gram_cutoffs)
+            self._matches[key] = descent_order(exact_matches + extraction)
+
+        return [(dict(m), segment) for m, segment in self._matches[key]]
+
+
+_skill_indexes: Dict[Tuple[str, str], SkillIndex] = {}
+_skill_indexes_lock = threading.Lock()
+
+# Functions called with the new index whenever a catalogue is reloaded
+catalogue_reload_hooks: List[Callable[[SkillIndex], None]] = [invalidate_extraction_caches]
+
+
+def load_skill_index(skill_domain: str, filename: str, catalogue_path=DEFAULT_CATALOGUE_PATH) -> SkillIndex:
+    """ Builds the SkillIndex of a skill catalogue from the compiled catalogue file, if it holds an up-to-date
+    version of the catalogue, otherwise from the CSV file. """
+    compiled: Optional[CompiledCatalogue] = None
+    if catalogue_path.exists():
+        try:
+            catalogue_file = CatalogueFile(catalogue_path)
+            if filename in catalogue_file:
+                compiled = catalogue_file.catalogue(filename)
+        except (StaleCatalogueError, ValueError) as e:
+            logging.warning(f"Couldn't use compiled catalogue for {filename}: {e}")
+
+    if compiled is not None and compiled.skill_domain == skill_domain:
+        return SkillIndex.from_compiled(compiled)
+    return SkillIndex.from_csv(skill_domain, filename)
+
+
+def get_skill_index(skill_domain: str, filename: str) -> SkillIndex:
+    """ Returns the process-wide SkillIndex of a skill catalogue and builds it on first use. """
+    key = (skill_domain, filename)
+    index = _skill_indexes.get(key)
+    if index is None:
+        with _skill_indexes_lock:
+            index = _skill_indexes.get(key)
+            if index is None:
+                index = load_skill_index(skill_domain, filename)
+                _skill_indexes[key] = index
+                logging.info(f"Built skill index for {filename} with {len(index)} titles")
+    return index
+
+
+def reload_skill_index(skill_domain: str, filename: str) -> SkillIndex:
+    """ Rebuilds the SkillIndex of a skill catalogue (e.g. after the CSV changed) and installs it. """
+    index = load_skill_index(skill_domain, filename)
+    install_skill_index(index)
+    return index
+
+
+def install_skill_index(index: SkillIndex) -> None:
+    """ Replaces the process-wide SkillIndex of its catalogue with a new one and calls the reload hooks.
+    The swap is a single assignment, extractions that already hold the previous index keep using it. """
+    with _skill_indexes_lock:
+        _skill_indexes[(index.skill_domain, index.filename)] = index
+    logging.info(f"Installed skill index for {index.filename} (version {index.version}) with {len(index)} titles")
+
+    for hook in catalogue_reload_hooks:
+        hook(index)
+
+
+def preload_skill_indexes() -> None:
+    """ Builds the indexes of all known skill catalogues, e.g. when the action server starts. """
+    for skill_domain, filename in SKILL_CATALOGUES:
+        try:
+            get_skill_index(skill_domain, filename)
+        except FileNotFoundError:
+            logging.warning(f"Couldn't preload skill index, {filename} does not exist.")
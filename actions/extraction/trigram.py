@@ -0,0 +1,76 @@
+from collections import Counter
+from typing import Dict, List, Tuple
+
+import numpy as np
+from rapidfuzz import process
+
+from .scoring import comparison_form, scorer_for_n_gram_size
+
+
+def numbered_trigrams(string: str) -> List[Tuple[str, int]]:
+    """Returns the character trigrams of a string, numbered per trigram to make repeated trigrams distinct,
+    so that the size of the intersection of two sets is the number of trigrams the strings have in common."""
+    seen = Counter()
+    trigrams = []
+    for i in range(len(string) - 2):
+        trigram = string[i:i + 3]
+        trigrams.append((trigram, seen[trigram]))
+        seen[trigram] += 1
+    return trigrams
+
+
+class TrigramIndex():
+    """Inverted index from character trigrams to the target strings of one n-gram size (bucket).
+
+    fuzz.ratio >= cutoff bounds the indel distance d of two strings a, b by (100 - cutoff) / 100 * (len(a) + len(b)).
+    Every insertion or deletion destroys at most 3 trigrams, so the strings share at least
+    max(len(a), len(b)) - 2 - 3 * d trigrams. Only targets that satisfy this bound (and the length difference
+    bound |len(a) - len(b)| <= d) are shortlisted and scored with rapidfuzz, which gives the same candidates
+    as scoring all targets.
+    """
+
+    def __init__(self, target_string_list: List[str], n_gram_size: int):
+        self.targets = target_string_list
+        self.n_gram_size = n_gram_size
+        self.scorer, self.processor = scorer_for_n_gram_size(n_gram_size)
+
+        forms = [comparison_form(target, n_gram_size) for target in target_string_list]
+        self.lengths = np.array([len(form) for form in forms], dtype=np.int64)
+
+        postings: Dict[Tuple[str, int], List[int]] = {}
+        for idx, form in enumerate(forms):
+            for trigram in numbered_trigrams(form):
+                postings.setdefault(trigram, []).append(idx)
+        self.postings = {trigram: np.array(ids, dtype=np.int64) for trigram, ids in postings.items()}
+
+    def shortlist(self, query: str, cutoff: float) -> np.ndarray:
+        """Returns the indices of all targets that can reach the cutoff with the query."""
+        form = comparison_form(query, self.n_gram_size)
+        query_length = len(form)
+
+        common = np.zeros(len(self.targets), dtype=np.int64)
+        for trigram in numbered_trigrams(form):
+            ids = self.postings.get(trigram)
+            if ids is not None:
+                common[ids] += 1
+
+        max_distance = np.floor((100 - cutoff) * (query_length + self.lengths) / 100 + 1e-9)
+        min_common = np.maximum(query_length, self.lengths) - 2 - 3 * max_distance
+        possible = (np.abs(self.lengths - query_length) <= max_distance) & (common >= min_common)
+        return np.flatnonzero(possible)
+
+    def candidates(self, queries: List[str], cutoff: float, workers: int = 1) -> List[List[Tuple[int, float]]]:
+        """Same result as <cdist_candidates> for the targets of the index, but only shortlisted targets are scored."""
+        candidates: List[List[Tuple[int, float]]] = []
+        for query in queries:
+            shortlist = self.shortlist(query, cutoff)
+            if len(shortlist) == 0:
+                candidates.append([])
+                continue
+
+            scores = process.cdist(
+                [query], [self.targets[idx] for idx in shortlist], scorer=self.scorer, processor=self.processor,
+                score_cutoff=cutoff, dtype=np.float64, workers=workers)[0]
+            matched = np.flatnonzero(scores)
+            candidates.append(list(zip(shortlist[matched].tolist(), scores[matched].tolist())))
+        return candidates
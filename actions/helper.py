@@ -1,21 +1,35 @@
-from typing import List, Optional, Text, Tuple
+import asyncio
+import functools
+from typing import TYPE_CHECKING, Any, Callable, List, Optional, Text, Tuple
 import yaml
 import os
 from actions.survey.survey import Survey, SurveyItem
 from rasa_sdk import Tracker
+from rasa_sdk.executor import CollectingDispatcher
 import logging
-import pandas as pd
 import numpy as np
 import pathlib
 import textstat
+import time
 import warnings
 from time import sleep
 
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+# How actions delay their utterances (see <typing_delay>): 'await' or 'metadata'
+DELAY_MODE = os.environ.get("BOT_DELAY_MODE", "await")
+
+SURVEY_PATH = pathlib.Path(__file__).parent.joinpath("survey", "survey.yaml")
+
+# Survey loaded once and replaced when survey.yaml changes (see <CatalogueManager>)
+_survey: Optional[Survey] = None
+
 
 def init_survey() -> Survey:
     """ Initializes Survey object from yaml file and returns it as output. """
-    curr_path = pathlib.Path(__file__).parent
-    filepath = curr_path.joinpath("survey", "survey.yaml")
+    filepath = SURVEY_PATH
 
     with open(filepath, 'r') as stream:
         data_loaded = yaml.safe_load(stream)
@@ -27,8 +41,22 @@ def init_survey() -> Survey:
 
     return survey
 
-def init_skills_df(filename:str="emsi_technology_skills.csv") -> pd.DataFrame:
+def get_survey() -> Survey:
+    """ Returns the in-memory Survey object, loaded from the yaml file on first use. """
+    global _survey
+    if _survey is None:
+        _survey = init_survey()
+    return _survey
+
+def install_survey(survey: Survey) -> None:
+    """ Replaces the in-memory Survey object, e.g. after survey.yaml changed. """
+    global _survey
+    _survey = survey
+
+def init_skills_df(filename:str="emsi_technology_skills.csv") -> "pd.DataFrame":
     """ Returns skills from given file as DataFrame. """
+    import pandas as pd  # only needed without compiled catalogues, see <load_skill_index>
+
     curr_path = pathlib.Path(__file__).parent
     filepath = curr_path.joinpath("edyoucated", filename)
 
@@ -66,41 +94,97 @@ def find_last_chatbot_question_in_survey(tracker:Tracker, survey:Survey) -> Tupl
 
     return latest_chatbot_question, latest_question
 
-def delay_dispatcher_utterance(
+def _complexity_delay_in_ms(text: Text) -> float:
+    """ Delay for a text of the given complexity according to Gnewuch et al.(2018). """
+    complexity: float = textstat.flesch_kincaid_grade(text)
+    return ((0.5 * np.log(complexity+0.5) + 1.5) * 1000) if complexity >= 0 else 0
+
+def utterance_delay(
     domain: Optional[Text] = None, text: Optional[Text] = None, 
     response: Optional[Text] = None, 
     latest_user_message: Optional[Text] = None
-    ) -> None:
-    """ Delays bot utterance based on the complexity of the given text/response (and latest user message, if provided). """
+    ) -> Optional[float]:
+    """ Returns the delay (in seconds) of a bot utterance based on the complexity of the given text/response
+    (and latest user message, if provided), or None if there is nothing to compute it from. """
     # Perform chatbot response delay according to Gnewuch et al.(2018)
 
     if response and domain:
         responses:dict = domain["responses"]
         for k, v in responses.items():
             if k == response:
-                text= {v[0]["text"]} 
+                text = v[0]["text"]
                 break
     elif text:
         pass
     elif latest_user_message:
-        complexity:float = textstat.flesch_kincaid_grade(latest_user_message)
-        delay_in_ms_user_message = ((0.5 * np.log(complexity+0.5) + 1.5) * 1000) if complexity >= 0 else 0
-        sleep(delay_in_ms_user_message / 1000)
-        return None
+        return _complexity_delay_in_ms(latest_user_message) / 1000
     else:
-        warnings.warn("Couldn't perform delay.")
-        return
+        return None
 
-    complexity = textstat.flesch_kincaid_grade(text)
-    delay_in_ms = ((0.5 * np.log(complexity+0.5) + 1.5) * 1000) if complexity >= 0 else 0
+    delay_in_ms = _complexity_delay_in_ms(text)
 
     if latest_user_message:
-        complexity = textstat.flesch_kincaid_grade(latest_user_message)
-        delay_in_ms_user_message = ((0.5 * np.log(complexity+0.5) + 1.5) * 1000) if complexity >= 0 else 0
-        delay_in_ms += delay_in_ms_user_message
-    
-    sleep(delay_in_ms / 1000)
+        delay_in_ms += _complexity_delay_in_ms(latest_user_message)
+
+    return delay_in_ms / 1000
+
+def delay_dispatcher_utterance(
+    domain: Optional[Text] = None, text: Optional[Text] = None, 
+    response: Optional[Text] = None, 
+    latest_user_message: Optional[Text] = None
+    ) -> None:
+    """ Delays bot utterance based on the complexity of the given text/response (and latest user message, if provided).
+    Blocks the calling thread, actions use <typing_delay> with <utterance_delay> instead. """
+    delay = utterance_delay(domain, text, response, latest_user_message)
+    if delay is None:
+        warnings.warn("Couldn't perform delay.")
+        return
+    sleep(delay)
     return None
 
+async def typing_delay(dispatcher: CollectingDispatcher, seconds: Optional[float]) -> None:
+    """ Delays the next bot utterances of an (async) action without blocking the action server.
+
+    With DELAY_MODE 'await' the action awaits the delay, other conversations are served in the meantime.
+    With 'metadata' the action answers right away and sends the delay as custom message
+    ({"typing_delay_ms": ...}) first, so that the channel can show a typing indicator for that long.
+    """
+    if not seconds or seconds <= 0:
+        return
+    if DELAY_MODE == "metadata":
+        # goes before the utterances the action already collected
+        dispatcher.utter_message(json_message={"typing_delay_ms": int(seconds * 1000)})
+        dispatcher.messages.insert(0, dispatcher.messages.pop())
+    else:
+        await asyncio.sleep(seconds)
+
+async def run_in_thread(function: Callable, *args, **kwargs) -> Any:
+    """ Runs blocking work of an (async) action, e.g. the fuzzy skill extraction, in the default thread pool,
+    so that the event loop keeps serving the typing delays and GPT-3 calls of other conversations meanwhile. """
+    return await asyncio.get_running_loop().run_in_executor(None, functools.partial(function, *args, **kwargs))
+
+class DelayScheduler():
+    """ Typing delay that overlaps with the work of an action.
+
+    The timer starts when the scheduler is created (at the start of the action). Extraction, GPT-3 calls etc.
+    count towards the delay, <wait> only waits for what remains of the target delay. The utterances of an action
+    are sent when it returns, so the user sees the same pacing without the time of the work added on top.
+    """
+
+    def __init__(self, dispatcher: CollectingDispatcher):
+        self.dispatcher = dispatcher
+        self.start = time.monotonic()
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.start
+
+    def remaining(self, target: Optional[float]) -> float:
+        """ Returns the seconds left of the target delay (0 if the work already took longer). """
+        return max(0.0, (target or 0) - self.elapsed())
+
+    async def wait(self, target: Optional[float]) -> None:
+        """ Waits (see <typing_delay>) until the target delay has passed since the start. """
+        await typing_delay(self.dispatcher, self.remaining(target))
+
 
 
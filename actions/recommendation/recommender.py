@@ -0,0 +1,115 @@
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from actions.extraction.skill_index import SkillIndex, get_skill_index
+from .tags import LEARNING_PATH_CATALOGUE, normalize_tag, split_tags, tag_terms
+
+
+class LearningPathRecommender():
+    """ Ranks learning paths by the TF-IDF similarity of their tags to the interests of a user.
+
+    The tag terms (see <tag_terms>) of every learning path are weighted with TF-IDF and L2-normalized once,
+    and stored as a sparse matrix in CSR form (numpy arrays). A query is the TF-IDF vector of the
+    normalized interests, scoring all learning paths is one sparse matrix-vector product and the top k are
+    selected with argpartition. Ties are resolved by the position in the catalogue, so results are deterministic.
+    """
+
+    def __init__(self, tags_per_path: List[Optional[str]], titles: List[str]):
+        # learning paths with the same title are one recommendation
+        self.titles: List[str] = list(dict.fromkeys(titles))
+        self.title_ids: Dict[str, int] = {title: i for i, title in enumerate(self.titles)}
+        terms_per_title: List[List[str]] = [[] for _ in self.titles]
+        for tags, title in zip(tags_per_path, titles):
+            terms_per_title[self.title_ids[title]].extend(term for tag in split_tags(tags) for term in tag_terms(tag))
+
+        self.vocabulary: Dict[str, int] = {}
+        indptr = [0]
+        indices: List[int] = []
+        term_frequencies: List[int] = []
+        for terms in terms_per_title:
+            counts: Dict[int, int] = {}
+            for term in terms:
+                term_id = self.vocabulary.setdefault(term, len(self.vocabulary))
+                counts[term_id] = counts.get(term_id, 0) + 1
+            indices.extend(counts)
+            term_frequencies.extend(counts.values())
+            indptr.append(len(indices))
+
+        self.indptr = np.array(indptr, dtype=np.int64)
+        self.indices = np.array(indices, dtype=np.int64)
+        # row of every stored entry, used to sum the products per learning path
+        self.rows = np.repeat(np.arange(len(self.titles)), np.diff(self.indptr))
+
+        # smoothed inverse document frequency
+        document_frequency = np.bincount(self.indices, minlength=len(self.vocabulary))
+        self.idf = np.log((1 + len(self.titles)) / (1 + document_frequency)) + 1
+
+        data = np.array(term_frequencies, dtype=np.float64) * self.idf[self.indices]
+        norms = np.sqrt(np.bincount(self.rows, weights=data ** 2, minlength=len(self.titles)))
+        self.data = data / norms[self.rows]
+
+    @classmethod
+    def from_skill_index(cls, skill_index: SkillIndex) -> "LearningPathRecommender":
+        return cls(skill_index.column("skill_tags"), skill_index.column("skill_titles"))
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    def query_vector(self, interests: Iterable[str]) -> np.ndarray:
+        """ Returns the (dense) TF-IDF vector of the interests over the tag vocabulary. """
+        query = np.zeros(len(self.vocabulary), dtype=np.float64)
+        for interest in interests:
+            term_id = self.vocabulary.get(normalize_tag(interest))
+            if term_id is not None:
+                query[term_id] += 1
+        return query * self.idf
+
+    def scores(self, interests: Iterable[str]) -> np.ndarray:
+        """ Returns the similarity of every learning path to the interests (0 if no tag matches). """
+        query = self.query_vector(interests)
+        return np.bincount(self.rows, weights=self.data * query[self.indices], minlength=len(self.titles))
+
+    def recommend(self, interests: Iterable[str], k: int = 5, exclude: Iterable[str] = ()) -> List[str]:
+        """ Returns the titles of the (at most) k learning paths most similar to the interests,
+        without the excluded titles (e.g. learning paths that were already recommended). """
+        scores = self.scores(interests)
+        excluded = [self.title_ids[title] for title in exclude or () if title in self.title_ids]
+        scores[excluded] = 0
+
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > k:
+            # keep everything that scores at least as high as the k-th best, so ties at the boundary are resolved below
+            candidate_scores = scores[candidates]
+            kth_score = candidate_scores[np.argpartition(-candidate_scores, k - 1)[k - 1]]
+            candidates = candidates[candidate_scores >= kth_score]
+        # highest score first, ties in catalogue order
+        ranked = candidates[np.lexsort((candidates, -scores[candidates]))][:k]
+        return [self.titles[i] for i in ranked]
+
+
+_recommender: Optional[LearningPathRecommender] = None
+_recommender_version: Optional[int] = None
+_recommender_lock = threading.Lock()
+
+
+def get_recommender() -> LearningPathRecommender:
+    """ Returns the recommender of the learning path catalogue, built once per version of the catalogue's SkillIndex. """
+    global _recommender, _recommender_version
+    skill_index = get_skill_index(*LEARNING_PATH_CATALOGUE)
+    if _recommender_version != skill_index.version:
+        with _recommender_lock:
+            if _recommender_version != skill_index.version:
+                _recommender = LearningPathRecommender.from_skill_index(skill_index)
+                _recommender_version = skill_index.version
+    return _recommender
+
+
+def preload_recommender() -> None:
+    """ Builds the recommender of the learning path catalogue, e.g. when the action server starts. """
+    try:
+        get_recommender()
+    except FileNotFoundError:
+        logging.warning(f"Couldn't preload recommender, {LEARNING_PATH_CATALOGUE[1]} does not exist.")
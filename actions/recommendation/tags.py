@@ -0,0 +1,22 @@
+from typing import List, Optional
+
+
+# Skill catalogue of the learning paths, their tags are the normalized skill titles of the emsi catalogue
+LEARNING_PATH_CATALOGUE = ("edyoucated", "edyoucated_skills.csv")
+
+
+def normalize_tag(tag: str) -> str:
+    return " ".join(tag.lower().split())
+
+
+def split_tags(tags: Optional[str]) -> List[str]:
+    """ Splits the comma separated tags of a learning path (missing tags are np.nan or None). """
+    if tags is None or tags != tags:
+        return []
+    return [tag for tag in (normalize_tag(tag) for tag in str(tags).split(",")) if tag]
+
+
+def tag_terms(tag: str) -> List[str]:
+    """ Returns the (normalized) tag and all of its contiguous word sequences, under which the tag is matched. """
+    words = tag.split(" ")
+    return [" ".join(words[start:end]) for start in range(len(words)) for end in range(start + 1, len(words) + 1)]
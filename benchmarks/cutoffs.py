@@ -0,0 +1,184 @@
+"""Cutoff tuning: precision, recall and F1 of the extracted skills against labeled answers, together with the latency.
+
+Sweeps uniform cutoffs and per-n-gram cutoffs (one cutoff for n-grams longer than --split words, one for the others,
+like <process_string_list_test>) and prints the Pareto frontier of F1 and latency. Every answer is scored once at
+the lowest swept cutoff (see <SkillIndex.score>), each configuration is then only a filter over the stored scores.
+The matches are selected like <SkillIndex.extract> selects them in production (greedy segmentation, without the exact
+pre-pass unless --exact-first), so a uniform configuration reproduces the extraction with that cutoff.
+The latency of a configuration is the time of a fresh extraction with that configuration (scored at its lowest
+cutoff), measured --repeat times per answer and reported as p50/p95.
+
+The labeled answers are a JSONL file with a 'text' and the matching catalogue titles in 'skills' per line,
+without a file answers are generated from the catalogue (see <generate_labeled_answers>).
+
+Run from the repository root with:
+    python -m benchmarks.cutoffs [--domain edyoucated] [--labels answers.jsonl] [--cutoffs 80 85 90 95] [--output sweep.json]
+"""
+import argparse
+import itertools
+import json
+import os
+import time
+from typing import Dict, List, NamedTuple, Sequence, Tuple
+
+os.environ.setdefault("CATALOGUE_RELOAD_INTERVAL", "0")
+
+from actions.extraction.batch import default_filename
+from actions.extraction.skill_index import SKILL_CATALOGUES, SkillIndex, get_skill_index
+
+from .extraction import generate_labeled_answers, measure
+
+
+N_GRAM_SIZES = [1, 2, 3, 4]
+
+# Cutoffs used by the actions (interests cascade and job titles)
+PRODUCTION_CUTOFFS = [87, 90, 92]
+
+
+class CutoffConfig(NamedTuple):
+    """ Cutoff per n-gram size (1 to 4 words). """
+    cutoffs: Tuple[int, int, int, int]
+
+    @classmethod
+    def uniform(cls, cutoff: int) -> "CutoffConfig":
+        return cls((cutoff,) * len(N_GRAM_SIZES))
+
+    @classmethod
+    def split(cls, high_ngram_cutoff: int, low_ngram_cutoff: int, split: int = 2) -> "CutoffConfig":
+        return cls(tuple(high_ngram_cutoff if n > split else low_ngram_cutoff for n in N_GRAM_SIZES))
+
+    @property
+    def floor(self) -> int:
+        return min(self.cutoffs)
+
+    def n_gram_cutoffs(self) -> Dict[int, int]:
+        return dict(zip(N_GRAM_SIZES, self.cutoffs))
+
+    def label(self) -> str:
+        if len(set(self.cutoffs)) == 1:
+            return str(self.cutoffs[0])
+        return "/".join(str(cutoff) for cutoff in self.cutoffs)
+
+
+def sweep_configs(cutoffs: Sequence[int], split: int = 2) -> List[CutoffConfig]:
+    """ Returns the uniform configurations of all cutoffs and the split configurations of all pairs of different cutoffs. """
+    configs = [CutoffConfig.uniform(cutoff) for cutoff in cutoffs]
+    configs += [CutoffConfig.split(high, low, split) for high, low in itertools.permutations(cutoffs, 2)]
+    return list(dict.fromkeys(configs))
+
+
+def load_labeled_answers(path: str) -> List[Tuple[str, List[str]]]:
+    answers = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                answers.append((record["text"], record["skills"]))
+    return answers
+
+
+def extraction_latency(skill_index: SkillIndex, texts: List[str], config: CutoffConfig, exact_first: bool = False, repeat: int = 3) -> dict:
+    """ Latency percentiles (ms) of a fresh extraction of every answer with the configuration, see <measure>. """
+    n_gram_cutoffs = config.n_gram_cutoffs()
+    return measure(
+        lambda text: skill_index.score(text, config.floor, exact_first=exact_first).matches(config.floor, n_gram_cutoffs),
+        texts, repeat=repeat)
+
+
+def sweep(
+    skill_index: SkillIndex,
+    answers: List[Tuple[str, List[str]]],
+    configs: List[CutoffConfig],
+    exact_first: bool = False,
+    repeat: int = 3
+    ) -> List[dict]:
+    """ Evaluates every configuration on the labeled answers and returns precision, recall, F1 and latency per configuration. """
+    counts = {config: [0, 0, 0] for config in configs}  # true positives, false positives, false negatives
+    floor = min(config.floor for config in configs)
+
+    for text, skills in answers:
+        expected = {skill.lower() for skill in skills}
+
+        # score all n-grams once, every configuration only filters the stored candidates
+        scored = skill_index.score(text, floor, exact_first=exact_first)
+        for config in configs:
+            found = {m["match"].lower() for m in scored.matches(config.floor, config.n_gram_cutoffs())}
+            count = counts[config]
+            count[0] += len(found & expected)
+            count[1] += len(found - expected)
+            count[2] += len(expected - found)
+
+    texts = [text for text, _ in answers]
+    results = []
+    for config in configs:
+        tp, fp, fn = counts[config]
+        precision = tp / (tp + fp) if tp + fp else 1.0
+        recall = tp / (tp + fn) if tp + fn else 1.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        latency = extraction_latency(skill_index, texts, config, exact_first=exact_first, repeat=repeat)
+        results.append({
+            "config": config.label(),
+            "cutoffs": config.n_gram_cutoffs(),
+            "precision": round(precision, 4),
+            "recall": round(recall, 4),
+            "f1": round(f1, 4),
+            "p50_ms": latency["p50_ms"],
+            "p95_ms": latency["p95_ms"],
+        })
+    return results
+
+
+def pareto_frontier(results: List[dict]) -> List[dict]:
+    """ Returns the results no other result beats in both F1 and latency (p50), from fastest to most accurate. """
+    frontier = []
+    for result in sorted(results, key=lambda r: (r["p50_ms"], -r["f1"])):
+        if not frontier or result["f1"] > frontier[-1]["f1"]:
+            frontier.append(result)
+    return frontier
+
+
+def print_results(results: List[dict], title: str) -> None:
+    print(title)
+    print(f"  {'cutoffs (1/2/3/4 words)':24} {'precision':>9} {'recall':>7} {'F1':>7} {'p50 ms':>8} {'p95 ms':>8}")
+    for r in results:
+        print(f"  {r['config']:24} {r['precision']:9.3f} {r['recall']:7.3f} {r['f1']:7.3f} {r['p50_ms']:8.3f} {r['p95_ms']:8.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--domain", default="edyoucated", choices=[domain for domain, _ in SKILL_CATALOGUES])
+    parser.add_argument("--filename", default=None, help="skill CSV file, by default the catalogue of the domain")
+    parser.add_argument("--labels", default=None, help="JSONL file with labeled answers ('text' and 'skills')")
+    parser.add_argument("--answers", type=int, default=90, help="number of generated answers without --labels")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cutoffs", type=int, nargs="+", default=[80, 83, 85, 87, 90, 92, 95, 98])
+    parser.add_argument("--split", type=int, default=2, help="n-grams up to this size get the low cutoff in split configurations")
+    parser.add_argument("--exact-first", action="store_true",
+                        help="select the matches after the exact pre-pass (production does not use it, the matches are the same)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed extractions per answer and configuration")
+    parser.add_argument("--top", type=int, default=10, help="number of configurations with the best F1 to print")
+    parser.add_argument("--output", default=None, help="write all results and the frontier as JSON to this file")
+    args = parser.parse_args()
+
+    skill_index = get_skill_index(args.domain, args.filename or default_filename(args.domain))
+    if args.labels:
+        answers = load_labeled_answers(args.labels)
+    else:
+        answers = generate_labeled_answers(skill_index.skills, args.answers, seed=args.seed)
+
+    configs = sweep_configs(sorted(set(args.cutoffs) | set(PRODUCTION_CUTOFFS)), args.split)
+    results = sweep(skill_index, answers, configs, exact_first=args.exact_first, repeat=args.repeat)
+    frontier = pareto_frontier(results)
+
+    print(f"{len(answers)} answers, {len(configs)} configurations, catalogue {skill_index.filename}")
+    print_results([r for r in results if r["config"] in map(str, PRODUCTION_CUTOFFS)], "Production cutoffs:")
+    print_results(sorted(results, key=lambda r: -r["f1"])[:args.top], f"Best {args.top} by F1:")
+    print_results(frontier, "Pareto frontier (F1 vs. latency):")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"settings": vars(args), "results": results, "frontier": frontier}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""Benchmark of the skill extraction stages over every skill catalogue.
+
+Stages: <preprocess_text>, the legacy <process_string_list> and <extract_strings_from_text> and the
+<init_skills_and_extract> entry point used by the actions. The texts are generated survey answers of varying
+length and typo rate (mentioning titles of the catalogue) plus, optionally, the examples of a Rasa nlu.yml file.
+Per stage the p50/p95/p99 latency, throughput and peak RSS of the process are reported.
+
+Run from the repository root with:
+    python -m benchmarks.extraction [--texts 30] [--nlu data/nlu.yml] [--save results.json]
+    python -m benchmarks.extraction --baseline results.json [--tolerance 0.25]
+
+With --baseline the run exits with status 1 if the p50 or p95 latency of a stage regressed by more than the tolerance.
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+# the benchmark must not reload catalogues in the background while it measures
+os.environ.setdefault("CATALOGUE_RELOAD_INTERVAL", "0")
+
+from actions.actions import init_skills_and_extract
+from actions.extraction.cache import invalidate_extraction_caches, preprocessing_cache
+from actions.extraction.extractor import extract_strings_from_text, process_string_list
+from actions.extraction.preprocessing import preprocess_text
+from actions.extraction.skill_index import SKILL_CATALOGUES, get_skill_index
+
+from .preprocessing import SAMPLE_TEXTS, load_nlu_examples
+
+
+MENTION_TEMPLATES = [
+    "I work as {}.",
+    "In my job I use {} every day",
+    "Recently I started learning {} and I like it!",
+    "I would like to get better at {}",
+    "{}",
+    "My colleagues say I am good at {}, but I am not sure.",
+]
+
+FILLER_SENTENCES = [
+    "My team is quite small.",
+    "We are a start-up in Berlin",
+    "Before that I studied economics at university.",
+    "I spend a lot of time in meetings; that's ok I guess",
+    "Honestly, I don't know.",
+    "Most of the time I work remotely from home.",
+    "My manager wants me to take more responsibility next year.",
+]
+
+# (number of mentioned titles, number of filler sentences) per answer length
+ANSWER_LENGTHS = {"short": (1, 0), "medium": (2, 2), "long": (4, 6)}
+
+# Probability of a typo per character of a mentioned title
+TYPO_RATES = [0.0, 0.03, 0.08]
+
+# Latency statistics compared against a baseline
+COMPARED_STATISTICS = ["p50_ms", "p95_ms"]
+
+
+def add_typos(text: str, rate: float, rng: random.Random) -> str:
+    """Randomly substitutes, drops, duplicates or swaps letters with the given probability per character."""
+    chars = list(text)
+    i = 0
+    while i < len(chars):
+        if chars[i].isalpha() and rng.random() < rate:
+            operation = rng.randrange(4)
+            if operation == 0:
+                chars[i] = rng.choice("abcdefghijklmnopqrstuvwxyz")
+            elif operation == 1:
+                del chars[i]
+                continue
+            elif operation == 2:
+                chars.insert(i, chars[i])
+                i += 1
+            elif i + 1 < len(chars):
+                chars[i], chars[i + 1] = chars[i + 1], chars[i]
+                i += 1
+        i += 1
+    return "".join(chars)
+
+
+def generate_labeled_answers(titles: List[str], number: int, seed: int = 0) -> List[Tuple[str, List[str]]]:
+    """Generates survey answers that mention titles of a catalogue, cycling through all lengths and typo rates.
+    Returns every answer with the titles it mentions (before the typos were added)."""
+    rng = random.Random(seed)
+    variants = [(mentions, fillers, rate) for mentions, fillers in ANSWER_LENGTHS.values() for rate in TYPO_RATES]
+    answers = []
+    for i in range(number):
+        mentions, fillers, rate = variants[i % len(variants)]
+        mentioned = [rng.choice(titles) for _ in range(mentions)]
+        sentences = [rng.choice(MENTION_TEMPLATES).format(add_typos(title, rate, rng)) for title in mentioned]
+        sentences += rng.sample(FILLER_SENTENCES, fillers)
+        rng.shuffle(sentences)
+        answers.append((" ".join(sentences), mentioned))
+    return answers
+
+
+def generate_answers(titles: List[str], number: int, seed: int = 0) -> List[str]:
+    """Generates survey answers that mention titles of a catalogue (see <generate_labeled_answers>)."""
+    return [text for text, _ in generate_labeled_answers(titles, number, seed=seed)]
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def measure(function: Callable[[str], object], texts: List[str], repeat: int = 1, setup: Callable[[], None] = None) -> dict:
+    """Calls the function on every text and returns latency percentiles, throughput and the peak RSS afterwards.
+
+    Args:
+        setup: called before every call, outside of the measured time (e.g. to clear caches)
+    """
+    latencies = []
+    for _ in range(repeat):
+        for text in texts:
+            if setup:
+                setup()
+            start = time.perf_counter()
+            function(text)
+            latencies.append(time.perf_counter() - start)
+
+    latencies_ms = np.array(latencies) * 1000
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+    return {
+        "calls": len(latencies),
+        "p50_ms": round(float(p50), 4),
+        "p95_ms": round(float(p95), 4),
+        "p99_ms": round(float(p99), 4),
+        "mean_ms": round(float(latencies_ms.mean()), 4),
+        "throughput_per_s": round(len(latencies) / float(np.sum(latencies)), 2),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def clear_caches() -> None:
+    preprocessing_cache.clear()
+    invalidate_extraction_caches()
+
+
+def run(number: int, nlu_texts: List[str], cutoff: int = 90, repeat: int = 1, catalogues: List[str] = None, seed: int = 0) -> dict:
+    """Runs all stages over every available skill catalogue and returns the results per '<catalogue>/<stage>'."""
+    results = {}
+
+    for skill_domain, filename in SKILL_CATALOGUES:
+        if catalogues and skill_domain not in catalogues:
+            continue
+        try:
+            skill_index = get_skill_index(skill_domain, filename)
+        except FileNotFoundError:
+            print(f"skipping {filename} (not found)", file=sys.stderr)
+            continue
+
+        skills = skill_index.skills
+        texts = generate_answers(skills, number, seed=seed) + list(SAMPLE_TEXTS) + nlu_texts
+        preprocessed = {text: preprocess_text(text) for text in texts}
+
+        stages: List[Tuple[str, Callable[[str], object], Callable[[], None]]] = [
+            ("preprocess_text", preprocess_text, None),
+            ("process_string_list", lambda text: process_string_list(preprocessed[text], skills, cutoff), None),
+            ("extract_strings_from_text", lambda text: extract_strings_from_text(text, skills, cutoff), None),
+            ("init_skills_and_extract", lambda text: init_skills_and_extract(text, filename, skill_domain, cutoff), clear_caches),
+        ]
+        for stage, function, setup in stages:
+            results[f"{skill_domain}/{stage}"] = measure(function, texts, repeat=repeat, setup=setup)
+            print(f"{skill_domain}/{stage}: done", file=sys.stderr)
+    return results
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    """Returns a description of every stage statistic that is more than <tolerance> (relative) slower than the baseline."""
+    regressions = []
+    for stage, statistics in results.items():
+        if stage not in baseline:
+            continue
+        for statistic in COMPARED_STATISTICS:
+            before, after = baseline[stage][statistic], statistics[statistic]
+            if after > before * (1 + tolerance):
+                regressions.append(f"{stage} {statistic}: {before:.3f} -> {after:.3f} (+{(after / before - 1) * 100:.0f}%)")
+    return regressions
+
+
+def print_results(results: Dict[str, dict]) -> None:
+    print(f"{'stage':45} {'calls':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'texts/s':>10} {'RSS MB':>8}")
+    for stage, s in results.items():
+        print(f"{stage:45} {s['calls']:6d} {s['p50_ms']:9.3f} {s['p95_ms']:9.3f} {s['p99_ms']:9.3f} {s['throughput_per_s']:10.1f} {s['peak_rss_mb']:8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--texts", type=int, default=30, help="generated answers per catalogue")
+    parser.add_argument("--repeat", type=int, default=1, help="repetitions over all texts")
+    parser.add_argument("--cutoff", type=int, default=90)
+    parser.add_argument("--catalogue", action="append", dest="catalogues", help="skill domain to benchmark (default: all)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--nlu", default=None, help="additionally use the examples of a Rasa nlu.yml file")
+    parser.add_argument("--save", default=None, help="write the results as JSON baseline to this file")
+    parser.add_argument("--baseline", default=None, help="JSON results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown against the baseline")
+    args = parser.parse_args()
+
+    nlu_texts = load_nlu_examples(args.nlu) if args.nlu else []
+    results = run(args.texts, nlu_texts, cutoff=args.cutoff, repeat=args.repeat, catalogues=args.catalogues, seed=args.seed)
+    print_results(results)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"settings": vars(args), "stages": results}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["stages"]
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("Regressions against " + args.baseline + ":\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
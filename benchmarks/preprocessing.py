@@ -0,0 +1,68 @@
+"""Micro-benchmark of the text preprocessing: step-by-step <preprocess_text_reference> vs. the compiled <Preprocessor>.
+
+Run from the repository root with:
+    python -m benchmarks.preprocessing [--number 200] [--nlu data/nlu.yml]
+"""
+import argparse
+import timeit
+from typing import List
+
+from actions.extraction.preprocessing import Preprocessor, preprocess_text_reference
+
+
+SAMPLE_TEXTS = [
+    "I am a software engineer and I work with Python, Java and SQL.",
+    "My job is data scientist at a bank. I use machine learning, statistics and R every day!",
+    "Project management; agile methods : scrum and kanban\n• stakeholder communication\n• budgeting",
+    "I'd like to learn more about cloud computing (AWS, Azure) and DevOps. Maybe also Kubernetes?",
+    "Nothing really.",
+    "teacher",
+]
+
+
+def load_nlu_examples(path: str) -> List[str]:
+    """Reads the training examples ("    - ..." lines) of a Rasa nlu.yml file."""
+    examples = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("    - "):
+                examples.append(line[len("    - "):].rstrip("\n"))
+    return examples
+
+
+def run(texts: List[str], number: int) -> dict:
+    preprocessor = Preprocessor()
+    for text in texts:
+        assert preprocessor.preprocess_text(text) == preprocess_text_reference(text), text
+
+    # the reference loads the stopwords on every call, like <preprocess_text> did before it used the Preprocessor
+    legacy = timeit.timeit(lambda: [preprocess_text_reference(text) for text in texts], number=number)
+    compiled = timeit.timeit(lambda: [preprocessor.preprocess_text(text) for text in texts], number=number)
+    calls = number * len(texts)
+    return {
+        "texts": len(texts),
+        "legacy_us_per_text": legacy / calls * 1e6,
+        "compiled_us_per_text": compiled / calls * 1e6,
+        "speedup": legacy / compiled,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=200, help="repetitions over all texts")
+    parser.add_argument("--nlu", default=None, help="additionally use the examples of a Rasa nlu.yml file")
+    args = parser.parse_args()
+
+    texts = list(SAMPLE_TEXTS)
+    if args.nlu:
+        texts += load_nlu_examples(args.nlu)
+
+    result = run(texts, args.number)
+    print(f"{result['texts']} texts, identical output")
+    print(f"reference preprocessing:  {result['legacy_us_per_text']:8.1f} us/text")
+    print(f"Preprocessor:             {result['compiled_us_per_text']:8.1f} us/text")
+    print(f"speedup:                  {result['speedup']:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+import random
+
+import pytest
+
+# Words that often form other titles next to the mentioned ones
+FILLERS = ["i", "work", "with", "and", "team", "sales", "project", "manager", "data", "senior", "agent", "engineer"]
+
+
+def _sample_texts(titles, number, seed=0):
+    """ Answers mixing titles of a catalogue with words that often form other titles next to them. """
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(number):
+        words = []
+        for _ in range(rng.randint(1, 3)):
+            words += rng.sample(FILLERS, rng.randint(0, 2)) + [rng.choice(titles)]
+        words += rng.sample(FILLERS, rng.randint(0, 2))
+        texts.append(" ".join(words))
+    return texts
+
+
+@pytest.fixture
+def sample_texts():
+    return _sample_texts
@@ -0,0 +1,29 @@
+import itertools
+
+from actions.extraction.batch import extract_strings_from_texts
+from actions.extraction.skill_index import get_skill_index
+
+TEXTS = ["I like python and machine learning", "excel and team microsoft project", "nothing to see here"]
+
+
+def test_workers_keep_the_input_order():
+    skill_index = get_skill_index("edyoucated", "edyoucated_skills.csv")
+    texts = TEXTS * 5
+    expected = [skill_index.extract(text, cutoff=90, engine="batched") for text in texts]
+    assert list(extract_strings_from_texts(texts, "edyoucated", workers=2, chunksize=2)) == expected
+
+
+def test_workers_read_the_input_lazily():
+    read = 0
+
+    def texts():
+        nonlocal read
+        for text in itertools.cycle(TEXTS):
+            read += 1
+            yield text
+
+    results = extract_strings_from_texts(texts(), "edyoucated", workers=2, chunksize=4, prefetch=2)
+    assert len(list(itertools.islice(results, 10))) == 10
+    results.close()
+    # at most workers * prefetch chunks ahead of the consumed results
+    assert read <= 10 + 2 * 2 * 4 + 4
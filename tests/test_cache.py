@@ -0,0 +1,74 @@
+from actions.extraction import skill_index as skill_index_module
+from actions.extraction.cache import (
+    LRUCache, cache_stats, extraction_cache, invalidate_extraction_caches, preprocess_text_spans_cached,
+    preprocessing_cache)
+from actions.extraction.skill_index import get_skill_index, install_skill_index, load_skill_index
+
+EDYOUCATED = ("edyoucated", "edyoucated_skills.csv")
+TEXT = "I know Microsoft Project and Scrum"
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_lru_cache_stats_and_clear():
+    cache = LRUCache(maxsize=4)
+    cache.put("a", 1)
+    cache.get("a")
+    cache.get("b")
+    assert cache.get("b", "default") == "default"
+    assert cache.stats() == {"size": 1, "maxsize": 4, "hits": 1, "misses": 2, "hit_rate": 0.3333}
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.stats()["hits"] == 1
+
+
+def test_preprocessing_is_cached():
+    preprocessing_cache.clear()
+    first = preprocess_text_spans_cached(TEXT)
+    hits = preprocessing_cache.hits
+    assert preprocess_text_spans_cached(TEXT) == first
+    assert preprocessing_cache.hits == hits + 1
+    assert set(cache_stats()) == {"preprocessing", "extraction"}
+
+
+def test_extraction_is_cached():
+    invalidate_extraction_caches()
+    index = get_skill_index(*EDYOUCATED)
+    matches = index.extract(TEXT)
+    hits = extraction_cache.hits
+    assert index.extract(TEXT) == matches
+    assert extraction_cache.hits == hits + 1
+    # other arguments are other entries
+    index.extract(TEXT, cutoff=85)
+    assert len(extraction_cache) == 2
+
+
+def test_reload_empties_extraction_cache():
+    index = get_skill_index(*EDYOUCATED)
+    index.extract(TEXT)
+    assert len(extraction_cache) > 0
+    install_skill_index(load_skill_index(*EDYOUCATED))
+    assert len(extraction_cache) == 0
+
+
+def test_cache_key_holds_catalogue_version(monkeypatch):
+    # without the reload hooks the cached results stay, but the new catalogue version does not find them
+    monkeypatch.setattr(skill_index_module, "catalogue_reload_hooks", [])
+    old = get_skill_index(*EDYOUCATED)
+    matches = old.extract(TEXT)
+    new = load_skill_index(*EDYOUCATED)
+    install_skill_index(new)
+    assert new.version != old.version
+    size, misses = len(extraction_cache), extraction_cache.misses
+    assert get_skill_index(*EDYOUCATED).extract(TEXT) == matches
+    assert extraction_cache.misses == misses + 1
+    assert len(extraction_cache) == size + 1
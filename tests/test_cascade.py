@@ -0,0 +1,73 @@
+from actions.extraction import cascade
+from actions.extraction.cascade import CascadePolicy, CascadeStep
+from actions.extraction.skill_index import get_skill_index
+
+EDYOUCATED = ("edyoucated", "edyoucated_skills.csv")
+ONET = ("onet", "onet_alternate_titles_normalized.csv")
+
+STEPS = [CascadeStep(*EDYOUCATED, 95), CascadeStep(*EDYOUCATED, 85), CascadeStep(*ONET, 95)]
+
+
+class AtLeastTwo(CascadePolicy):
+    """ Accepts a step only with two matches or more. """
+
+    def accept(self, matches, step):
+        return len(matches) >= 2
+
+
+def matched(matches):
+    return [(match["match"], match["start"], match["end"]) for match in matches]
+
+
+def test_floor_cutoffs_per_catalogue():
+    policy = CascadePolicy(STEPS + [CascadeStep(*ONET, 90)])
+    assert policy.floor_cutoffs == {EDYOUCATED: 85, ONET: 90}
+
+
+def test_first_step_with_matches_is_accepted():
+    matches, step = CascadePolicy(STEPS).extract("microsoft project", use_cache=False)
+    assert step == STEPS[0]
+    assert matched(matches) == [("microsoft project", 0, 17)]
+
+
+def test_falls_through_to_lower_cutoff():
+    text = "microsft projct"
+    matches, step = CascadePolicy(STEPS).extract(text, use_cache=False)
+    assert step == STEPS[1]
+    assert matches == get_skill_index(*EDYOUCATED).extract(text, cutoff=85, use_cache=False)
+
+
+def test_falls_through_to_next_catalogue():
+    text = "i worked as a nurse"
+    matches, step = CascadePolicy(STEPS).extract(text, use_cache=False)
+    assert step == STEPS[2]
+    assert matches == get_skill_index(*ONET).extract(text, cutoff=95, use_cache=False)
+
+
+def test_nothing_accepted():
+    assert CascadePolicy(STEPS).extract("i like going for walks", use_cache=False) == ([], None)
+
+
+def test_custom_accept():
+    text = "i know microsoft project and microsft projct"
+    matches, step = CascadePolicy(STEPS).extract(text, use_cache=False)
+    assert step == STEPS[0] and len(matches) == 1
+    matches, step = AtLeastTwo(STEPS).extract(text, use_cache=False)
+    assert step == STEPS[1] and len(matches) == 2
+    assert AtLeastTwo(STEPS).cache_key() != CascadePolicy(STEPS).cache_key()
+
+
+def test_each_catalogue_scored_once_at_floor_cutoff(monkeypatch):
+    scored = []
+
+    class Recording(cascade.ScoredExtraction):
+        def __init__(self, index, preprocessed_text, cutoff, **kwargs):
+            scored.append((index.skill_domain, cutoff))
+            super().__init__(index, preprocessed_text, cutoff, **kwargs)
+
+    monkeypatch.setattr(cascade, "ScoredExtraction", Recording)
+    CascadePolicy(STEPS).extract("microsft projct", use_cache=False)
+    assert scored == [("edyoucated", 85)]
+    scored.clear()
+    CascadePolicy(STEPS).extract("i worked as a nurse", use_cache=False)
+    assert scored == [("edyoucated", 85), ("onet", 95)]
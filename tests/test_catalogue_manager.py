@@ -0,0 +1,51 @@
+from actions.catalogue_manager import CatalogueManager, start_catalogue_watcher
+
+
+class Build():
+    """ Builds the content of the file, raises while <fail> is set. """
+
+    def __init__(self, path):
+        self.path = path
+        self.fail = False
+
+    def __call__(self) -> str:
+        if self.fail:
+            raise ValueError("broken catalogue")
+        return self.path.read_text()
+
+
+def test_failed_rebuild_is_retried(tmp_path):
+    path = tmp_path.joinpath("catalogue.csv")
+    path.write_text("python")
+    build = Build(path)
+    manager = CatalogueManager()
+    manager.register("catalogue", [path], build)
+    assert manager.get("catalogue") == "python"
+
+    # the previous version stays in place while the rebuild fails
+    build.fail = True
+    path.write_text("python\njava")
+    assert manager.check() == []
+    assert manager.check() == []
+    assert (manager.get("catalogue"), manager.version("catalogue")) == ("python", 1)
+
+    # the next check after the cause is fixed picks up the unchanged file
+    build.fail = False
+    assert manager.check() == ["catalogue"]
+    assert (manager.get("catalogue"), manager.version("catalogue")) == ("python\njava", 2)
+    assert manager.check() == []
+
+
+def test_missing_file_is_loaded_once_it_appears(tmp_path):
+    path = tmp_path.joinpath("catalogue.csv")
+    manager = CatalogueManager()
+    manager.register("catalogue", [path], Build(path))
+    assert manager.get("catalogue") is None
+
+    path.write_text("python")
+    assert manager.check() == ["catalogue"]
+    assert manager.get("catalogue") == "python"
+
+
+def test_watcher_is_disabled_without_interval():
+    assert start_catalogue_watcher(0) is None
@@ -0,0 +1,56 @@
+import pytest
+
+from actions.extraction.catalogue import CatalogueFile
+from actions.extraction.compile_catalogues import compile_catalogues
+from actions.extraction.skill_index import SkillIndex
+
+CATALOGUES = [("edyoucated", "edyoucated_skills.csv"), ("onet", "onet_alternate_titles_normalized.csv")]
+
+TEXTS = [
+    "I like pythn and microsoft excel",
+    "I work as a senior data engineer and sometimes as project manager",
+    "engineer sales agent",
+]
+
+
+@pytest.fixture(scope="module")
+def catalogue_file(tmp_path_factory):
+    path = tmp_path_factory.mktemp("catalogues").joinpath("skill_catalogues.bin")
+    assert compile_catalogues(CATALOGUES, path) == [filename for _, filename in CATALOGUES]
+    return CatalogueFile(path)
+
+
+def missing_as_none(values):
+    return [None if value != value else value for value in values]  # np.nan in the CSV columns
+
+
+@pytest.mark.parametrize("skill_domain, filename", CATALOGUES)
+def test_compiled_index_equals_csv_index(catalogue_file, skill_domain, filename):
+    compiled = SkillIndex.from_compiled(catalogue_file.catalogue(filename))
+    csv = SkillIndex.from_csv(skill_domain, filename)
+
+    assert list(compiled.skills) == csv.skills
+    assert list(compiled.targets) == csv.targets
+    assert compiled.buckets == csv.buckets
+    assert compiled.registry.records == csv.registry.records
+    assert compiled.exact_matcher.trie == csv.exact_matcher.trie
+    for text in TEXTS:
+        assert compiled.extract(text, cutoff=87, use_cache=False) == csv.extract(text, cutoff=87, use_cache=False)
+
+
+def test_compiled_columns_equal_csv_columns(catalogue_file):
+    compiled = SkillIndex.from_compiled(catalogue_file.catalogue("edyoucated_skills.csv"))
+    csv = SkillIndex.from_csv("edyoucated", "edyoucated_skills.csv")
+    for name in ("skill_titles", "skill_title_abbreviation", "skill_tags"):
+        assert list(compiled.column(name)) == missing_as_none(csv.column(name))
+
+
+def test_compiled_index_keeps_strings_in_the_file(catalogue_file):
+    compiled = SkillIndex.from_compiled(catalogue_file.catalogue("edyoucated_skills.csv"))
+    # titles and columns are views into the memory-mapped file, the CSV file is never parsed
+    assert not isinstance(compiled.skills, list)
+    assert not isinstance(compiled.column("skill_titles"), list)
+    assert compiled._skills_df is None
+    assert compiled.skills[-1] == compiled.skills.tolist()[-1]
+    with pytest.raises(IndexError):
+        compiled.skills[len(compiled.skills)]
@@ -0,0 +1,167 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from actions.NLG.comment_bank import JOB_TITLE_COMMENTS, TECHNOLOGY_SKILL_COMMENTS
+from actions.NLG.completion_cache import CompletionCache, cache_key
+from actions.NLG.gpt3_connector import GPT3Connector
+
+PROMPT = ("text-davinci-002", "What do you think is cool about the job Astronaut?", 0.75, 200)
+
+
+class CountingCreate():
+    """ Stands in for the API call: returns a new completion per call. """
+
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self) -> str:
+        self.calls += 1
+        return f"completion {self.calls}"
+
+
+def get_or_create(cache, create, prompt=PROMPT):
+    return asyncio.run(cache.get_or_create(*prompt, create))
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = CompletionCache(path=tmp_path.joinpath("cache.sqlite3"), variants=2)
+    yield cache
+    cache.close()
+
+
+def test_normalized_prompts_share_a_key():
+    engine, prompt, temperature, max_tokens = PROMPT
+    assert cache_key(engine, prompt, temperature, max_tokens) == cache_key(engine, "  what do YOU think is cool\nabout the job astronaut? ", temperature, max_tokens)
+    assert cache_key(engine, prompt, temperature, max_tokens) != cache_key(engine, prompt, 0.6, max_tokens)
+
+
+def test_read_through_fills_variants_then_rotates(cache):
+    create = CountingCreate()
+    # the API is called until all variants are cached
+    assert get_or_create(cache, create) == "completion 1"
+    assert get_or_create(cache, create) == "completion 2"
+    assert create.calls == 2
+    assert cache.stats()["misses"] == 2
+
+    # then the variants are served in rotation
+    served = {get_or_create(cache, create) for _ in range(4)}
+    assert served == {"completion 1", "completion 2"}
+    assert create.calls == 2
+    assert cache.stats() == {"entries": 2, "hits": 4, "misses": 2, "hit_rate": 0.6667}
+
+
+def test_read_mode_serves_any_variant_and_stores_nothing(tmp_path):
+    path = tmp_path.joinpath("cache.sqlite3")
+    writer = CompletionCache(path=path, variants=2)
+    writer.put(*PROMPT, "cached")
+
+    reader = CompletionCache(path=path, variants=2, mode="read")
+    create = CountingCreate()
+    assert get_or_create(reader, create) == "cached"
+    assert get_or_create(reader, create, prompt=PROMPT[:1] + ("another prompt",) + PROMPT[2:]) == "completion 1"
+    assert create.calls == 1
+    assert len(reader) == 1
+
+
+def test_off_mode_always_calls_the_api(tmp_path):
+    cache = CompletionCache(path=tmp_path.joinpath("cache.sqlite3"), mode="off")
+    create = CountingCreate()
+    assert [get_or_create(cache, create) for _ in range(3)] == ["completion 1", "completion 2", "completion 3"]
+    assert len(cache) == 0
+
+
+def test_invalid_mode(tmp_path):
+    with pytest.raises(ValueError):
+        CompletionCache(path=tmp_path.joinpath("cache.sqlite3"), mode="write")
+
+
+def test_expired_entries_are_missed(tmp_path):
+    cache = CompletionCache(path=tmp_path.joinpath("cache.sqlite3"), variants=1, ttl=0)
+    cache.put(*PROMPT, "expired")
+    assert cache.get(*PROMPT) is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = CompletionCache(path=tmp_path.joinpath("cache.sqlite3"), variants=1, max_entries=2)
+    for i in range(3):
+        cache.put(PROMPT[0], f"prompt {i}", *PROMPT[2:], f"completion {i}")
+    assert len(cache) == 2
+    assert cache.get(PROMPT[0], "prompt 0", *PROMPT[2:]) is None
+    assert cache.get(PROMPT[0], "prompt 2", *PROMPT[2:]) == "completion 2"
+
+
+def test_cache_directory_is_created(tmp_path):
+    cache = CompletionCache(path=tmp_path.joinpath("data", "cache.sqlite3"))
+    cache.put(*PROMPT, "cached")
+    assert len(cache) == 1
+
+
+def stub_connector(cache, completion=" Software Engineer."):
+    """ A connector whose API is a stub that answers every completion with the same text. """
+    connector = GPT3Connector(api_key="test", cache=cache)
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(json.loads(request.content))
+        return httpx.Response(200, json={"choices": [{"text": completion}]})
+
+    connector._client = httpx.AsyncClient(base_url=connector.api_base, transport=httpx.MockTransport(handler))
+    connector._semaphore = asyncio.Semaphore(connector.max_concurrency)
+    return connector, requests
+
+
+def test_answers_of_the_user_are_not_cached(cache):
+    connector, requests = stub_connector(cache)
+
+    async def run():
+        await connector.gpt3_summarize_tasks("I write code and review pull requests")
+        await connector.gpt3_guess_job_title("I write code and review pull requests")
+        await connector.aclose()
+
+    asyncio.run(run())
+    assert len(requests) == 2
+    assert len(cache) == 0
+
+
+def test_comments_are_cached(cache):
+    connector, requests = stub_connector(cache)
+
+    async def run():
+        # 'Astronaut' is not in the comment bank, so every comment goes through the cache
+        for _ in range(4):
+            await connector.gpt3_comment_job_title("Astronaut")
+        await connector.aclose()
+
+    asyncio.run(run())
+    assert len(requests) == cache.variants
+    assert len(cache) == cache.variants
+
+
+def test_generated_comments_bypass_the_cache(cache):
+    connector, requests = stub_connector(cache)
+
+    async def run():
+        completions = [await connector.generate_comment(kind, "Astronaut") for kind in (TECHNOLOGY_SKILL_COMMENTS, JOB_TITLE_COMMENTS)]
+        with pytest.raises(ValueError):
+            await connector.generate_comment("animal", "Astronaut")
+        await connector.aclose()
+        return completions
+
+    assert asyncio.run(run()) == [" Software Engineer.", " Software Engineer."]
+    assert len(requests) == 2
+    assert len(cache) == 0
+
+
+def test_unusable_generated_comments_raise(cache):
+    connector, _ = stub_connector(cache, completion="\n")
+
+    async def run():
+        with pytest.raises(ValueError):
+            await connector.generate_comment(JOB_TITLE_COMMENTS, "Astronaut")
+        await connector.aclose()
+
+    asyncio.run(run())
@@ -0,0 +1,68 @@
+import asyncio
+import time
+
+from rasa_sdk.executor import CollectingDispatcher
+
+from actions import helper
+from actions.helper import DelayScheduler, run_in_thread, typing_delay
+
+
+def elapsed(coroutine) -> float:
+    start = time.monotonic()
+    asyncio.run(coroutine)
+    return time.monotonic() - start
+
+
+def test_scheduler_waits_for_the_rest_of_the_target_delay():
+    async def action(work: float, target: float):
+        scheduler = DelayScheduler(CollectingDispatcher())
+        await asyncio.sleep(work)
+        await scheduler.wait(target)
+
+    # the work counts towards the delay
+    assert 0.3 <= elapsed(action(0.2, 0.3)) < 0.45
+    # work that takes longer than the target is not delayed further
+    assert elapsed(action(0.2, 0.1)) < 0.3
+
+
+def test_scheduler_remaining():
+    scheduler = DelayScheduler(CollectingDispatcher())
+    assert scheduler.remaining(None) == 0
+    assert 0.9 < scheduler.remaining(1) <= 1
+    scheduler.start -= 2
+    assert scheduler.remaining(1) == 0
+
+
+def test_metadata_mode_sends_the_delay_before_the_utterances(monkeypatch):
+    monkeypatch.setattr(helper, "DELAY_MODE", "metadata")
+    dispatcher = CollectingDispatcher()
+    dispatcher.utter_message(text="Hello!")
+
+    assert elapsed(typing_delay(dispatcher, 1.5)) < 0.1
+    assert dispatcher.messages[0]["custom"] == {"typing_delay_ms": 1500}
+    assert dispatcher.messages[1]["text"] == "Hello!"
+
+    # nothing to delay
+    asyncio.run(typing_delay(dispatcher, 0))
+    asyncio.run(typing_delay(dispatcher, None))
+    assert len(dispatcher.messages) == 2
+
+
+def test_await_mode_sleeps(monkeypatch):
+    monkeypatch.setattr(helper, "DELAY_MODE", "await")
+    dispatcher = CollectingDispatcher()
+    assert elapsed(typing_delay(dispatcher, 0.2)) >= 0.2
+    assert dispatcher.messages == []
+
+
+def test_blocking_work_does_not_block_the_event_loop():
+    async def run():
+        start = time.monotonic()
+        timer = asyncio.ensure_future(asyncio.sleep(0.05))
+        work = asyncio.ensure_future(run_in_thread(time.sleep, 0.3))
+        await timer
+        timer_done = time.monotonic() - start
+        await work
+        return timer_done
+
+    assert asyncio.run(run()) < 0.2
@@ -0,0 +1,53 @@
+import random
+
+import pytest
+
+from actions.extraction import skill_index as skill_index_module
+from actions.extraction.deletion import DeletionIndex
+from actions.extraction.scoring import cdist_candidates
+from actions.extraction.skill_index import get_skill_index, load_skill_index
+
+EDYOUCATED = ("edyoucated", "edyoucated_skills.csv")
+ONET = ("onet", "onet_alternate_titles_normalized.csv")
+
+
+def misspell(word: str, rng: random.Random) -> str:
+    """ Drops, duplicates or replaces one or two letters of a word. """
+    for _ in range(rng.randint(1, 2)):
+        if len(word) < 2:
+            break
+        i = rng.randrange(len(word))
+        word = rng.choice([word[:i] + word[i + 1:], word[:i] + word[i] + word[i:], word[:i] + rng.choice("aeiouxyz") + word[i + 1:]])
+    return word
+
+
+def queries(targets, number=300, seed=0):
+    """ Titles of the bucket, misspelled titles and words that are no titles, of all lengths. """
+    rng = random.Random(seed)
+    words = rng.sample(list(targets), min(number, len(targets)))
+    words += [misspell(word, rng) for word in words]
+    words += ["i", "we", "team", "berlin", "management", "responsibilities", "kubernetesclusters"]
+    return words
+
+
+@pytest.mark.parametrize("catalogue", [EDYOUCATED, ONET])
+@pytest.mark.parametrize("cutoff", [85, 87, 90, 92])
+def test_deletion_index_equals_cdist(catalogue, cutoff):
+    targets = get_skill_index(*catalogue).buckets[1]
+    words = queries(targets)
+    expected = cdist_candidates(words, targets, 1, cutoff)
+    assert DeletionIndex(targets).candidates(words, cutoff) == expected
+    assert DeletionIndex(targets, max_distance=1).candidates(words, cutoff) == expected
+
+
+def test_deletion_index_can_be_enabled_per_domain(monkeypatch, sample_texts):
+    default = get_skill_index(*EDYOUCATED)
+    assert 1 not in default.bucket_indexes
+
+    monkeypatch.setattr(skill_index_module, "DELETION_INDEX_DOMAINS", ["edyoucated"])
+    indexed = load_skill_index(*EDYOUCATED)
+    assert isinstance(indexed.bucket_indexes[1], DeletionIndex)
+    for text in sample_texts(default.targets, 50) + ["I use pyhton, exel and jira", "scrumm and kanbn"]:
+        for cutoff in (85, 90):
+            assert indexed.extract(text, cutoff=cutoff, engine="batched", use_cache=False) == \
+                default.extract(text, cutoff=cutoff, engine="batched", use_cache=False), text
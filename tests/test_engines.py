@@ -0,0 +1,30 @@
+import pytest
+
+from actions.extraction.extractor import extract_strings_from_text
+from actions.extraction.skill_index import get_skill_index
+
+ONET = ("onet", "onet_alternate_titles_normalized.csv")
+EDYOUCATED = ("edyoucated", "edyoucated_skills.csv")
+
+
+def brute_force(skill_index, text, cutoff):
+    """ The pairwise extraction over all titles the SkillIndex engines replace. """
+    return extract_strings_from_text(text, skill_index.skills, cutoff)
+
+
+@pytest.mark.parametrize("text", [
+    "engineer sales agent",
+    "I work as a senior data engineer and sometimes as project manager",
+    "sofware developr in a small team",
+])
+def test_batched_equals_brute_force_on_onet_examples(text):
+    # ActionProcessJobTitle extracts O*NET titles with the batched engine (trigram index candidates)
+    skill_index = get_skill_index(*ONET)
+    assert skill_index.extract(text, cutoff=92, engine="batched", use_cache=False) == brute_force(skill_index, text, 92)
+
+
+@pytest.mark.parametrize("catalogue, cutoff, number", [(ONET, 92, 25), (EDYOUCATED, 87, 100)])
+def test_batched_equals_brute_force(catalogue, cutoff, number, sample_texts):
+    skill_index = get_skill_index(*catalogue)
+    for text in sample_texts(skill_index.targets, number, seed=2):
+        assert skill_index.extract(text, cutoff=cutoff, engine="batched", use_cache=False) == brute_force(skill_index, text, cutoff), text
@@ -0,0 +1,67 @@
+import pytest
+
+from actions.extraction import extractor
+from actions.extraction.skill_index import get_skill_index
+
+
+EDYOUCATED = ("edyoucated", "edyoucated_skills.csv")
+ONET = ("onet", "onet_alternate_titles_normalized.csv")
+
+
+def assert_same_extraction(catalogue, text, cutoff):
+    skill_index = get_skill_index(*catalogue)
+    greedy = skill_index.extract(text, cutoff=cutoff, exact_first=False, use_cache=False)
+    for engine in ("legacy", "batched"):
+        assert skill_index.extract(text, cutoff=cutoff, engine=engine, exact_first=True, use_cache=False) == greedy, engine
+
+
+@pytest.mark.parametrize("catalogue, text, cutoff, expected", [
+    # the exact occurrence 'sales agent' overlaps the longer match 'engineer sales' further left
+    (ONET, "engineer sales agent", 92, [("engineer sales", "sales engineer"), ("agent", "agent")]),
+    # the exact occurrence 'microsoft project' overlaps the match 'team microsoft' of the same length further left
+    (EDYOUCATED, "team microsoft project", 90, [("team microsoft", "microsoft teams")]),
+])
+def test_exact_first_keeps_greedy_matches(catalogue, text, cutoff, expected):
+    matches = get_skill_index(*catalogue).extract(text, cutoff=cutoff, exact_first=True, use_cache=False)
+    assert [(m["title"], m["match"]) for m in matches] == expected
+    assert_same_extraction(catalogue, text, cutoff)
+
+
+@pytest.mark.parametrize("catalogue, cutoff, number", [(EDYOUCATED, 90, 150), (ONET, 92, 30)])
+def test_exact_first_equals_greedy(catalogue, cutoff, number, sample_texts):
+    skill_index = get_skill_index(*catalogue)
+    for text in sample_texts(skill_index.targets, number):
+        assert_same_extraction(catalogue, text, cutoff)
+
+
+def test_scored_extraction_exact_first_equals_greedy(sample_texts):
+    skill_index = get_skill_index(*EDYOUCATED)
+    for text in sample_texts(skill_index.targets, 50, seed=1):
+        greedy = skill_index.score(text, 87, exact_first=False)
+        exact_first = skill_index.score(text, 87, exact_first=True)
+        for cutoff in (87, 90, 95):
+            assert exact_first.matches(cutoff) == greedy.matches(cutoff)
+
+
+def test_scored_extraction_exact_first_with_n_gram_cutoffs(sample_texts):
+    skill_index = get_skill_index(*EDYOUCATED)
+    n_gram_cutoffs = {1: 92, 2: 92, 3: 85, 4: 85}
+    for text in sample_texts(skill_index.targets, 50, seed=2):
+        greedy = skill_index.score(text, 85, exact_first=False)
+        exact_first = skill_index.score(text, 85, exact_first=True)
+        assert exact_first.matches(85, n_gram_cutoffs) == greedy.matches(85, n_gram_cutoffs)
+        # a uniform configuration reproduces the extraction with that cutoff
+        assert exact_first.matches(90, {n: 90 for n in range(1, 5)}) == exact_first.matches(90)
+
+
+def test_legacy_pre_pass_scores_every_n_gram_once(monkeypatch, sample_texts):
+    skill_index = get_skill_index(*EDYOUCATED)
+    scored = []
+    best_match = extractor.best_match
+    monkeypatch.setattr(extractor, "best_match", lambda n_gram, *args, **kwargs: scored.append(n_gram) or best_match(n_gram, *args, **kwargs))
+
+    # the n-grams checked for an exact occurrence are not scored again for the remainder
+    for text in sample_texts(skill_index.targets, 50, seed=3):
+        scored.clear()
+        skill_index.extract(text, cutoff=90, exact_first=True, use_cache=False)
+        assert len(scored) == len(set(scored)), text
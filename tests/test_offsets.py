@@ -0,0 +1,55 @@
+import re
+
+import pytest
+
+from actions.extraction.extractor import extract_strings_from_text
+from actions.extraction.skill_index import get_skill_index
+
+EDYOUCATED = ("edyoucated", "edyoucated_skills.csv")
+TARGETS = ["python", "java", "data science", "project management", "microsoft project"]
+
+TEXTS = [
+    # the same n-gram twice, the second occurrence must not point at the first one
+    "Project management; then project   management again.",
+    "We use Python for scripting, and later   Python (again) with Java!",
+    # special characters and runs of spaces are removed by the preprocessing, but not from the offsets
+    "Python... and then   Microsoft   Project & python!!",
+]
+
+
+def source_words(text: str, match: dict) -> str:
+    """ The words of the text at the offsets of the match, cleaned like the preprocessing does. """
+    return " ".join(re.sub(r"[^\w\s]", " ", text[match["start"]:match["end"]].lower()).split())
+
+
+def check_offsets(text, matches, expected):
+    assert [source_words(text, match) for match in matches] == [match["title"] for match in matches]
+    assert sorted(source_words(text, match) for match in matches) == sorted(expected)
+    assert len({match["start"] for match in matches}) == len(matches)
+
+
+@pytest.mark.parametrize("text, expected", zip(TEXTS, [
+    ["project management", "project management"],
+    ["python", "python", "java"],
+    ["python", "microsoft project", "python"],
+]))
+def test_extract_strings_from_text_offsets(text, expected):
+    check_offsets(text, extract_strings_from_text(text, TARGETS, 90), expected)
+
+
+@pytest.mark.parametrize("text, expected", [
+    (TEXTS[0], ["project management", "project management"]),
+    ("We use Scrum for planning, and later   scrum (again) with Jira!", ["scrum", "scrum", "jira"]),
+    ("Tableau... and then   Microsoft   Project & tableau!!", ["tableau", "microsoft project", "tableau"]),
+])
+@pytest.mark.parametrize("segmentation", ["greedy", "optimal"])
+def test_skill_index_offsets(text, expected, segmentation):
+    matches = get_skill_index(*EDYOUCATED).extract(text, segmentation=segmentation, use_cache=False)
+    check_offsets(text, matches, expected)
+
+
+def test_repeated_n_gram_offsets():
+    text = TEXTS[0]
+    matches = extract_strings_from_text(text, TARGETS, 90)
+    assert [(match["start"], match["end"]) for match in matches] == [(0, 18), (25, 45)]
+    assert text[25:45] == "project   management"
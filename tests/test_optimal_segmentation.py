@@ -0,0 +1,51 @@
+import pytest
+
+from actions.extraction.extractor import process_string_list, process_string_list_optimal, span_weight
+from actions.extraction.skill_index import get_skill_index
+
+EDYOUCATED = ("edyoucated", "edyoucated_skills.csv")
+
+# A near miss of the whole text as 4-gram target, which the greedy descent takes before the exact smaller titles.
+TARGETS = ["python", "java", "data science", "python data sciences java"]
+
+
+def titles(matches):
+    return [match["title"] for match in matches]
+
+
+def test_weak_four_gram_blocks_strong_matches_in_greedy_descent():
+    matches, remainders = process_string_list(["i like python data science java and sql"], TARGETS, 90)
+    assert titles(matches) == ["python data science java"]
+    assert matches[0]["score"] < 100
+    assert remainders == ["i like", "and sql"]
+
+
+def test_optimal_segmentation_prefers_strong_smaller_matches():
+    matches, remainders = process_string_list_optimal(["i like python data science java and sql"], TARGETS, 90)
+    assert titles(matches) == ["python", "data science", "java"]
+    assert remainders == ["i like", "and sql"]
+    four_gram = span_weight(97.96, 4)
+    assert four_gram < span_weight(100, 1) + span_weight(100, 2) + span_weight(100, 1)
+
+
+def test_optimal_segmentation_keeps_the_four_gram_without_competitors():
+    targets = ["python data sciences java"]
+    greedy, _ = process_string_list(["python data science java"], targets, 90)
+    optimal, _ = process_string_list_optimal(["python data science java"], targets, 90)
+    assert optimal == greedy
+
+
+def test_optimal_segmentation_selectable_per_call():
+    index = get_skill_index(*EDYOUCATED)
+    text = "team microsoft project"
+    greedy = index.extract(text, cutoff=90)
+    # the segmentation is part of the cache key, the cached greedy result is not served for the optimal call
+    optimal = index.extract(text, cutoff=90, segmentation="optimal")
+    assert [(match["match"], match["start"], match["end"]) for match in greedy] == [("microsoft teams", 0, 14)]
+    assert [(match["match"], match["start"], match["end"]) for match in optimal] == [("microsoft project", 5, 22)]
+    assert index.extract(text, cutoff=90, segmentation="greedy") == greedy
+
+
+def test_unknown_segmentation_raises():
+    with pytest.raises(ValueError):
+        get_skill_index(*EDYOUCATED).extract("team microsoft project", segmentation="best")
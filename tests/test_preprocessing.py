@@ -0,0 +1,24 @@
+import pytest
+
+from actions.extraction.preprocessing import preprocess_text, preprocess_text_reference
+
+
+def nlu_examples(path: str = "data/nlu.yml"):
+    with open(path, encoding="utf-8") as f:
+        return [line[len("    - "):].rstrip("\n") for line in f if line.startswith("    - ")]
+
+
+@pytest.mark.parametrize("text", [
+    "I am a software engineer and I work with Python, Java and SQL.",
+    "Project management; agile methods : scrum and kanban\n• stakeholder communication\n• budgeting",
+    "I'd like to learn more about cloud computing (AWS, Azure) and DevOps. Maybe also Kubernetes?",
+    "",
+    ". ! ? ",
+])
+def test_preprocess_text_equals_reference(text):
+    assert preprocess_text(text) == preprocess_text_reference(text)
+
+
+def test_preprocess_text_equals_reference_on_nlu_examples():
+    for text in nlu_examples():
+        assert preprocess_text(text) == preprocess_text_reference(text), text
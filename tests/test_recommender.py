@@ -0,0 +1,104 @@
+from datetime import datetime
+
+import pytest
+import spacy
+from rasa_sdk.executor import CollectingDispatcher
+
+from actions.extraction.skill_index import install_skill_index, load_skill_index
+from actions.recommendation.recommender import LearningPathRecommender, get_recommender
+from actions.recommendation.tags import LEARNING_PATH_CATALOGUE
+
+TAGS = [
+    "python, data science, machine learning",
+    "python",
+    "excel, data analysis",
+    "ux, user experience design",
+    "excel, data analysis",
+    None,
+    "scrum",
+]
+TITLES = ["Data Science with Python", "Python Basics", "Excel for Analysts", "UX Design", "Spreadsheets", "Empty", "Python Basics"]
+
+
+def recommender():
+    return LearningPathRecommender(TAGS, TITLES)
+
+
+def test_learning_paths_with_the_same_title_are_one_recommendation():
+    paths = recommender()
+    assert len(paths) == 6
+    assert paths.recommend(["scrum"]) == ["Python Basics"]
+
+
+def test_ranking_by_tag_similarity():
+    paths = recommender()
+    # a path with fewer, rarer tags fits a matching interest better
+    assert paths.recommend(["Python"]) == ["Python Basics", "Data Science with Python"]
+    assert paths.recommend(["python", "machine learning"])[0] == "Data Science with Python"
+    # tags are matched by their word sequences as well
+    assert paths.recommend(["user experience"]) == ["UX Design"]
+    assert paths.recommend(["kubernetes"]) == []
+    assert paths.recommend([]) == []
+
+
+def test_ties_are_resolved_in_catalogue_order():
+    paths = recommender()
+    assert paths.recommend(["data analysis"]) == ["Excel for Analysts", "Spreadsheets"]
+    assert paths.recommend(["data analysis"], k=1) == ["Excel for Analysts"]
+
+    tied = LearningPathRecommender(["excel"] * 8, [f"Path {i}" for i in range(8)])
+    assert tied.recommend(["excel"], k=3) == ["Path 0", "Path 1", "Path 2"]
+
+
+def test_excluded_learning_paths_are_left_out():
+    paths = recommender()
+    assert paths.recommend(["python"], exclude=["Python Basics"]) == ["Data Science with Python"]
+    assert paths.recommend(["data analysis"], k=1, exclude=["Excel for Analysts", "Unknown Path"]) == ["Spreadsheets"]
+    assert paths.recommend(["python"], exclude=["Python Basics", "Data Science with Python"]) == []
+
+
+def test_recommender_is_rebuilt_for_a_new_catalogue_version():
+    paths = get_recommender()
+    assert get_recommender() is paths
+
+    install_skill_index(load_skill_index(*LEARNING_PATH_CATALOGUE))
+    rebuilt = get_recommender()
+    assert rebuilt is not paths
+    assert rebuilt.titles == paths.titles
+    assert get_recommender() is rebuilt
+
+
+class StubTracker():
+    """ Tracker with slots only, as <ActionEndConversation> reads them. """
+
+    def __init__(self, slots):
+        self.slots = slots
+
+    def get_slot(self, key):
+        return self.slots.get(key)
+
+
+@pytest.mark.skipif(not spacy.util.is_package("en_core_web_md"), reason="the PerformanceEvaluator loads the spaCy model en_core_web_md")
+def test_end_of_conversation_recommends_with_the_normalized_learning_goals(monkeypatch):
+    from actions.actions import ActionEndConversation
+    queries = []
+
+    class RecordingRecommender():
+        def recommend(self, interests, k=5, exclude=()):
+            queries.append((list(interests), list(exclude)))
+            return ["UX Design"]
+
+    monkeypatch.setattr("actions.actions.get_recommender", lambda: RecordingRecommender())
+    tracker = StubTracker({
+        "survey_start_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f"),
+        "technology_skill_interests": ["python"],
+        "other_skill_interests": None,
+        "learning_goals": ["User Experience Design"],
+        "learning_goals_normalized": ["ux"],
+        "learning_goal_skill_recommendations": ["Python Basics"],
+    })
+    dispatcher = CollectingDispatcher()
+    ActionEndConversation().run(dispatcher, tracker, {})
+
+    assert queries == [(["python", "ux"], ["Python Basics"])]
+    assert "- UX Design\n" in [message.get("text") for message in dispatcher.messages]
@@ -0,0 +1,79 @@
+import json
+
+from actions.extraction.cascade import CascadePolicy, CascadeStep
+from actions.extraction.shadow import ShadowMode, _worker_skill_index, compare_matches, summarize_shadow_log
+from actions.extraction.skill_index import get_skill_index
+
+EDYOUCATED = ("edyoucated", "edyoucated_skills.csv")
+
+
+def match(title, target, score=100.0, start=0):
+    return {"title": title, "match": target, "score": score, "start": start, "end": start + len(title)}
+
+
+def test_compare_matches():
+    legacy = [match("python", "python"), match("exel", "excel", 88.89, start=11), match("java", "java", start=20)]
+    candidate = [match("python", "python"), match("exel", "excel", 90.0, start=11), match("scala", "scala", start=30)]
+    record = compare_matches(legacy, candidate)
+    assert not record["agree"]
+    assert record["matches"] == 3
+    assert record["only_legacy"] == [legacy[2]]
+    assert record["only_candidate"] == [candidate[2]]
+    assert record["score_diffs"] == [{"title": "exel", "match": "excel", "legacy": 88.89, "candidate": 90.0}]
+
+    assert compare_matches(legacy, list(reversed(legacy)))["agree"]
+    # the same title matched at another position is a different match
+    assert not compare_matches([match("python", "python")], [match("python", "python", start=4)])["agree"]
+
+
+def test_summarize_shadow_log(tmp_path):
+    path = tmp_path.joinpath("shadow.jsonl")
+    agreeing = {"agree": True, "only_legacy": [], "only_candidate": [], "score_diffs": []}
+    records = [
+        dict(agreeing, catalogue="onet.csv", candidate={"engine": "batched"}, legacy_ms=10.0, candidate_ms=1.0),
+        dict(agreeing, catalogue="onet.csv", candidate={"engine": "batched"}, legacy_ms=30.0, candidate_ms=1.0),
+        dict(agreeing, catalogue="onet.csv", candidate={"engine": "batched"}, legacy_ms=20.0, candidate_ms=3.0,
+             agree=False, only_legacy=[match("python", "python")], steps={"legacy": None, "candidate": None}),
+        dict(agreeing, catalogue="onet.csv", candidate={"engine": "legacy"}, legacy_ms=10.0, candidate_ms=10.0),
+    ]
+    path.write_text("".join(json.dumps(record) + "\n" for record in records) + "\n")
+
+    summary = summarize_shadow_log(str(path))
+    assert summary["records"] == 4
+    batched = summary["candidates"]["onet.csv: engine=batched"]
+    assert batched["comparisons"] == 3
+    assert batched["agreement_rate"] == 0.6667
+    assert (batched["missing_matches"], batched["additional_matches"], batched["score_diffs"], batched["step_diffs"]) == (1, 0, 0, 1)
+    assert batched["legacy_ms"] == {"p50": 20.0, "p95": 29.0}
+    assert batched["speedup"] == 12.0
+    assert summary["candidates"]["onet.csv: engine=legacy"]["speedup"] == 1.0
+
+
+def test_shadow_mode_logs_comparisons_from_the_worker_process(tmp_path):
+    path = tmp_path.joinpath("shadow.jsonl")
+    shadow_mode = ShadowMode(sample_rate=1.0, log_path=str(path), segmentation="optimal", seed=0)
+    skill_index = get_skill_index(*EDYOUCATED)
+    policy = CascadePolicy([CascadeStep(*EDYOUCATED, 95), CascadeStep(*EDYOUCATED, 90)])
+
+    assert shadow_mode.submit(skill_index, "I use python and excel", 90, {"engine": "batched", "segmentation": "greedy"})
+    assert shadow_mode.submit(skill_index, "team microsoft project", 90, {"engine": "batched", "segmentation": "greedy"})
+    assert shadow_mode.submit_cascade(policy, "I use pyton")
+    shadow_mode.shutdown()
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [record["catalogue"] for record in records] == ["edyoucated_skills.csv"] * 3
+    assert records[0]["agree"] and "text" not in records[0]
+    assert records[0]["candidate"] == {"engine": "batched", "segmentation": "optimal"}
+    # the optimal segmentation selects another match than the legacy extraction
+    assert not records[1]["agree"] and records[1]["text"] == "team microsoft project"
+    assert records[2]["cutoff"] == [95, 90] and records[2]["agree"]
+    assert shadow_mode._pending == 0
+
+
+def test_worker_reloads_catalogues_of_another_version():
+    skill_index = get_skill_index(*EDYOUCATED)
+    assert _worker_skill_index(*EDYOUCATED, skill_index.version) is skill_index
+    assert _worker_skill_index(*EDYOUCATED, skill_index.version) is skill_index
+
+    reloaded = _worker_skill_index(*EDYOUCATED, skill_index.version + 1)
+    assert reloaded is not skill_index and reloaded is get_skill_index(*EDYOUCATED)